@@ -0,0 +1,164 @@
+import os
+import time
+import faiss
+import sqlite3
+import numpy as np
+from threading import Lock
+from typing import Optional
+
+
+def _unit(embedding: np.ndarray) -> np.ndarray:
+    vector = np.asarray(embedding, dtype="float32").reshape(1, -1)
+    return vector / (np.linalg.norm(vector) + 1e-12)
+
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    encoder_id TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    last_hit REAL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+INSERT_ANSWER = """
+INSERT INTO answers (encoder_id, question, answer, embedding, created_at)
+VALUES (?, ?, ?, ?, ?)
+"""
+# Least recently used (or created) entries go first
+SELECT_LRU = """
+SELECT id FROM answers ORDER BY COALESCE(last_hit, created_at) ASC LIMIT ?
+"""
+
+
+class SemanticAnswerCache:
+    """
+    Final answers of past questions, looked up by cosine similarity of the question
+    embedding. Entries live in SQLite so they survive restarts; an in-memory FAISS
+    inner-product index over the unit vectors serves the lookups.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        encoder_id: str,
+        threshold: float = 0.95,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 5000,
+    ):
+        self.encoder_id = encoder_id
+        self.threshold = threshold
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.index = None
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(CREATE_TABLE)
+        self.conn.commit()
+        self.purge(expired_only=True)
+        self._load()
+
+    def _load(self) -> None:
+        # Only vectors from the current encoder are comparable with new questions
+        rows = self.conn.execute(
+            "SELECT id, embedding FROM answers WHERE encoder_id = ?", (self.encoder_id,)
+        ).fetchall()
+        self.index = None
+        if rows:
+            ids = np.array([row[0] for row in rows], dtype="int64")
+            vectors = np.vstack(
+                [np.frombuffer(row[1], dtype="float32") for row in rows]
+            )
+            self._ensure_index(vectors.shape[1])
+            self.index.add_with_ids(vectors, ids)
+
+    def _ensure_index(self, dim: int) -> None:
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+    def _delete(self, ids: list) -> None:
+        if not ids:
+            return
+        marks = ",".join("?" * len(ids))
+        self.conn.execute(f"DELETE FROM answers WHERE id IN ({marks})", ids)
+        self.conn.commit()
+        if self.index is not None:
+            self.index.remove_ids(np.array(ids, dtype="int64"))
+
+    def lookup(self, embedding: np.ndarray) -> Optional[str]:
+        with self.lock:
+            if self.index is None or self.index.ntotal == 0:
+                self.misses += 1
+                return None
+            scores, ids = self.index.search(_unit(embedding), 1)
+            if scores[0][0] < self.threshold:
+                self.misses += 1
+                return None
+            row_id = int(ids[0][0])
+            row = self.conn.execute(
+                "SELECT answer, created_at FROM answers WHERE id = ?", (row_id,)
+            ).fetchone()
+            if row is None or row[1] + self.ttl < time.time():
+                self._delete([row_id])
+                self.misses += 1
+                return None
+            self.conn.execute(
+                "UPDATE answers SET hits = hits + 1, last_hit = ? WHERE id = ?",
+                (time.time(), row_id),
+            )
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def store(self, question: str, embedding: np.ndarray, answer: str) -> None:
+        vector = _unit(embedding)
+        with self.lock:
+            cursor = self.conn.execute(
+                INSERT_ANSWER,
+                (self.encoder_id, question, answer, vector.tobytes(), time.time()),
+            )
+            self.conn.commit()
+            self._ensure_index(vector.shape[1])
+            self.index.add_with_ids(vector, np.array([cursor.lastrowid], dtype="int64"))
+            self._enforce_capacity()
+
+    def _count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def _enforce_capacity(self) -> None:
+        count = self._count()
+        if count <= self.max_entries:
+            return
+        rows = self.conn.execute(SELECT_LRU, (count - self.max_entries,)).fetchall()
+        self._delete([row[0] for row in rows])
+
+    def purge(self, expired_only: bool = False, question: Optional[str] = None) -> int:
+        """Delete expired entries, entries for one exact question, or everything."""
+        query, params = "SELECT id FROM answers", ()
+        if expired_only:
+            query += " WHERE created_at < ?"
+            params = (time.time() - self.ttl,)
+        elif question is not None:
+            query += " WHERE question = ?"
+            params = (question,)
+        with self.lock:
+            ids = [row[0] for row in self.conn.execute(query, params).fetchall()]
+            self._delete(ids)
+        return len(ids)
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": self._count(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,91 @@
+import time
+from threading import Lock, Thread
+from queue import Queue, Empty
+from typing import Callable, Optional
+from concurrent.futures import Future
+
+
+class _Request:
+    def __init__(self, query: str, top_k: int):
+        self.query = query
+        self.top_k = top_k
+        self.future = Future()
+
+
+class RetrievalBatcher:
+    """
+    Collect queries arriving within `max_wait_ms` (up to `max_batch_size`) and run
+    them through `search_fn(queries, top_k) -> list of hit lists` in one call.
+    Each caller gets a Future resolved with its own top_k hits.
+    """
+
+    def __init__(
+        self,
+        search_fn: Callable[[list, int], list],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+    ):
+        self.search_fn = search_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.queue = Queue()
+        self.stats_lock = Lock()
+        self.n_batches = 0
+        self.n_queries = 0
+        self.worker = Thread(target=self._loop, name="retrieval-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, query: str, top_k: int) -> Future:
+        request = _Request(query=query, top_k=top_k)
+        self.queue.put(request)
+        return request.future
+
+    def search(self, query: str, top_k: int, timeout: Optional[float] = None) -> list:
+        return self.submit(query=query, top_k=top_k).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            mean_size = self.n_queries / self.n_batches if self.n_batches else 0.0
+            return {
+                "batches": self.n_batches,
+                "queries": self.n_queries,
+                "mean_batch_size": round(mean_size, 2),
+                "queue_depth": self.queue.qsize(),
+            }
+
+    def _collect(self) -> list:
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self, batch: list) -> None:
+        # One search with the largest top_k, each caller keeps its own prefix
+        top_k = max(request.top_k for request in batch)
+        try:
+            results = self.search_fn([request.query for request in batch], top_k)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        for request, hits in zip(batch, results):
+            request.future.set_result(hits[: request.top_k])
+        # A short result must not leave the remaining callers waiting forever
+        for request in batch[len(results) :]:
+            request.future.set_exception(
+                RuntimeError(f">>> No search result for query: {request.query}")
+            )
+        with self.stats_lock:
+            self.n_batches += 1
+            self.n_queries += len(batch)
+
+    def _loop(self) -> None:
+        while True:
+            self._run(self._collect())
@@ -0,0 +1,169 @@
+import re
+import time
+import unicodedata
+from threading import Lock
+from typing import Optional, Sequence
+
+CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "兩": 2, "三": 3, "四": 4, "五": 5}
+CN_DIGITS.update({"六": 6, "七": 7, "八": 8, "九": 9})
+CN_UNITS = {"十": 10, "百": 100, "千": 1000}
+NUMBER = r"[0-9零〇一二兩三四五六七八九十百千]+"
+# 第184條 / 第一百八十四條 / 第184條之1 / 第184-1條; "第" is optional after a law
+CITATION = re.compile(
+    rf"(第)?\s*({NUMBER})\s*(?:-\s*({NUMBER})\s*)?[條条](?:\s*之\s*({NUMBER}))?"
+)
+# Law name before the article number in a corpus text ("【民法】第184條" -> 民法)
+LAW_NAME = re.compile(r"([一-鿿]{2,30})[\s\W]*$")
+# Everyday abbreviations -> official law names
+LAW_ALIASES = {
+    "刑法": "中華民國刑法",
+    "勞基法": "勞動基準法",
+    "消保法": "消費者保護法",
+    "個資法": "個人資料保護法",
+    "道交條例": "道路交通管理處罰條例",
+    "家暴法": "家庭暴力防治法",
+    "公寓大廈條例": "公寓大廈管理條例",
+}
+
+
+def parse_number(text: str) -> Optional[int]:
+    """Arabic or Chinese numerals ("184", "一百八十四", "十", "一千零五") -> int."""
+    if text.isdigit():
+        return int(text)
+    total, digit = 0, None
+    for ch in text:
+        if ch in CN_DIGITS:
+            digit = CN_DIGITS[ch]
+        elif ch in CN_UNITS:
+            # A bare unit ("十" in "十條" / "一百十") means one of it
+            total += (1 if digit is None else digit) * CN_UNITS[ch]
+            digit = None
+        else:
+            return None
+    return total + (digit or 0)
+
+
+def article_key(number: str, sub: Optional[str] = None) -> Optional[str]:
+    main = parse_number(number)
+    if main is None:
+        return None
+    if sub:
+        sub_number = parse_number(sub)
+        return f"{main}-{sub_number}" if sub_number is not None else None
+    return str(main)
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFKC", text)
+
+
+def law_names(laws: set) -> dict:
+    # Names a question may use: official names, the same without "中華民國", aliases
+    names = {law: law for law in laws}
+    for law in laws:
+        if law.startswith("中華民國") and len(law) >= 6:
+            names.setdefault(law[4:], law)
+    for alias, law in LAW_ALIASES.items():
+        if law in laws:
+            names.setdefault(alias, law)
+    return names
+
+
+def law_of(text: str, head_chars: int = 48) -> Optional[str]:
+    key = CitationIndex.parse_head(normalize_text(text[:head_chars]))
+    return key[0] if key is not None else None
+
+
+class CitationIndex:
+    """
+    Maps (law name, article) to corpus ids, built once from the head of each text
+    ("民法第184條：..."). `lookup(query)` resolves explicit citations with dict lookups,
+    so cited articles skip the query embedding and the FAISS search.
+    """
+
+    def __init__(
+        self,
+        texts: Sequence[str],
+        head_chars: int = 48,
+        ids: Optional[Sequence[int]] = None,
+    ):
+        # `ids` are the corpus ids of `texts` when they are not simply 0..N-1
+        self.entries = {}
+        self.laws = set()
+        for i, text in zip(ids if ids is not None else range(len(texts)), texts):
+            key = self.parse_head(normalize_text(text[:head_chars]))
+            if key is not None:
+                self.entries.setdefault(key, []).append(i)
+                self.laws.add(key[0])
+        self.names = law_names(self.laws)
+        self.lock = Lock()
+        self.counts = {"lookups": 0, "hits": 0, "misses": 0, "unresolved": 0}
+        self.seconds = 0.0
+
+    @staticmethod
+    def parse_head(head: str) -> Optional[tuple]:
+        match = CITATION.search(head)
+        if match is None or match.group(1) is None:
+            return None
+        name = LAW_NAME.search(head[: match.start()])
+        key = article_key(match.group(2), match.group(3) or match.group(4))
+        if name is None or key is None:
+            return None
+        return name.group(1), key
+
+    def law_before(self, text: str) -> Optional[str]:
+        # Longest known name the text ends with ("請問民法" -> 民法)
+        text = text.rstrip()
+        for size in range(min(len(text), 30), 1, -1):
+            law = self.names.get(text[-size:])
+            if law is not None:
+                return law
+        return None
+
+    def citations(self, query: str) -> list:
+        """(law, article) pairs cited in the query; bare "第N條" reuses the last law."""
+        query = normalize_text(query)
+        found, law = [], None
+        for match in CITATION.finditer(query):
+            named = self.law_before(query[: match.start()])
+            if named is None and match.group(1) is None:
+                continue
+            law = named or law
+            key = article_key(match.group(2), match.group(3) or match.group(4))
+            if law is not None and key is not None:
+                found.append((law, key))
+        return found
+
+    def lookup(self, query: str) -> list:
+        """Corpus ids of every cited article, or [] if any citation is unknown."""
+        time_s = time.perf_counter()
+        citations = self.citations(query)
+        ids = []
+        for citation in citations:
+            matched = self.entries.get(citation)
+            if matched is None:
+                ids = []
+                break
+            ids += [i for i in matched if i not in ids]
+        with self.lock:
+            self.counts["lookups"] += 1
+            if ids:
+                self.counts["hits"] += 1
+            else:
+                self.counts["misses"] += 1
+                self.counts["unresolved"] += bool(citations)
+            self.seconds += time.perf_counter() - time_s
+        return ids
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.counts["lookups"]
+            return {
+                **self.counts,
+                "articles": len(self.entries),
+                "laws": len(self.laws),
+                "hit_rate": round(self.counts["hits"] / lookups, 3) if lookups else 0.0,
+                "mean_lookup_us": (
+                    round(1e6 * self.seconds / lookups, 2) if lookups else 0.0
+                ),
+            }
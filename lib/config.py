@@ -1,6 +1,18 @@
+import os
 import yaml
+from typing import Any, Callable
+from dotenv import load_dotenv
 
 
 def load_config(path):
     with open(path, "r") as f:
         return yaml.safe_load(f)
+
+
+def get_env(key: str, default: Any = None, cast: Callable = str) -> Any:
+    # Read a setting from the environment (".env" included), falling back to default
+    load_dotenv()
+    val = os.getenv(key)
+    if val is None or val == "":
+        return default
+    return cast(val)
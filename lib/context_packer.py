@@ -0,0 +1,130 @@
+import os
+import numpy as np
+from threading import Lock
+from collections import deque
+from typing import Optional, Sequence
+from lib.judge_gate import answer_similarity
+from lib.embedding_store import encoder_slug
+
+
+def load_or_count_lengths(
+    texts: Sequence[str], tokenizer, store_dir: str, batch_size: int = 256
+) -> np.ndarray:
+    # Token count of every corpus text, counted once per tokenizer, kept with the store
+    name = getattr(tokenizer, "name_or_path", "") or type(tokenizer).__name__
+    path = os.path.join(store_dir, f"token_lengths_{encoder_slug(name)}.npy")
+    if os.path.exists(path):
+        lengths = np.load(path)
+        if len(lengths) == len(texts):
+            return lengths
+    lengths = np.zeros(len(texts), dtype=np.int32)
+    for start in range(0, len(texts), batch_size):
+        batch = list(texts[start : start + batch_size])
+        input_ids = tokenizer(batch, add_special_tokens=False).input_ids
+        lengths[start : start + len(batch)] = [len(ids) for ids in input_ids]
+    np.save(path, lengths)
+    print(f">>> Counted tokens of {len(texts)} texts: {path}")
+    return lengths
+
+
+class ContextPacker:
+    """
+    Turns retrieval hits into the prompt context: best hits first (lower L2 score),
+    near-duplicates of an already kept article dropped, and articles added while they
+    fit `max_tokens`. Lengths come from the pre-counted `lengths[hit["id"]]`; only the
+    query is tokenized per request. Context and prompt token counts are recorded.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        lengths: Optional[np.ndarray] = None,
+        max_tokens: int = 1024,
+        dedup_threshold: float = 0.9,
+        overhead_tokens: int = 0,
+        separator: str = "\n",
+    ):
+        self.tokenizer = tokenizer
+        self.lengths = lengths
+        self.max_tokens = max_tokens
+        self.dedup_threshold = dedup_threshold
+        self.overhead_tokens = overhead_tokens
+        self.separator = separator
+        self.lock = Lock()
+        self.counts = {
+            "requests": 0,
+            "hits": 0,
+            "kept": 0,
+            "duplicates": 0,
+            "over_budget": 0,
+            "truncated": 0,
+        }
+        self.context_tokens = deque(maxlen=1000)
+        self.prompt_tokens = deque(maxlen=1000)
+
+    def count(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False).input_ids)
+
+    def hit_length(self, hit: dict) -> int:
+        # Articles added after the lengths were counted are tokenized on the fly
+        if self.lengths is not None and 0 <= hit.get("id", -1) < len(self.lengths):
+            return int(self.lengths[hit["id"]])
+        return self.count(hit["text"])
+
+    def truncate(self, text: str, n_tokens: int) -> str:
+        input_ids = self.tokenizer(text, add_special_tokens=False).input_ids
+        return self.tokenizer.decode(input_ids[:n_tokens], skip_special_tokens=True)
+
+    def pack(self, hits: list, query: str = "") -> str:
+        kept, used, duplicates, over_budget, truncated = [], 0, 0, 0, 0
+        for hit in sorted(hits, key=lambda hit: hit["score"]):
+            text = hit["text"]
+            if any(
+                answer_similarity(text, other) >= self.dedup_threshold for other in kept
+            ):
+                duplicates += 1
+                continue
+            # The separator is counted as one token
+            cost = self.hit_length(hit) + (1 if kept else 0)
+            if used + cost > self.max_tokens:
+                if not kept and self.max_tokens > 0:
+                    # Even the best article alone is too long: keep its beginning
+                    kept.append(self.truncate(text, self.max_tokens))
+                    used, truncated = self.max_tokens, 1
+                    continue
+                over_budget += 1
+                continue
+            kept.append(text)
+            used += cost
+
+        prompt_tokens = (
+            self.overhead_tokens + used + (self.count(query) if query else 0)
+        )
+        with self.lock:
+            self.counts["requests"] += 1
+            self.counts["hits"] += len(hits)
+            self.counts["kept"] += len(kept)
+            self.counts["duplicates"] += duplicates
+            self.counts["over_budget"] += over_budget
+            self.counts["truncated"] += truncated
+            self.context_tokens.append(used)
+            self.prompt_tokens.append(prompt_tokens)
+        print(
+            f">>> Context: {len(kept)}/{len(hits)} articles, {used} tokens "
+            f"(prompt ~{prompt_tokens} tokens)"
+        )
+        return self.separator.join(kept)
+
+    def stats(self) -> dict:
+        with self.lock:
+            context = np.asarray(self.context_tokens or [0])
+            prompt = np.asarray(self.prompt_tokens or [0])
+            return {
+                **self.counts,
+                "max_tokens": self.max_tokens,
+                "context_tokens_p50": int(np.percentile(context, 50)),
+                "context_tokens_max": int(context.max()),
+                "prompt_tokens_p50": int(np.percentile(prompt, 50)),
+                "prompt_tokens_p95": int(np.percentile(prompt, 95)),
+                "prompt_tokens_max": int(prompt.max()),
+            }
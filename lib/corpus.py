@@ -0,0 +1,226 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import numpy as np
+from typing import Iterator, Optional, Sequence
+from lib.citation_index import article_key, normalize_text
+
+# Article numbers, full-width digits included (the text itself is not normalized)
+NUMBER = r"[0-9０-９零〇一二兩三四五六七八九十百千]+"
+# "第 184 條" / "第184-1條" / "第 184 條之 1" at the start of a line opens an article
+ARTICLE_HEAD = re.compile(
+    rf"^[ \t]*第\s*({NUMBER})\s*(?:-\s*({NUMBER})\s*)?[條条]"
+    rf"(?:\s*之\s*({NUMBER}))?[ \t：:]*",
+    re.M,
+)
+# "第一編 總則" / "第二章 人" / "第三節 ..." headings between articles
+SECTION_HEAD = re.compile(r"^[ \t]*第\s*\S{1,8}\s*[編章節款目](?:\s.*)?$", re.M)
+SENTENCE_END = re.compile(r"(?<=[。；！？])")
+CLAUSE_END = re.compile(r"(?<=[，、：])")
+
+
+def head_key(head: re.Match) -> Optional[str]:
+    number, sub = head.group(1), head.group(2) or head.group(3)
+    return article_key(normalize_text(number), sub and normalize_text(sub))
+
+
+def join_lines(text: str) -> str:
+    # Paragraphs of an article are joined; Chinese needs no space between them
+    return "".join(line.strip() for line in text.splitlines())
+
+
+def parse_law_text(text: str, law: str) -> list:
+    """(law, article, body) of every article in a plain-text law ("第1條 ...")."""
+    text = SECTION_HEAD.sub("", text)
+    heads = list(ARTICLE_HEAD.finditer(text))
+    articles = []
+    for head, next_head in zip(heads, heads[1:] + [None]):
+        key = head_key(head)
+        body = join_lines(text[head.end() : next_head.start() if next_head else None])
+        if key is not None and body:
+            articles.append((law, key, body))
+    return articles
+
+
+def parse_law_json(data) -> list:
+    """
+    Articles of a 全國法規資料庫 export ({"Laws": [{"LawName", "LawArticles"}]});
+    a list of {"text": ...} items (e.g. laws_embedding.json) is used as-is, law None.
+    """
+    if isinstance(data, list):
+        return [(None, None, item["text"]) for item in data if item.get("text")]
+    articles = []
+    for law in data.get("Laws", []):
+        for item in law.get("LawArticles", []):
+            # "C" entries are chapter headings, "A" entries are articles
+            if item.get("ArticleType") != "A":
+                continue
+            head = ARTICLE_HEAD.match(item.get("ArticleNo", ""))
+            key = head_key(head) if head is not None else None
+            body = join_lines(item.get("ArticleContent", ""))
+            if key is not None and body:
+                articles.append((law["LawName"], key, body))
+    return articles
+
+
+def iter_law_files(paths: Sequence[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith((".txt", ".json")):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def load_articles(paths: Sequence[str]) -> list:
+    # Plain-text files are named after their law: data/raw/民法.txt
+    articles = []
+    for path in iter_law_files(paths):
+        with open(path, "r", encoding="utf-8-sig") as f:
+            if path.endswith(".json"):
+                articles += parse_law_json(json.load(f))
+            else:
+                law = os.path.splitext(os.path.basename(path))[0]
+                articles += parse_law_text(f.read(), law)
+    return articles
+
+
+def split_sentences(body: str, max_chars: int) -> list:
+    # Sentences; too long ones split at commas, anything still too long at max_chars
+    pieces = []
+    for sentence in SENTENCE_END.split(body):
+        clauses = (
+            [sentence] if len(sentence) <= max_chars else CLAUSE_END.split(sentence)
+        )
+        for clause in clauses:
+            for bgn in range(0, len(clause), max_chars):
+                if clause[bgn : bgn + max_chars].strip():
+                    pieces.append(clause[bgn : bgn + max_chars])
+    return pieces
+
+
+def chunk_article(
+    law: Optional[str], article: Optional[str], body: str, max_chars: int = 400
+) -> list:
+    """
+    "民法第184條：..." texts of at most `max_chars` characters. A long article is cut
+    at sentence ends and every chunk repeats the head ("民法第184條（續）：..."),
+    so each one still resolves to its article in the CitationIndex.
+    """
+    if law is None or article is None:
+        return [body]
+    head = f"{law}第{article}條"
+    if len(head) + 1 + len(body) <= max_chars:
+        return [f"{head}：{body}"]
+    budget = max(1, max_chars - len(head) - 4)
+    chunks, current = [], ""
+    for piece in split_sentences(body, budget):
+        if current and len(current) + len(piece) > budget:
+            chunks.append(current)
+            current = ""
+        current += piece
+    chunks.append(current)
+    return [
+        f"{head}{'（續）' if i else ''}：{chunk.strip()}"
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def build_corpus(articles: Sequence[tuple], max_chars: int = 400) -> list:
+    texts = []
+    for law, article, body in articles:
+        texts += chunk_article(law, article, body, max_chars=max_chars)
+    return texts
+
+
+def plan_batches(lengths: Sequence[int], batch_size: int, max_batch_chars: int) -> list:
+    """
+    Row batches in ascending length order: each batch is padded to its longest text,
+    so similar lengths waste little padding. A batch closes at `batch_size` texts or
+    when its padded size (count x longest) would pass `max_batch_chars`.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, current = [], []
+    for i in order:
+        padded = (len(current) + 1) * max(lengths[i], 1)
+        if current and (len(current) >= batch_size or padded > max_batch_chars):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def corpus_fingerprint(texts: Sequence[str], **settings) -> str:
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    for text in texts:
+        digest.update(text.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+class EmbeddingCheckpoint:
+    """
+    Work directory of an embedding run: plan.json (fingerprint + batches) and one
+    parts/<batch>.npy per finished batch, each renamed into place when complete.
+    A rerun with the same fingerprint skips the finished batches; a different corpus
+    or setting refuses to mix the parts unless `restart` clears them.
+    """
+
+    def __init__(
+        self,
+        work_dir: str,
+        fingerprint: str,
+        batches: list,
+        restart: bool = False,
+    ):
+        self.work_dir = work_dir
+        self.parts_dir = os.path.join(work_dir, "parts")
+        plan_path = os.path.join(work_dir, "plan.json")
+        if restart:
+            self.clear()
+        os.makedirs(self.parts_dir, exist_ok=True)
+        if os.path.exists(plan_path):
+            with open(plan_path, "r") as f:
+                plan = json.load(f)
+            if plan["fingerprint"] != fingerprint:
+                raise ValueError(
+                    f">>> {work_dir} belongs to another corpus or setting; "
+                    "use --restart to discard it"
+                )
+            batches = plan["batches"]
+        else:
+            with open(f"{plan_path}.tmp", "w") as f:
+                json.dump({"fingerprint": fingerprint, "batches": batches}, f)
+            os.replace(f"{plan_path}.tmp", plan_path)
+        self.batches = batches
+
+    def part_path(self, k: int) -> str:
+        return os.path.join(self.parts_dir, f"{k:06d}.npy")
+
+    def done(self, k: int) -> bool:
+        return os.path.exists(self.part_path(k))
+
+    def pending(self) -> list:
+        return [k for k in range(len(self.batches)) if not self.done(k)]
+
+    def save(self, k: int, vectors: np.ndarray) -> None:
+        tmp_path = f"{self.part_path(k)}.tmp.npy"
+        np.save(tmp_path, np.asarray(vectors, dtype="float32"))
+        os.replace(tmp_path, self.part_path(k))
+
+    def assemble(self, n_texts: int) -> np.ndarray:
+        # Batches were in length order; rows go back to corpus order here
+        embeddings = None
+        for k, rows in enumerate(self.batches):
+            vectors = np.load(self.part_path(k))
+            if embeddings is None:
+                embeddings = np.zeros((n_texts, vectors.shape[1]), dtype="float32")
+            embeddings[rows] = vectors
+        return embeddings
+
+    def clear(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import hashlib
+import numpy as np
+from typing import BinaryIO, Callable, Iterator, Optional, Sequence, Union
+from lib.path import get_path
+
+# === Store Layout ===
+# <store_dir>/meta.json     -> count, dim, dtype, encoder_id, fingerprint (written last)
+# <store_dir>/vectors.npy   -> contiguous (count, dim) float32/float16 matrix (mmap)
+# <store_dir>/texts.bin     -> all texts as concatenated UTF-8 bytes
+# <store_dir>/offsets.npy   -> int64 byte offsets into texts.bin, length count + 1
+STORE_DTYPES = ("float32", "float16")
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.npy"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+# laws_embedding.json was produced by mean-pooling the 3B legal Llama
+DEFAULT_ENCODER_ID = "llama-mean:lianghsun/Llama-3.2-Taiwan-Legal-3B-Instruct"
+
+
+def encoder_slug(encoder_id: str) -> str:
+    return re.sub(r"[^0-9A-Za-z]+", "_", encoder_id).strip("_").lower()
+
+
+def get_json_path() -> str:
+    return os.path.join(get_path(key="DATA"), "embeddings", "laws_embedding.json")
+
+
+def get_store_dir(encoder_id: Optional[str] = None) -> str:
+    # The default encoder keeps the original location; others get their own store
+    name = "laws_store"
+    if encoder_id and encoder_id != DEFAULT_ENCODER_ID:
+        name = f"laws_store_{encoder_slug(encoder_id)}"
+    return os.path.join(get_path(key="DATA"), "embeddings", name)
+
+
+def vectors_fingerprint(vectors: np.ndarray, chunk_rows: int = 4096) -> str:
+    # Content hash of the vectors; an index built from other vectors is stale
+    digest = hashlib.sha256(f"{vectors.shape}:{vectors.dtype.str}".encode("utf-8"))
+    for bgn in range(0, len(vectors), chunk_rows):
+        digest.update(np.ascontiguousarray(vectors[bgn : bgn + chunk_rows]).tobytes())
+    return digest.hexdigest()
+
+
+class LazyTexts(Sequence):
+    """Read-only list of texts; each item is decoded from the mmapped blob on access."""
+
+    def __init__(self, texts_path: str, offsets_path: str):
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        if os.path.getsize(texts_path) > 0:
+            self._blob = np.memmap(texts_path, dtype=np.uint8, mode="r")
+        else:
+            self._blob = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[str, list]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f">>> Text index out of range: {i}")
+        bgn, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._blob[bgn:end].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class EmbeddingStore:
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, META_FILE), "r") as f:
+            self.meta = json.load(f)
+        # Zero-copy view of the vector file; pages are loaded by the OS on demand
+        self.vectors = np.load(os.path.join(store_dir, VECTORS_FILE), mmap_mode="r")
+        self.texts = LazyTexts(
+            texts_path=os.path.join(store_dir, TEXTS_FILE),
+            offsets_path=os.path.join(store_dir, OFFSETS_FILE),
+        )
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    @property
+    def encoder_id(self) -> str:
+        return self.meta.get("encoder_id", DEFAULT_ENCODER_ID)
+
+    @property
+    def fingerprint(self) -> str:
+        # Stores written before fingerprints existed are hashed once per process
+        if "fingerprint" not in self.meta:
+            self.meta["fingerprint"] = vectors_fingerprint(self.vectors)
+        return self.meta["fingerprint"]
+
+    def vectors_float32(self) -> np.ndarray:
+        # FAISS only accepts float32; a float16 store is widened here (one copy)
+        if self.vectors.dtype == np.float32:
+            return self.vectors
+        return self.vectors.astype("float32")
+
+
+def replace_file(path: str, write_fn: Callable[[BinaryIO], None]) -> None:
+    # A new inode takes the name: processes that mmapped the old file keep reading
+    # it (overwriting in place would SIGBUS them) and readers never see a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write_fn(f)
+    os.replace(tmp_path, path)
+
+
+def write_store(
+    store_dir: str,
+    texts: Sequence[str],
+    embeddings: np.ndarray,
+    dtype: str = "float32",
+    meta: Optional[dict] = None,
+) -> None:
+    if dtype not in STORE_DTYPES:
+        raise ValueError(f">>> Unsupported store dtype: {dtype}")
+    if len(texts) != embeddings.shape[0]:
+        raise ValueError(
+            f">>> Text/embedding count mismatch: {len(texts)} != {embeddings.shape[0]}"
+        )
+    os.makedirs(store_dir, exist_ok=True)
+    # Remove the old marker first so a half-written store is never opened
+    meta_path = os.path.join(store_dir, META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    vectors = np.ascontiguousarray(embeddings, dtype=dtype)
+    replace_file(os.path.join(store_dir, VECTORS_FILE), lambda f: np.save(f, vectors))
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+
+    def write_texts(f: BinaryIO) -> None:
+        for i, text in enumerate(texts):
+            encoded = text.encode("utf-8")
+            f.write(encoded)
+            offsets[i + 1] = offsets[i] + len(encoded)
+
+    replace_file(os.path.join(store_dir, TEXTS_FILE), write_texts)
+    replace_file(os.path.join(store_dir, OFFSETS_FILE), lambda f: np.save(f, offsets))
+
+    store_meta = dict(meta or {})
+    store_meta.update(
+        {
+            "count": int(embeddings.shape[0]),
+            "dim": int(embeddings.shape[1]),
+            "dtype": dtype,
+            "fingerprint": vectors_fingerprint(vectors),
+        }
+    )
+    with open(meta_path, "w") as f:
+        json.dump(store_meta, f, ensure_ascii=False, indent=2)
+
+
+def convert_json_to_store(
+    json_path: str,
+    store_dir: str,
+    dtype: str = "float32",
+    encoder_id: str = DEFAULT_ENCODER_ID,
+) -> EmbeddingStore:
+    with open(json_path, "r") as f:
+        data = json.load(f)
+    texts = [item["text"] for item in data]
+    embeddings = np.array([item["embedding"] for item in data], dtype="float32")
+    del data
+    write_store(
+        store_dir=store_dir,
+        texts=texts,
+        embeddings=embeddings,
+        dtype=dtype,
+        meta={"encoder_id": encoder_id},
+    )
+    print(f">>> Converted {len(texts)} embeddings: {json_path} -> {store_dir}")
+    return EmbeddingStore(store_dir)
+
+
+def load_embedding_store(
+    store_dir: Optional[str] = None,
+    json_path: Optional[str] = None,
+    encoder_id: Optional[str] = None,
+) -> EmbeddingStore:
+    store_dir = store_dir or get_store_dir(encoder_id)
+    if not os.path.exists(os.path.join(store_dir, META_FILE)):
+        # One-time migration from the legacy JSON file (default encoder only)
+        json_path = json_path or get_json_path()
+        legacy = encoder_id in (None, DEFAULT_ENCODER_ID)
+        if not legacy or not os.path.exists(json_path):
+            raise FileNotFoundError(f">>> Embedding store doesn't exist: {store_dir}")
+        print(f">>> Embedding store not found, converting from: {json_path}")
+        return convert_json_to_store(json_path=json_path, store_dir=store_dir)
+    return EmbeddingStore(store_dir)
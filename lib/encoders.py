@@ -0,0 +1,227 @@
+import os
+import copy
+import importlib.util
+import json
+import torch
+import numpy as np
+from typing import Optional
+from transformers import AutoTokenizer, AutoModel
+from lib.config import get_env
+from lib.path import get_path
+
+# === Encoder Backends ===
+# llama      : mean-pooled last_hidden_state of the legal Llama (the original encoder)
+# llama-int8 : same model with int8 dynamically quantized Linear layers (CPU only)
+#              both llama types stop after ENCODER_LAYER decoder layers when it is set
+# sentence   : small dedicated sentence encoder (ENCODER_MODEL, e.g. BAAI/bge-small-zh)
+# onnx       : ONNX export written by scripts/export_onnx_encoder.py (ENCODER_ONNX_DIR)
+ENCODER_TYPES = ("llama", "llama-int8", "sentence", "onnx")
+DEFAULT_SENTENCE_MODEL = "BAAI/bge-small-zh-v1.5"
+
+
+def low_memory_kwargs() -> dict:
+    # from_pretrained memory-maps safetensors checkpoints; with accelerate installed,
+    # low_cpu_mem_usage also skips allocating and randomly initialising a throwaway
+    # copy of the weights first
+    if importlib.util.find_spec("accelerate") is None:
+        return {}
+    return {"low_cpu_mem_usage": True}
+
+
+def mean_pool(hidden: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    # Mean over real tokens only, so padding inside a batch doesn't shift the result
+    mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+    return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+
+
+def truncate_layers(model: torch.nn.Module, n_layers: int) -> torch.nn.Module:
+    """
+    Return a view of a Llama base model that stops after `n_layers` decoder layers.
+    Weights are shared with `model`, which itself is left untouched.
+    """
+    if not 0 < n_layers <= len(model.layers):
+        raise ValueError(f">>> Layer must be in 1..{len(model.layers)}: {n_layers}")
+    truncated = copy.copy(model)
+    truncated._modules = dict(model._modules)
+    truncated.layers = torch.nn.ModuleList(model.layers[:n_layers])
+    truncated.config = copy.copy(model.config)
+    truncated.config.num_hidden_layers = n_layers
+    return truncated
+
+
+class QueryEncoder:
+    """Turns a list of texts into a float32 (n, dim) matrix for the FAISS index."""
+
+    encoder_id = ""
+
+    def encode(self, texts: list, max_length: int = 512) -> np.ndarray:
+        raise NotImplementedError
+
+
+class LlamaMeanPoolEncoder(QueryEncoder):
+    def __init__(
+        self,
+        model_name: str,
+        device: torch.device,
+        quantize: bool = False,
+        layer: Optional[int] = None,
+        model: Optional[torch.nn.Module] = None,
+        tokenizer=None,
+    ):
+        # `model`/`tokenizer` reuse an already loaded base model (e.g. the `.model` of
+        # the generation LM) instead of loading the checkpoint a second time
+        self.device = device
+        if tokenizer is not None:
+            # Own copy, so the padding settings below don't leak into generation
+            self.tokenizer = copy.deepcopy(tokenizer)
+        else:
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # Right padding keeps token positions of batched texts identical to a lone text
+        self.tokenizer.padding_side = "right"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        if quantize:
+            # Dynamic int8 quantization runs on CPU and starts from float32 weights
+            self.device = torch.device("cpu")
+            model = AutoModel.from_pretrained(
+                model_name, torch_dtype=torch.float32, **low_memory_kwargs()
+            )
+            self.model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            kind = "llama-mean-int8"
+        elif model is not None:
+            self.model = model
+            kind = "llama-mean"
+        else:
+            self.model = AutoModel.from_pretrained(
+                model_name, torch_dtype=torch.float16, **low_memory_kwargs()
+            ).to(device)
+            kind = "llama-mean"
+        self.model.eval()
+
+        # Early exit: pool the normed output of an intermediate layer, skip the rest
+        self.layer = layer
+        if layer and layer != len(self.model.layers):
+            self.model = truncate_layers(self.model, layer)
+            kind = f"{kind}-L{layer}"
+        self.encoder_id = f"{kind}:{model_name}"
+
+    def encode(self, texts: list, max_length: int = 512) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=max_length,
+            return_tensors="pt",
+        ).to(self.device)
+        with torch.no_grad():
+            hidden = self.model(**tokens).last_hidden_state.float()
+        embeddings = mean_pool(hidden, tokens.attention_mask)
+        return embeddings.cpu().numpy().astype("float32")
+
+
+class SentenceEncoder(QueryEncoder):
+    def __init__(self, model_name: str, device: torch.device):
+        self.device = device
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).to(device)
+        self.model.eval()
+        self.encoder_id = f"sentence:{model_name}"
+
+    def encode(self, texts: list, max_length: int = 512) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=max_length,
+            return_tensors="pt",
+        ).to(self.device)
+        with torch.no_grad():
+            hidden = self.model(**tokens).last_hidden_state.float()
+        embeddings = mean_pool(hidden, tokens.attention_mask)
+        embeddings = torch.nn.functional.normalize(embeddings, dim=-1)
+        return embeddings.cpu().numpy().astype("float32")
+
+
+class OnnxEncoder(QueryEncoder):
+    def __init__(self, onnx_dir: str):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise RuntimeError(
+                ">>> Please install onnxruntime first: pip install onnxruntime"
+            )
+        with open(os.path.join(onnx_dir, "encoder.json"), "r") as f:
+            self.config = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(onnx_dir, self.config["model_file"]),
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.encoder_id = self.config["encoder_id"]
+
+    def encode(self, texts: list, max_length: int = 512) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=max_length,
+            return_tensors="np",
+        )
+        feeds = {
+            k: v.astype("int64") for k, v in tokens.items() if k in self.input_names
+        }
+        hidden = self.session.run(None, feeds)[0].astype("float32")
+        mask = tokens["attention_mask"][..., None].astype("float32")
+        embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1, None)
+        if self.config.get("normalize"):
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+        return embeddings.astype("float32")
+
+
+def get_encoder(
+    model_name: str,
+    device: torch.device,
+    encoder_type: Optional[str] = None,
+    layer: Optional[int] = None,
+    base_model: Optional[torch.nn.Module] = None,
+    tokenizer=None,
+) -> QueryEncoder:
+    encoder_type = encoder_type or get_env("ENCODER", "llama")
+    layer = get_env("ENCODER_LAYER", None, int) if layer is None else layer
+    if encoder_type == "llama":
+        return LlamaMeanPoolEncoder(
+            model_name=model_name,
+            device=device,
+            layer=layer,
+            model=base_model,
+            tokenizer=tokenizer,
+        )
+    elif encoder_type == "llama-int8":
+        return LlamaMeanPoolEncoder(
+            model_name=model_name, device=device, quantize=True, layer=layer
+        )
+    elif encoder_type == "sentence":
+        return SentenceEncoder(
+            model_name=get_env("ENCODER_MODEL", DEFAULT_SENTENCE_MODEL), device=device
+        )
+    elif encoder_type == "onnx":
+        onnx_dir = get_env(
+            "ENCODER_ONNX_DIR", os.path.join(get_path(key="MODELS"), "encoder_onnx")
+        )
+        return OnnxEncoder(onnx_dir=onnx_dir)
+    raise ValueError(
+        f">>> Unknown encoder: {encoder_type} (choose from {ENCODER_TYPES})"
+    )
+
+
+def check_encoder(index_encoder_id: str, encoder: QueryEncoder) -> None:
+    # Vectors from different encoders live in different spaces; never mix them
+    if index_encoder_id != encoder.encoder_id:
+        raise ValueError(
+            f">>> Index was built with encoder '{index_encoder_id}', "
+            f"but queries use '{encoder.encoder_id}'. Re-embed the corpus first."
+        )
@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import faiss
+import numpy as np
+from typing import Any, Optional
+from lib.config import get_env
+from lib.embedding_store import DEFAULT_ENCODER_ID, encoder_slug
+from lib.path import get_path
+
+# === Index Types ===
+# flat  : exact brute-force L2 scan (the original behaviour)
+# ivf   : inverted lists over k-means cells, searches `nprobe` cells
+# hnsw  : graph index, no training, search breadth set by `ef_search`
+# sq8   : exact scan over 8-bit scalar-quantized vectors (4x smaller)
+# ivfpq : inverted lists + product quantization, smallest and fastest
+INDEX_TYPES = ("flat", "ivf", "hnsw", "sq8", "ivfpq")
+
+
+def get_index_path(index_type: str, encoder_id: Optional[str] = None) -> str:
+    name = f"laws_{index_type}.faiss"
+    if encoder_id and encoder_id != DEFAULT_ENCODER_ID:
+        name = f"laws_{encoder_slug(encoder_id)}_{index_type}.faiss"
+    return os.path.join(get_path(key="DATA"), "embeddings", name)
+
+
+def default_nlist(n_vectors: int) -> int:
+    # ~4*sqrt(N) cells, keeping at least 39 training points per cell as FAISS expects
+    return max(1, min(int(4 * np.sqrt(n_vectors)), n_vectors // 39))
+
+
+def factory_string(
+    index_type: str,
+    n_vectors: int,
+    dim: int,
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    pq_m: Optional[int] = None,
+) -> str:
+    nlist = nlist or default_nlist(n_vectors)
+    if index_type == "flat":
+        return "Flat"
+    elif index_type == "ivf":
+        return f"IVF{nlist},Flat"
+    elif index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+    elif index_type == "sq8":
+        return "SQ8"
+    elif index_type == "ivfpq":
+        # PQ needs the dimension to split evenly into sub-quantizers
+        pq_m = pq_m or next(m for m in (64, 48, 32, 16, 8, 4, 2, 1) if dim % m == 0)
+        # 2^nbits codewords per sub-quantizer, again ~39 training points each
+        nbits = int(np.clip(np.log2(max(n_vectors, 1) / 39), 1, 8))
+        return f"IVF{nlist},PQ{pq_m}x{nbits}"
+    raise ValueError(
+        f">>> Unknown index type: {index_type} (choose from {INDEX_TYPES})"
+    )
+
+
+def set_search_params(
+    index: Any, nprobe: Optional[int] = None, ef_search: Optional[int] = None
+) -> Any:
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None and nprobe:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    if hasattr(index, "hnsw") and ef_search:
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def build_index(
+    embeddings: np.ndarray,
+    index_type: str = "flat",
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    pq_m: Optional[int] = None,
+) -> Any:
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    n_vectors, dim = embeddings.shape
+    desc = factory_string(index_type, n_vectors, dim, nlist, hnsw_m, pq_m)
+    index = faiss.index_factory(dim, desc, faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add(embeddings)
+    return index
+
+
+def save_index(index: Any, path: str, meta: Optional[dict] = None) -> dict:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written aside and renamed over the old file: a running server has the previous
+    # index mmapped and keeps its inode, a loader never sees a partial index
+    tmp_path = f"{path}.tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+    index_meta = dict(meta or {})
+    index_meta.update({"ntotal": int(index.ntotal), "dim": int(index.d)})
+    # Identifies this build, e.g. for invalidating cached search results
+    index_meta.setdefault("version", time.strftime("%Y%m%dT%H%M%S"))
+    with open(f"{path}.json.tmp", "w") as f:
+        json.dump(index_meta, f, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.json.tmp", f"{path}.json")
+    return index_meta
+
+
+def load_index_meta(path: str) -> dict:
+    meta_path = f"{path}.json"
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path, "r") as f:
+        return json.load(f)
+
+
+def get_index_version(
+    encoder_id: str = DEFAULT_ENCODER_ID, index_type: Optional[str] = None
+) -> str:
+    index_type = index_type or get_env("INDEX_TYPE", "flat")
+    return index_version(
+        index_type, load_index_meta(get_index_path(index_type, encoder_id))
+    )
+
+
+def index_version(index_type: str, meta: dict) -> str:
+    return f"{index_type}:{meta.get('version', '')}"
+
+
+def load_index(path: str, mmap: bool = True) -> Any:
+    if mmap:
+        try:
+            # Inverted lists and flat codes are paged in from disk instead of copied
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            print(f">>> mmap not supported for {path}, reading into memory: {e}")
+    return faiss.read_index(path)
+
+
+def load_or_build_index(
+    embeddings: np.ndarray,
+    index_type: Optional[str] = None,
+    encoder_id: str = DEFAULT_ENCODER_ID,
+    fingerprint: Optional[str] = None,
+) -> tuple:
+    """
+    (index, version) of the saved index for these embeddings, rebuilt when its
+    metadata does not match: row count, encoder and (if given) the store fingerprint,
+    so re-embedding a corpus of the same size never serves vectors of the previous
+    run. The version is that of the index returned, including a fresh build.
+    """
+    index_type = index_type or get_env("INDEX_TYPE", "flat")
+    nprobe = get_env("INDEX_NPROBE", 16, int)
+    ef_search = get_env("INDEX_EF_SEARCH", 64, int)
+    path = get_index_path(index_type, encoder_id)
+
+    meta = load_index_meta(path)
+    fresh = (
+        meta.get("ntotal") == len(embeddings)
+        and meta.get("encoder_id", DEFAULT_ENCODER_ID) == encoder_id
+        and (fingerprint is None or meta.get("store_fingerprint") == fingerprint)
+    )
+    if os.path.exists(path) and fresh:
+        print(f">>> Loading {index_type} index from: {path}")
+        index = load_index(path)
+    else:
+        print(f">>> Building {index_type} index for {len(embeddings)} vectors...")
+        time_s = time.time()
+        index = build_index(embeddings, index_type=index_type)
+        build_meta = {
+            "index_type": index_type,
+            "encoder_id": encoder_id,
+            "store_fingerprint": fingerprint,
+            "build_seconds": round(time.time() - time_s, 2),
+        }
+        if fingerprint:
+            # Two builds within the same second still get different versions
+            build_meta["version"] = (
+                f"{time.strftime('%Y%m%dT%H%M%S')}-{fingerprint[:8]}"
+            )
+        meta = save_index(index, path, meta=build_meta)
+        print(f">>> Index saved to: {path}")
+    index = set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+    return index, index_version(index_type, meta)
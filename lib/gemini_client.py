@@ -0,0 +1,274 @@
+import time
+import random
+import asyncio
+from queue import Queue
+from collections import deque
+from threading import Lock, Thread
+from concurrent.futures import Future
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional
+
+# HTTP statuses worth retrying: timeout, rate limit, transient server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class GeminiTimeout(TimeoutError):
+    pass
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, (asyncio.TimeoutError, GeminiTimeout, ConnectionError)):
+        return True
+    # google.genai.errors.APIError carries `code`, httpx.HTTPStatusError a response
+    code = getattr(e, "code", None)
+    if code is None:
+        code = getattr(getattr(e, "response", None), "status_code", None)
+    if code in RETRYABLE_STATUS:
+        return True
+    # httpx transport errors (connect/read timeouts, resets) are not HTTP statuses
+    return type(e).__module__.startswith("httpx") and "Status" not in type(e).__name__
+
+
+class AsyncGeminiClient:
+    """
+    Runs `generate_fn(prompt, max_token)` coroutines on a private event loop thread.
+    At most `max_concurrency` calls are in flight; each call has a deadline covering
+    every attempt, retryable errors back off exponentially (with jitter) until the
+    deadline or `max_retries`, and with `hedge_after` set a duplicate request is sent
+    when the first one is still pending after that many seconds (first answer wins).
+    `stream_fn(prompt, max_token)` async iterators go through the same slots and
+    deadline; they are retried only until their first chunk was handed out.
+    """
+
+    def __init__(
+        self,
+        generate_fn: Callable[[str, int], Awaitable[str]],
+        max_concurrency: int = 8,
+        timeout: float = 60.0,
+        deadline: float = 120.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedge_after: Optional[float] = None,
+        stream_fn: Optional[Callable[[str, int], AsyncIterator[str]]] = None,
+    ):
+        self.generate_fn = generate_fn
+        self.stream_fn = stream_fn
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after if hedge_after and hedge_after > 0 else None
+
+        self.loop = asyncio.new_event_loop()
+        self.slots = None
+        self.stats_lock = Lock()
+        self.counts = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "timeouts": 0,
+            "failures": 0,
+        }
+        self.latencies = deque(maxlen=1000)
+        self.worker = Thread(target=self._run_loop, name="gemini-client", daemon=True)
+        self.worker.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        self.loop.run_forever()
+
+    def submit(
+        self, prompt: str, max_token: int, deadline: Optional[float] = None
+    ) -> Future:
+        """Schedule a call from any thread; `deadline` is in seconds from now."""
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        return asyncio.run_coroutine_threadsafe(
+            self.agenerate(prompt, max_token, expires_at), self.loop
+        )
+
+    def generate(
+        self, prompt: str, max_token: int, deadline: Optional[float] = None
+    ) -> str:
+        return self.submit(prompt, max_token, deadline).result()
+
+    def stream(
+        self, prompt: str, max_token: int, deadline: Optional[float] = None
+    ) -> Iterator[str]:
+        """Chunks of `stream_fn` from any thread; its errors are raised at the end."""
+        if self.stream_fn is None:
+            raise ValueError(">>> AsyncGeminiClient has no stream_fn")
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        chunks = Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self.astream(prompt, max_token, expires_at, chunks), self.loop
+        )
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    break
+                yield chunk
+            future.result()
+        finally:
+            # A consumer that stops early releases the slot
+            future.cancel()
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            ordered = sorted(self.latencies)
+            counts = dict(self.counts)
+
+        def percentile(q: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(
+                1000 * ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3
+            )
+
+        return {
+            **counts,
+            "max_concurrency": self.max_concurrency,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+    def _count(self, key: str) -> None:
+        with self.stats_lock:
+            self.counts[key] += 1
+
+    # === Event loop side ===
+    async def agenerate(self, prompt: str, max_token: int, expires_at: float) -> str:
+        self._count("calls")
+        time_s = time.perf_counter()
+        try:
+            text = await self._with_retries(
+                lambda: self._hedged(prompt, max_token, expires_at), expires_at
+            )
+        except GeminiTimeout:
+            self._count("timeouts")
+            raise
+        except Exception:
+            self._count("failures")
+            raise
+        with self.stats_lock:
+            self.latencies.append(time.perf_counter() - time_s)
+        return text
+
+    async def astream(
+        self, prompt: str, max_token: int, expires_at: float, chunks: Queue
+    ) -> None:
+        # Chunks go to `chunks`, then None marks the end (also after an error)
+        self._count("calls")
+        time_s = time.perf_counter()
+        sent = []
+        try:
+            await self._with_retries(
+                lambda: self._stream_attempt(
+                    prompt, max_token, expires_at, chunks, sent
+                ),
+                expires_at,
+                can_retry=lambda: not sent,
+            )
+        except GeminiTimeout:
+            self._count("timeouts")
+            raise
+        except Exception:
+            self._count("failures")
+            raise
+        finally:
+            chunks.put(None)
+        with self.stats_lock:
+            self.latencies.append(time.perf_counter() - time_s)
+
+    async def _with_retries(
+        self,
+        call: Callable[[], Awaitable],
+        expires_at: float,
+        can_retry: Callable[[], bool] = lambda: True,
+    ):
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except Exception as e:
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    raise GeminiTimeout(f"Gemini deadline exceeded: {e!r}") from e
+                retry = is_retryable(e) and can_retry()
+                if not retry or attempt >= self.max_retries:
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+                delay = random.uniform(delay / 2, delay)
+                if delay >= remaining:
+                    raise GeminiTimeout(f"Gemini deadline exceeded: {e!r}") from e
+                print(f">>> [Gemini] Retry {attempt + 1} in {delay:.2f} s: {e!r}")
+                self._count("retries")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, prompt: str, max_token: int, expires_at: float) -> str:
+        async with self.slots:
+            self._count("attempts")
+            return await self._wait(self.generate_fn(prompt, max_token), expires_at)
+
+    async def _wait(self, awaitable: Awaitable, expires_at: float):
+        # asyncio.TimeoutError is not the built-in TimeoutError before Python 3.11
+        timeout = min(self.timeout, expires_at - time.monotonic())
+        if timeout <= 0:
+            raise GeminiTimeout("Gemini deadline exceeded")
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError as e:
+            raise GeminiTimeout(f"Gemini call timed out after {timeout:.1f} s") from e
+
+    async def _stream_attempt(
+        self, prompt: str, max_token: int, expires_at: float, chunks: Queue, sent: list
+    ) -> None:
+        # `timeout` bounds the wait for each chunk, the deadline the whole stream
+        async with self.slots:
+            self._count("attempts")
+            stream = self.stream_fn(prompt, max_token).__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await self._wait(stream.__anext__(), expires_at)
+                    except StopAsyncIteration:
+                        return
+                    sent.append(len(chunk))
+                    chunks.put(chunk)
+            finally:
+                if hasattr(stream, "aclose"):
+                    await stream.aclose()
+
+    async def _hedged(self, prompt: str, max_token: int, expires_at: float) -> str:
+        if self.hedge_after is None:
+            return await self._attempt(prompt, max_token, expires_at)
+
+        first = asyncio.ensure_future(self._attempt(prompt, max_token, expires_at))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        self._count("hedges")
+        second = asyncio.ensure_future(self._attempt(prompt, max_token, expires_at))
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if task is second:
+                        self._count("hedge_wins")
+                    return task.result()
+                error = task.exception()
+        raise error
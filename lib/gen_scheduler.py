@@ -0,0 +1,304 @@
+import time
+import torch
+import torch.nn.functional as F
+from threading import Lock, Thread
+from queue import Queue, Empty
+from typing import Any, Optional
+from concurrent.futures import Future
+from transformers import DynamicCache
+from lib.prefix_cache import PrefixCache
+
+
+class _Request:
+    def __init__(self, input_ids, max_new_tokens, do_sample, temperature, top_p, n):
+        self.input_ids = input_ids
+        self.max_new_tokens = max_new_tokens
+        self.do_sample = do_sample
+        self.temperature = temperature
+        self.top_p = top_p
+        self.n = n
+        self.outputs = [None] * n
+        self.remaining = n
+        # Prefix KV cache from PrefixCache.encode; prefill then covers the rest only
+        self.cache = None
+        # Optional TextIteratorStreamer fed every sampled token (n == 1 only)
+        self.streamer = None
+        self.future = Future()
+        self.submitted_at = time.perf_counter()
+
+
+class _Sequence:
+    def __init__(self, request: _Request, slot: int, position: int):
+        self.request = request
+        self.slot = slot
+        # Position id of the next token fed to the model (prompt tokens are 0..n-1)
+        self.position = position
+        self.tokens = []
+
+
+class GenerationScheduler:
+    """
+    Continuous batching for a causal LM. One worker thread owns the model: every
+    iteration admits waiting requests (a prefill pass, then their KV cache joins the
+    running batch, left-padded), runs a single decode step for all active sequences
+    and retires the finished ones. A new request therefore starts after at most one
+    token of the others instead of waiting for their whole answers.
+    Every forward pass holds `lock`, so callers running the same model outside the
+    scheduler (e.g. a single scoring pass) take that lock to interleave safely.
+    """
+
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        device,
+        max_batch_size: int = 8,
+        prefix_cache: Optional[PrefixCache] = None,
+        lock: Optional[Lock] = None,
+    ):
+        self.model = model
+        self.model_lock = lock if lock is not None else Lock()
+        self.tokenizer = tokenizer
+        self.device = device
+        self.prefix_cache = prefix_cache
+        self.max_batch_size = max(1, max_batch_size)
+        config = model.generation_config
+        eos = config.eos_token_id
+        if eos is None:
+            eos = tokenizer.eos_token_id
+        self.eos_ids = set(eos if isinstance(eos, (list, tuple)) else [eos])
+        # Sampling defaults follow the model's generation_config, like generate()
+        self.default_do_sample = bool(config.do_sample)
+        self.default_top_p = config.top_p if config.top_p is not None else 1.0
+
+        self.queue = Queue()
+        self.waiting = None
+        self.active = []
+        self.cache = None
+        self.mask = None
+        self.stats_lock = Lock()
+        self.n_requests = 0
+        self.n_tokens = 0
+        self.n_steps = 0
+        self.batch_rows = 0
+        self.worker = Thread(target=self._loop, name="gen-scheduler", daemon=True)
+        self.worker.start()
+
+    def submit(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        do_sample: Optional[bool] = None,
+        temperature: float = 1.0,
+        top_p: Optional[float] = None,
+        n: int = 1,
+        streamer: Optional[Any] = None,
+    ) -> Future:
+        """
+        Queue a prompt; the Future resolves to a list of `n` decoded answers.
+        A `streamer` (TextIteratorStreamer, skip_prompt=False) also receives every
+        token as it is sampled and is ended when the answer finishes or fails.
+        """
+        if streamer is not None and n != 1:
+            raise ValueError(">>> Streaming needs n == 1")
+        cache = None
+        if self.prefix_cache is not None:
+            input_ids, cache = self.prefix_cache.encode(prompt)
+        else:
+            input_ids = self.tokenizer(prompt, return_tensors="pt").input_ids
+        request = _Request(
+            input_ids=input_ids,
+            max_new_tokens=max(1, max_new_tokens),
+            do_sample=self.default_do_sample if do_sample is None else do_sample,
+            temperature=temperature,
+            top_p=self.default_top_p if top_p is None else top_p,
+            n=max(1, n),
+        )
+        request.cache = cache
+        request.streamer = streamer
+        self.queue.put(request)
+        return request.future
+
+    def generate(self, prompt: str, max_new_tokens: int, **kwargs) -> list:
+        timeout = kwargs.pop("timeout", None)
+        return self.submit(prompt, max_new_tokens, **kwargs).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            mean_batch = self.batch_rows / self.n_steps if self.n_steps else 0.0
+            return {
+                "requests": self.n_requests,
+                "tokens": self.n_tokens,
+                "steps": self.n_steps,
+                "mean_batch_size": round(mean_batch, 2),
+                "active": len(self.active),
+                "queue_depth": self.queue.qsize(),
+            }
+
+    # === Worker ===
+    def _loop(self) -> None:
+        while True:
+            self._admit()
+            if not self.active:
+                continue
+            try:
+                self._step()
+            except Exception as e:
+                print(f">>> [GenerationScheduler] Decode step failed: {str(e)}")
+                for request in {id(s.request): s.request for s in self.active}.values():
+                    if not request.future.done():
+                        self._fail(request, e)
+                self.active, self.cache, self.mask = [], None, None
+
+    def _admit(self) -> None:
+        # Blocks only when nothing is running; otherwise takes what is already queued
+        while True:
+            if self.waiting is None:
+                try:
+                    self.waiting = self.queue.get(block=not self.active)
+                except Empty:
+                    return
+            if self.active and len(self.active) + self.waiting.n > self.max_batch_size:
+                return
+            request, self.waiting = self.waiting, None
+            try:
+                self._prefill(request)
+            except Exception as e:
+                print(f">>> [GenerationScheduler] Prefill failed: {str(e)}")
+                self._fail(request, e)
+
+    def _fail(self, request: _Request, error: Exception) -> None:
+        request.future.set_exception(error)
+        if request.streamer is not None:
+            # Unblock the consumer
+            request.streamer.end()
+
+    def _prefill(self, request: _Request) -> None:
+        input_ids = request.input_ids.to(self.device)
+        cache = request.cache if request.cache is not None else DynamicCache()
+        cached = cache.get_seq_length()
+        request.cache = None
+        with self.model_lock, torch.no_grad():
+            output = self.model(
+                input_ids=input_ids[:, cached:], past_key_values=cache, use_cache=True
+            )
+        logits = output.logits[:, -1, :].repeat(request.n, 1)
+        keys = [k.repeat(request.n, 1, 1, 1) for k in cache.key_cache]
+        values = [v.repeat(request.n, 1, 1, 1) for v in cache.value_cache]
+        mask = torch.ones(
+            (request.n, input_ids.shape[1]), dtype=torch.long, device=self.device
+        )
+        self._merge(keys, values, mask)
+
+        with self.stats_lock:
+            self.n_requests += 1
+        prompt_length = input_ids.shape[1]
+        for slot in range(request.n):
+            sequence = _Sequence(request, slot, position=prompt_length)
+            self._append(sequence, self._sample(logits[slot], request))
+            self.active.append(sequence)
+        self._retire()
+
+    def _merge(self, keys: list, values: list, mask: torch.Tensor) -> None:
+        if self.cache is None:
+            self.cache = DynamicCache()
+            self.cache.key_cache, self.cache.value_cache = keys, values
+            self.mask = mask
+            return
+        # Left-pad whichever side is shorter so the time axes line up
+        length = max(self.mask.shape[1], mask.shape[1])
+
+        def pad(t: torch.Tensor) -> torch.Tensor:
+            return F.pad(t, (0, 0, length - t.shape[2], 0))
+
+        self.cache.key_cache = [
+            torch.cat([pad(a), pad(b)]) for a, b in zip(self.cache.key_cache, keys)
+        ]
+        self.cache.value_cache = [
+            torch.cat([pad(a), pad(b)]) for a, b in zip(self.cache.value_cache, values)
+        ]
+        self.mask = torch.cat(
+            [
+                F.pad(self.mask, (length - self.mask.shape[1], 0)),
+                F.pad(mask, (length - mask.shape[1], 0)),
+            ]
+        )
+
+    def _step(self) -> None:
+        input_ids = torch.tensor(
+            [[s.tokens[-1]] for s in self.active], dtype=torch.long, device=self.device
+        )
+        position_ids = torch.tensor(
+            [[s.position] for s in self.active], dtype=torch.long, device=self.device
+        )
+        self.mask = F.pad(self.mask, (0, 1), value=1)
+        with self.model_lock, torch.no_grad():
+            output = self.model(
+                input_ids=input_ids,
+                attention_mask=self.mask,
+                position_ids=position_ids,
+                past_key_values=self.cache,
+                use_cache=True,
+            )
+        logits = output.logits[:, -1, :]
+        for row, sequence in enumerate(self.active):
+            self._append(sequence, self._sample(logits[row], sequence.request))
+            sequence.position += 1
+        with self.stats_lock:
+            self.n_steps += 1
+            self.batch_rows += len(self.active)
+        self._retire()
+
+    def _append(self, sequence: _Sequence, token: int) -> None:
+        sequence.tokens.append(token)
+        if sequence.request.streamer is not None:
+            sequence.request.streamer.put(torch.tensor([token]))
+
+    def _sample(self, logits: torch.Tensor, request: _Request) -> int:
+        if not request.do_sample:
+            return int(torch.argmax(logits))
+        probs = torch.softmax(logits.float() / max(request.temperature, 1e-5), dim=-1)
+        if request.top_p < 1.0:
+            sorted_probs, indices = torch.sort(probs, descending=True)
+            keep = torch.cumsum(sorted_probs, dim=-1) - sorted_probs < request.top_p
+            sorted_probs = sorted_probs * keep
+            choice = torch.multinomial(sorted_probs / sorted_probs.sum(), 1)
+            return int(indices[choice])
+        return int(torch.multinomial(probs, 1))
+
+    def _finished(self, sequence: _Sequence) -> bool:
+        return (
+            sequence.tokens[-1] in self.eos_ids
+            or len(sequence.tokens) >= sequence.request.max_new_tokens
+        )
+
+    def _retire(self) -> None:
+        keep = [i for i, s in enumerate(self.active) if not self._finished(s)]
+        if len(keep) == len(self.active):
+            return
+        for sequence in self.active:
+            if not self._finished(sequence):
+                continue
+            tokens = [t for t in sequence.tokens if t not in self.eos_ids]
+            request = sequence.request
+            request.outputs[sequence.slot] = self.tokenizer.decode(
+                tokens, skip_special_tokens=True
+            )
+            request.remaining -= 1
+            with self.stats_lock:
+                self.n_tokens += len(sequence.tokens)
+            if request.remaining == 0:
+                request.future.set_result(request.outputs)
+                if request.streamer is not None:
+                    request.streamer.end()
+
+        self.active = [self.active[i] for i in keep]
+        if not self.active:
+            self.cache, self.mask = None, None
+            return
+        rows = torch.tensor(keep, device=self.device)
+        # Drop the left-padding columns no remaining sequence needs
+        first = int((self.mask[rows].sum(dim=0) > 0).nonzero()[0])
+        self.mask = self.mask[rows, first:]
+        self.cache.key_cache = [k[rows, :, first:] for k in self.cache.key_cache]
+        self.cache.value_cache = [v[rows, :, first:] for v in self.cache.value_cache]
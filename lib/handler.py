@@ -1,8 +1,21 @@
-import requests
+import hmac
+import time
+from typing import Any, Optional
+from linebot.v3.webhooks import MessageEvent, TextMessageContent
+from lib.http_pool import line_session
+from lib.config import get_env
 
+# Reply tokens expire about a minute after the event; older jobs are pushed instead
+REPLY_TOKEN_TTL = get_env("REPLY_TOKEN_TTL", 50, float)
+BUSY_MESSAGE = "⚠️ 系統忙碌中，請稍後再試。"
 
-def update_line_webhook(public_url: str, access_token: str):
-    api_url = "https://api.line.me/v2/bot/channel/webhook/endpoint"
+
+def update_line_webhook(
+    public_url: str, access_token: str, api_host: Optional[str] = None
+):
+    # api_host: LINE_API_HOST in .env, e.g. a stand-in API (default: LINE's own)
+    api_host = api_host or "https://api.line.me"
+    api_url = f"{api_host.rstrip('/')}/v2/bot/channel/webhook/endpoint"
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json",
@@ -10,5 +23,41 @@ def update_line_webhook(public_url: str, access_token: str):
     full_url = public_url.rstrip("/") + "/callback"
     print(f">>> Try to update webhook to: {full_url}")
     payload = {"endpoint": full_url}
-    response = requests.put(api_url, headers=headers, json=payload)
+    response = line_session.put(api_url, headers=headers, json=payload)
     print(f">>> LINE Webhook Update Status: {response.status_code} - {response.text}")
+
+
+# === Webhook Jobs (shared by the Flask and the FastAPI entry points) ===
+def job_from_event(event: Any) -> Optional[dict]:
+    """The answer job of a LINE text message event; None for any other event."""
+    if not isinstance(event, MessageEvent) or not isinstance(
+        event.message, TextMessageContent
+    ):
+        return None
+    source = event.source
+    return {
+        "text": event.message.text,
+        "reply_token": event.reply_token,
+        "target_id": getattr(source, "user_id", None)
+        or getattr(source, "group_id", None)
+        or getattr(source, "room_id", None),
+        "received_at": time.time(),
+    }
+
+
+def can_reply(received_at: float) -> bool:
+    # Past the TTL the reply token is likely expired: push straight away
+    return time.time() - received_at < REPLY_TOKEN_TTL
+
+
+def token_error(authorization: str, secret: str) -> Optional[int]:
+    """
+    HTTP status refusing an `Authorization: Bearer` header, None if it carries
+    `secret`: 403 while the route is disabled (empty secret), 401 for a wrong token.
+    """
+    if not secret:
+        return 403
+    token = (authorization or "").removeprefix("Bearer ")
+    if not hmac.compare_digest(token.encode(), secret.encode()):
+        return 401
+    return None
@@ -0,0 +1,31 @@
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from lib.config import get_env
+
+HTTP_POOL_SIZE = get_env("HTTP_POOL_SIZE", 16, int)
+GEMINI_HTTP_TIMEOUT = get_env("GEMINI_HTTP_TIMEOUT", 120, float)
+
+# === Keep-alive pools shared by all outbound calls (one TLS handshake per host) ===
+line_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+line_session.mount("https://", _adapter)
+line_session.mount("http://", _adapter)
+
+gemini_http_client = httpx.Client(
+    limits=httpx.Limits(
+        max_connections=HTTP_POOL_SIZE,
+        max_keepalive_connections=HTTP_POOL_SIZE,
+        keepalive_expiry=60,
+    ),
+    timeout=httpx.Timeout(GEMINI_HTTP_TIMEOUT),
+)
+# Used only from the AsyncGeminiClient event loop thread
+gemini_async_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=HTTP_POOL_SIZE,
+        max_keepalive_connections=HTTP_POOL_SIZE,
+        keepalive_expiry=60,
+    ),
+    timeout=httpx.Timeout(GEMINI_HTTP_TIMEOUT),
+)
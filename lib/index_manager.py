@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import shutil
+import faiss
+import numpy as np
+from threading import Lock, Thread
+from typing import Any, Callable, Iterator, Optional, Sequence
+from lib.faiss_index import get_index_path
+from lib.path import get_path
+
+CURRENT_FILE = "CURRENT"
+
+
+class IndexBuildBusy(RuntimeError):
+    pass
+
+
+def get_snapshot_dir(index_type: str, encoder_id: Optional[str] = None) -> str:
+    # data/embeddings/snapshots/laws_flat/, next to the index the snapshots derive from
+    name = os.path.splitext(os.path.basename(get_index_path(index_type, encoder_id)))[0]
+    return os.path.join(get_path(key="DATA"), "embeddings", "snapshots", name)
+
+
+class SnapshotTexts:
+    """Article id -> text: the store's texts (id = row) plus texts added by updates."""
+
+    def __init__(self, base: Sequence[str], added: Optional[dict] = None):
+        self.base = base
+        self.added = added or {}
+
+    def __getitem__(self, article_id: int) -> str:
+        text = self.added.get(int(article_id))
+        return text if text is not None else self.base[article_id]
+
+
+class IndexSnapshot:
+    """
+    One immutable version of the searchable corpus. Row r of the FAISS index holds
+    article `ids[r]`; deleted rows stay in the index and are filtered out of the
+    results, so deleting never renumbers anything. `search` returns article ids.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        index: Any,
+        ids: np.ndarray,
+        alive: np.ndarray,
+        texts: SnapshotTexts,
+        base_version: str,
+    ):
+        self.version = version
+        self.index = index
+        self.ids = ids
+        self.alive = alive
+        self.texts = texts
+        self.base_version = base_version
+        self.n_deleted = int(len(alive) - alive.sum())
+        # Per-version companions attached by IndexManager.on_build (citation index)
+        self.extras = {}
+
+    @classmethod
+    def base(cls, index: Any, texts: Sequence[str], version: str) -> "IndexSnapshot":
+        n = int(index.ntotal)
+        ids = np.arange(n, dtype="int64")
+        alive = np.ones(n, dtype=bool)
+        return cls(version, index, ids, alive, SnapshotTexts(texts), version)
+
+    @property
+    def ntotal(self) -> int:
+        return len(self.ids) - self.n_deleted
+
+    @property
+    def is_sharded(self) -> bool:
+        return getattr(self.index, "is_sharded", False)
+
+    def row_of(self, article_id: int) -> Optional[int]:
+        # ids only ever grow, so the row is found by binary search
+        row = int(np.searchsorted(self.ids, article_id))
+        if row < len(self.ids) and self.ids[row] == article_id and self.alive[row]:
+            return row
+        return None
+
+    def search(self, x: np.ndarray, k: int, **kwargs) -> tuple:
+        # Ask for enough extra rows that deleted ones can be dropped
+        distances, rows = self.index.search(x, k + self.n_deleted, **kwargs)
+        out_d = np.full((len(x), k), np.inf, dtype="float32")
+        out_i = np.full((len(x), k), -1, dtype="int64")
+        for q in range(len(x)):
+            valid = rows[q][rows[q] >= 0]
+            keep = valid[self.alive[valid]][:k]
+            out_d[q, : len(keep)] = distances[q][rows[q] >= 0][self.alive[valid]][:k]
+            out_i[q, : len(keep)] = self.ids[keep]
+        return out_d, out_i
+
+    def live_items(self) -> Iterator[tuple]:
+        for row in np.flatnonzero(self.alive):
+            article_id = int(self.ids[row])
+            yield article_id, self.texts[article_id]
+
+
+def save_snapshot(snapshot: IndexSnapshot, snapshot_dir: str, keep: int = 3) -> str:
+    path = os.path.join(snapshot_dir, snapshot.version)
+    os.makedirs(path, exist_ok=True)
+    faiss.write_index(snapshot.index, os.path.join(path, "index.faiss"))
+    np.save(os.path.join(path, "ids.npy"), snapshot.ids)
+    np.save(os.path.join(path, "alive.npy"), snapshot.alive)
+    with open(os.path.join(path, "texts.json"), "w") as f:
+        json.dump(snapshot.texts.added, f, ensure_ascii=False)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        meta = {
+            "version": snapshot.version,
+            "base_version": snapshot.base_version,
+            "ntotal": snapshot.ntotal,
+            "deleted": snapshot.n_deleted,
+        }
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    # The pointer moves last, so a crash mid-save keeps the previous version current
+    tmp_path = os.path.join(snapshot_dir, f"{CURRENT_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(snapshot.version)
+    os.replace(tmp_path, os.path.join(snapshot_dir, CURRENT_FILE))
+
+    # Older versions beyond `keep` are removed, newest (by mtime) first kept
+    versions = [
+        os.path.join(snapshot_dir, name)
+        for name in os.listdir(snapshot_dir)
+        if os.path.isdir(os.path.join(snapshot_dir, name))
+    ]
+    versions.sort(key=os.path.getmtime, reverse=True)
+    for old in versions[max(keep, 1) :]:
+        if old != path:
+            shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def load_snapshot(
+    snapshot_dir: str, base_texts: Sequence[str], base_version: str
+) -> Optional[IndexSnapshot]:
+    # Only snapshots derived from the index currently on disk can be reused
+    current = os.path.join(snapshot_dir, CURRENT_FILE)
+    if not os.path.exists(current):
+        return None
+    with open(current, "r") as f:
+        path = os.path.join(snapshot_dir, f.read().strip())
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        meta = json.load(f)
+    if meta["base_version"] != base_version:
+        print(f">>> Ignoring index snapshot {meta['version']} of another base index")
+        return None
+    with open(os.path.join(path, "texts.json"), "r") as f:
+        added = {int(k): v for k, v in json.load(f).items()}
+    return IndexSnapshot(
+        version=meta["version"],
+        index=faiss.read_index(os.path.join(path, "index.faiss")),
+        ids=np.load(os.path.join(path, "ids.npy")),
+        alive=np.load(os.path.join(path, "alive.npy")),
+        texts=SnapshotTexts(base_texts, added),
+        base_version=base_version,
+    )
+
+
+class IndexManager:
+    """
+    Holds the current IndexSnapshot and builds new versions in a background thread:
+    `update()` clones the index, applies deletes/additions (replace = delete + add
+    under a new id) and then swaps the new snapshot in with a single assignment.
+    Searches read `current` once and keep using that snapshot, so they are never
+    blocked and never see a half-applied update. `on_build` attaches per-version
+    companions before the swap, `on_swap` invalidates caches after it.
+    """
+
+    def __init__(
+        self,
+        snapshot: IndexSnapshot,
+        encode_fn: Callable[[list], np.ndarray],
+        snapshot_dir: Optional[str] = None,
+        on_build: Optional[Callable[[IndexSnapshot], None]] = None,
+        on_swap: Optional[Callable[[IndexSnapshot], None]] = None,
+        keep: int = 3,
+        batch_size: int = 32,
+    ):
+        self.encode_fn = encode_fn
+        self.snapshot_dir = snapshot_dir
+        self.on_build = on_build
+        self.on_swap = on_swap
+        self.keep = keep
+        self.batch_size = batch_size
+        self.lock = Lock()
+        self.thread: Optional[Thread] = None
+        self.building: Optional[str] = None
+        self.error: Optional[str] = None
+        self.history = []
+        if on_build is not None:
+            on_build(snapshot)
+        self.current = snapshot
+
+    @property
+    def version(self) -> str:
+        return self.current.version
+
+    def update(
+        self,
+        add: Optional[list] = None,
+        replace: Optional[dict] = None,
+        delete: Optional[list] = None,
+        wait: bool = False,
+    ) -> str:
+        """Start building the next version; returns its version label."""
+        if self.current.is_sharded:
+            raise ValueError(">>> Article updates need an unsharded index")
+        if not (add or replace or delete):
+            raise ValueError(">>> Nothing to update")
+        add, replace, delete = add or [], replace or {}, delete or []
+        if not (
+            isinstance(add, list)
+            and isinstance(replace, dict)
+            and isinstance(delete, list)
+        ):
+            raise TypeError(
+                ">>> Expected add: [text], replace: {id: text}, delete: [id]"
+            )
+        if not all(isinstance(text, str) for text in add + list(replace.values())):
+            raise TypeError(">>> Article texts must be strings")
+        replace = {int(k): v for k, v in replace.items()}
+        delete = [int(i) for i in delete]
+        for article_id in list(replace) + delete:
+            if self.current.row_of(article_id) is None:
+                raise ValueError(f">>> Unknown article id: {article_id}")
+        with self.lock:
+            if self.building is not None:
+                raise IndexBuildBusy(f">>> Index {self.building} is still building")
+            version = time.strftime("%Y%m%dT%H%M%S") + f"-{len(self.history) + 1}"
+            self.building, self.error = version, None
+            self.thread = Thread(
+                target=self._run,
+                args=(version, add, replace, delete),
+                name="index-build",
+                daemon=True,
+            )
+            self.thread.start()
+        if wait:
+            self.thread.join()
+            if self.error is not None:
+                raise RuntimeError(self.error)
+        return version
+
+    def _run(self, version, add, replace, delete) -> None:
+        time_s = time.perf_counter()
+        try:
+            snapshot = self._build(version, add, replace, delete)
+            if self.on_build is not None:
+                self.on_build(snapshot)
+            if self.snapshot_dir:
+                save_snapshot(snapshot, self.snapshot_dir, keep=self.keep)
+            with self.lock:
+                self.history.append(self.current.version)
+                self.current = snapshot
+            if self.on_swap is not None:
+                self.on_swap(snapshot)
+            print(
+                f">>> Index {snapshot.version} live: {snapshot.ntotal} articles, "
+                f"built in {round(time.perf_counter() - time_s, 2)} s"
+            )
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print(f">>> Index build {version} failed: {self.error}")
+        finally:
+            with self.lock:
+                self.building = None
+
+    def _build(self, version, add, replace, delete) -> IndexSnapshot:
+        current = self.current
+        # The copy keeps the running snapshot untouched (and mmapped indexes writable)
+        index = faiss.clone_index(current.index)
+        alive = current.alive.copy()
+        for article_id in list(replace) + delete:
+            alive[current.row_of(article_id)] = False
+
+        new_texts = add + list(replace.values())
+        ids = current.ids
+        added = dict(current.texts.added)
+        if new_texts:
+            for start in range(0, len(new_texts), self.batch_size):
+                batch = new_texts[start : start + self.batch_size]
+                index.add(np.ascontiguousarray(self.encode_fn(batch), dtype="float32"))
+            next_id = int(ids[-1]) + 1 if len(ids) else 0
+            new_ids = np.arange(next_id, next_id + len(new_texts), dtype="int64")
+            ids = np.concatenate([ids, new_ids])
+            alive = np.concatenate([alive, np.ones(len(new_ids), dtype=bool)])
+            added.update(zip(new_ids.tolist(), new_texts))
+        return IndexSnapshot(
+            version=version,
+            index=index,
+            ids=ids,
+            alive=alive,
+            texts=SnapshotTexts(current.texts.base, added),
+            base_version=current.base_version,
+        )
+
+    def status(self) -> dict:
+        with self.lock:
+            current = self.current
+            return {
+                "version": current.version,
+                "base_version": current.base_version,
+                "articles": current.ntotal,
+                "deleted": current.n_deleted,
+                "added": len(current.texts.added),
+                "building": self.building,
+                "error": self.error,
+                "history": list(self.history[-10:]),
+            }
@@ -0,0 +1,105 @@
+import time
+from threading import Lock, Thread
+from queue import Queue, Full
+from collections import deque
+from typing import Any, Callable
+
+
+class JobQueue:
+    """
+    Bounded in-process queue drained by `num_workers` threads, each calling
+    `handler(payload)`. `submit` never blocks: it returns False when the queue is full.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], None],
+        num_workers: int = 2,
+        max_size: int = 64,
+        name: str = "job-queue",
+    ):
+        self.handler = handler
+        self.max_size = max(1, max_size)
+        self.queue = Queue(maxsize=self.max_size)
+        self.stats_lock = Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0
+        # Recent wait times (enqueue -> worker pickup) and handler run times, seconds
+        self.waits = deque(maxlen=1000)
+        self.runs = deque(maxlen=1000)
+        self.workers = [
+            Thread(target=self._loop, name=f"{name}-{i}", daemon=True)
+            for i in range(max(1, num_workers))
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, payload: Any) -> bool:
+        try:
+            self.queue.put_nowait((time.monotonic(), payload))
+        except Full:
+            with self.stats_lock:
+                self.rejected += 1
+            return False
+        with self.stats_lock:
+            self.submitted += 1
+        return True
+
+    def join(self) -> None:
+        """Block until every submitted job has been handled."""
+        self.queue.join()
+
+    def _loop(self) -> None:
+        while True:
+            enqueued_at, payload = self.queue.get()
+            started_at = time.monotonic()
+            with self.stats_lock:
+                self.waits.append(started_at - enqueued_at)
+                self.busy += 1
+            failed = False
+            try:
+                self.handler(payload)
+            except Exception as e:
+                failed = True
+                print(f">>> [JobQueue] Job failed: {str(e)}")
+            finally:
+                with self.stats_lock:
+                    self.runs.append(time.monotonic() - started_at)
+                    self.busy -= 1
+                    self.processed += 1
+                    self.failed += failed
+                self.queue.task_done()
+
+    @staticmethod
+    def _summary(values: deque) -> dict:
+        if not values:
+            return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(values)
+
+        def pick(q: float) -> float:
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+        return {
+            "mean_ms": round(1000 * sum(ordered) / len(ordered), 3),
+            "p50_ms": round(1000 * pick(0.50), 3),
+            "p95_ms": round(1000 * pick(0.95), 3),
+            "max_ms": round(1000 * ordered[-1], 3),
+        }
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "max_size": self.max_size,
+                "workers": len(self.workers),
+                "busy_workers": self.busy,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "processed": self.processed,
+                "failed": self.failed,
+                "wait": self._summary(self.waits),
+                "run": self._summary(self.runs),
+            }
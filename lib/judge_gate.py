@@ -0,0 +1,68 @@
+from threading import Lock
+from collections import Counter
+from lib.query_cache import normalize_query
+
+
+def answer_similarity(answer_x: str, answer_y: str) -> float:
+    """
+    Dice overlap of character bigrams after normalize_query (1.0 = same text).
+    Chinese has no word boundaries, so bigrams stand in for tokens.
+    """
+    x, y = normalize_query(answer_x), normalize_query(answer_y)
+    if x == y:
+        return 1.0
+    grams_x = Counter(x[i : i + 2] for i in range(len(x) - 1))
+    grams_y = Counter(y[i : i + 2] for i in range(len(y) - 1))
+    total = sum(grams_x.values()) + sum(grams_y.values())
+    if total == 0:
+        return 0.0
+    return 2 * sum((grams_x & grams_y).values()) / total
+
+
+class JudgeGate:
+    """
+    Decides whether two candidate answers differ enough to need the judge model.
+    Candidates with `answer_similarity >= threshold` skip it; the time saved is
+    estimated from the mean duration of the judge calls that did run.
+    """
+
+    def __init__(self, threshold: float = 0.9, enabled: bool = True):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.lock = Lock()
+        self.compared = 0
+        self.skipped = 0
+        self.judged = 0
+        self.judge_seconds = 0.0
+
+    def agree(self, answer_x: str, answer_y: str) -> bool:
+        if not self.enabled:
+            return False
+        similarity = answer_similarity(answer_x, answer_y)
+        with self.lock:
+            self.compared += 1
+            if similarity >= self.threshold:
+                self.skipped += 1
+                return True
+        return False
+
+    def record_judge(self, seconds: float) -> None:
+        with self.lock:
+            self.judged += 1
+            self.judge_seconds += seconds
+
+    def stats(self) -> dict:
+        with self.lock:
+            judge_mean = self.judge_seconds / self.judged if self.judged else 0.0
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "compared": self.compared,
+                "skipped": self.skipped,
+                "judged": self.judged,
+                "skip_rate": (
+                    round(self.skipped / self.compared, 3) if self.compared else 0.0
+                ),
+                "judge_mean_ms": round(1000 * judge_mean, 3),
+                "saved_ms_estimate": round(1000 * judge_mean * self.skipped, 3),
+            }
@@ -0,0 +1,73 @@
+import time
+from typing import Callable, Optional
+from lib.judge_gate import JudgeGate
+
+
+class CandidateJudge:
+    """
+    Answer flow shared by the generation backends: answer cache, two candidates
+    from one retrieval, the judge gate and the judge call. Backends only supply
+    `build_context(query, cited)`, `generate(context, query)` returning the two
+    candidates and `judge(answer_x, answer_y)` returning "回答1" or "回答2".
+    """
+
+    def __init__(
+        self,
+        retriever,
+        gate: JudgeGate,
+        build_context: Callable[[str, Optional[list]], str],
+        generate: Callable[[str, str], list],
+        judge: Callable[[str, str], str],
+    ):
+        self.retriever = retriever
+        self.gate = gate
+        self.build_context = build_context
+        self.generate = generate
+        self.judge = judge
+
+    def respond(self, query: str) -> str:
+        # Cited articles go straight into the context: no embedding or cache lookup
+        self.retriever.ensure()
+        cited = self.retriever.cite(query)
+        answer_cache = self.retriever.answer_cache
+        if cited or answer_cache is None:
+            return self.judge_candidates(query, cited=cited)
+        # Near-identical questions answered before skip generation and judgement; the
+        # embedding is cached, so the retrieval below does not encode the query again
+        query_embedding = self.retriever.embed_queries([query], max_length=512)[0]
+        cached = answer_cache.lookup(query_embedding)
+        if cached is not None:
+            print(">>> Answer cache hit")
+            return cached
+
+        answer = self.judge_candidates(query, cited=cited)
+        if not answer.startswith("⚠️"):
+            answer_cache.store(question=query, embedding=query_embedding, answer=answer)
+        return answer
+
+    def judge_candidates(self, query: str, cited: Optional[list] = None) -> str:
+        try:
+            # Retrieval runs once; both candidates are generated from the same context
+            context = self.build_context(query, cited)
+            answer_1, answer_2 = self.generate(context, query)
+
+            if not answer_1.strip() or not answer_2.strip():
+                return "⚠️ 未成功產生回覆，請稍後再試。"
+
+            answer_1 = answer_1.replace("\n", "").replace("。", "。\n")
+            answer_2 = answer_2.replace("\n", "").replace("。", "。\n")
+
+            if self.gate.agree(answer_1, answer_2):
+                print(">>> Candidates agree, judgement skipped")
+                return answer_1
+            time_s = time.perf_counter()
+            judgement = self.judge(answer_1, answer_2)
+            self.gate.record_judge(time.perf_counter() - time_s)
+            if "回答1" in judgement:
+                return answer_1
+            elif "回答2" in judgement:
+                return answer_2
+            return "⚠️ 無法判斷最佳回覆，請稍後再試。"
+        except TimeoutError:
+            # Also concurrent.futures' TimeoutError and GeminiTimeout
+            return "⚠️ 回覆超時，請稍後再試。"
@@ -0,0 +1,81 @@
+import torch
+from threading import Lock
+from typing import Optional
+from transformers import DynamicCache
+
+
+class PrefixCache:
+    """
+    Key/value caches of fixed prompt prefixes (the instruction preambles), computed
+    once. `encode(prompt)` tokenizes the whole prompt and, if it starts with a
+    registered prefix, returns a DynamicCache holding the prefix tokens it shares
+    with that prompt, so only the rest has to be prefilled. Each call gets its own
+    cache object; the prefix tensors are shared read-only (cache updates concatenate
+    into new tensors).
+    """
+
+    def __init__(self, model, tokenizer, device):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.entries = {}
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.trimmed_tokens = 0
+
+    def add(self, prefix: str) -> int:
+        input_ids = self.tokenizer(prefix, return_tensors="pt").input_ids.to(
+            self.device
+        )
+        cache = DynamicCache()
+        with torch.no_grad():
+            self.model(input_ids=input_ids, past_key_values=cache, use_cache=True)
+        with self.lock:
+            self.entries[prefix] = (input_ids, cache.key_cache, cache.value_cache)
+        return input_ids.shape[1]
+
+    def match(self, prompt: str) -> Optional[str]:
+        # Longest registered prefix the prompt starts with
+        with self.lock:
+            found = [p for p in self.entries if prompt.startswith(p)]
+        return max(found, key=len) if found else None
+
+    def encode(self, prompt: str) -> tuple:
+        """Return (input_ids of the whole prompt, prefix DynamicCache or None)."""
+        input_ids = self.tokenizer(prompt, return_tensors="pt").input_ids
+        input_ids = input_ids.to(self.device)
+        prefix = self.match(prompt)
+        n_shared = 0
+        if prefix is not None:
+            prefix_ids, keys, values = self.entries[prefix]
+            # BPE can merge across the text boundary (e.g. "。" + "\n"), so the prefix
+            # tokens are only reused as far as the whole prompt's tokens agree; at
+            # least one token is left for the prefill to produce logits
+            n_check = min(prefix_ids.shape[1], input_ids.shape[1] - 1)
+            same = input_ids[0, :n_check] == prefix_ids[0, :n_check]
+            n_shared = int(same.int().cumprod(0).sum()) if n_check > 0 else 0
+        if n_shared == 0:
+            with self.lock:
+                self.misses += 1
+            return input_ids, None
+
+        # Causal attention: the KV of the first n_shared tokens does not depend on
+        # the tokens after them, so a slice of the prefix cache is exact
+        cache = DynamicCache()
+        cache.key_cache = [k[:, :, :n_shared] for k in keys]
+        cache.value_cache = [v[:, :, :n_shared] for v in values]
+        with self.lock:
+            self.hits += 1
+            self.trimmed_tokens += prefix_ids.shape[1] - n_shared
+        return input_ids, cache
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "prefixes": len(self.entries),
+                "prefix_tokens": [ids.shape[1] for ids, _, _ in self.entries.values()],
+                "hits": self.hits,
+                "misses": self.misses,
+                "trimmed_tokens": self.trimmed_tokens,
+            }
@@ -0,0 +1,77 @@
+import re
+import time
+import unicodedata
+from threading import Lock
+from typing import Any, Hashable, Optional
+from collections import OrderedDict
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form used as cache key: NFKC folds full-width characters to half-width,
+    punctuation is dropped, case and whitespace are folded.
+    """
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = "".join(
+        " " if unicodedata.category(ch).startswith(("P", "S")) else ch for ch in text
+    )
+    # Spaces only separate words in Latin text; next to CJK characters they are noise
+    text = re.sub(r"\s*([^\x00-\x7f])\s*", r"\1", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class QueryCache:
+    """Thread-safe LRU cache with per-entry TTL, cleared whenever `version` changes."""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def check_version(self, version: Any) -> None:
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
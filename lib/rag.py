@@ -1,13 +1,13 @@
 import os
-import json
-import torch
-import faiss
-import numpy as np
-from threading import Lock
-from typing import Any
-from lib.path import get_path
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
-from transformers import AutoTokenizer, AutoModel, AutoModelForCausalLM
+from threading import Lock, Thread
+from typing import Any, Iterator, Optional
+from lib.judge_gate import JudgeGate
+from lib.judgement import CandidateJudge
+from lib.retrieval import Retriever
+from lib.config import get_env
+from lib.utils import rss_mb
+from lib.startup import LazyLoader, StartupProfiler
+from concurrent.futures import ThreadPoolExecutor
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
@@ -17,150 +17,405 @@ MODEL_LIST = [
     "lianghsun/Llama-3.2-Taiwan-Legal-3B-Instruct",
 ]
 MODEL_NAME = MODEL_LIST[1]
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 generation_lock = Lock()
+# "batched": both candidates from one sampled generate call; "sequential": two calls
+CANDIDATE_MODE = get_env("CANDIDATE_MODE", "batched")
+CANDIDATE_TEMPERATURE = get_env("CANDIDATE_TEMPERATURE", 0.7, float)
+# "scheduler": continuous batching across requests; "lock": one generate call at a time
+GENERATION_MODE = get_env("GENERATION_MODE", "scheduler")
+# "score": one forward pass comparing the logits of the two labels; "generate": decode
+JUDGEMENT_MODE = get_env("JUDGEMENT_MODE", "score")
 
-# === Load Embeddings and FAISS Index Once ===
-embedding_path = os.path.join(get_path(key="DATA"), "embeddings", "laws_embedding.json")
-with open(embedding_path, "r") as f:
-    data = json.load(f)
-texts_cache = [item["text"] for item in data]
-embeddings_cache = np.array([item["embedding"] for item in data], dtype="float32")
-index_cache = faiss.IndexFlatL2(embeddings_cache.shape[1])
-index_cache.add(embeddings_cache)
-
-# === Preload Embeddings and Model and Tokenizer ===
-embedding_tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-embedding_model = AutoModel.from_pretrained(MODEL_NAME, torch_dtype=torch.float16).to(
-    DEVICE
-)
-embedding_model.eval()
-
-# === Preload Language Model for Generation
-gen_tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-gen_model = AutoModelForCausalLM.from_pretrained(
-    MODEL_NAME, torch_dtype=torch.float16
-).to(DEVICE)
-gen_model.eval()
+# === Fixed Prompt Preambles (their KV caches are computed once at startup) ===
+ANSWER_PREAMBLE = """
+        你是一位台灣法律諮詢顧問。請閱讀使用者的問題與檢索資料，並提供清楚的法律回覆，內容包含：
+        1. 相關法規的名稱、條號與條文內容
+        2. 使用者敘述與法條構成要件的對應說明
+        3. 初步法律建議（例如是否需尋求律師協助）
+        4. 不確定時請回答「不知道」，避免提供不實資訊
+        5. 回覆結尾請提醒使用者這不是正式法律意見
+        """
+JUDGEMENT_PREAMBLE = """
+    你是一位台灣法律諮詢顧問。請閱讀「回答1」與「回答2」，根據兩者的法律正確性與表達清晰度，判斷哪一個回答比較適當。
+    請僅回覆「回答1」或「回答2」。
+    """
+# Seconds a streaming consumer waits for the next token before giving up
+STREAM_TIMEOUT = get_env("STREAM_TIMEOUT", 120, float)
+# Embed queries with gen_model's base transformer instead of a second model copy
+SHARE_MODEL = get_env("SHARE_MODEL", 1, int)
 
 # === Thread Pool Executor ===
 executor = ThreadPoolExecutor(max_workers=2)
 
+# === Judgement Gate ===
+# Candidates at least this similar are returned without a judge call
+judge_gate = JudgeGate(
+    threshold=get_env("JUDGE_SKIP_THRESHOLD", 0.9, float),
+    enabled=bool(get_env("JUDGE_SKIP_ENABLED", 1, int)),
+)
 
-def search_faiss_idx(
-    query: str,
-    idx: Any,
-    texts: list,
-    top_k: int,
-    max_length: int,
-) -> list:
-    tokens = embedding_tokenizer(
-        query, padding=True, truncation=True, max_length=max_length, return_tensors="pt"
-    ).to(DEVICE)
-    with torch.no_grad():
-        query_embedding = (
-            embedding_model(**tokens).last_hidden_state.mean(dim=1).cpu().numpy()
+# === Retrieval (caches, batcher, indexes and context packing) ===
+retriever = Retriever(ensure=lambda: loader.ensure(), answer_db="answers_llama.sqlite")
+
+# === Candidate Judgement (answer cache, judge gate and judge call) ===
+# Module functions are looked up per call, so the benches can stub them
+judgement = CandidateJudge(
+    retriever=retriever,
+    gate=judge_gate,
+    build_context=lambda query, cited: build_context(query=query, cited=cited),
+    generate=lambda context, query: generate_candidates(context=context, query=query),
+    judge=lambda answer_x, answer_y: llama_judgement(
+        answer_x=answer_x, answer_y=answer_y
+    ),
+)
+
+
+# === Heavy Globals (loaded on first use, or early by loader.warm_up()) ===
+LAZY_GLOBALS = (
+    "DEVICE",
+    "gen_tokenizer",
+    "gen_model",
+    "encoder",
+    "prefix_cache",
+    "gen_scheduler",
+)
+
+
+def _load(profile: StartupProfiler) -> None:
+    global DEVICE, gen_tokenizer, gen_model, encoder, prefix_cache, gen_scheduler
+
+    with profile.step("import torch/transformers"):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+        from lib.encoders import get_encoder, low_memory_kwargs
+
+        DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    # Language model for generation (see low_memory_kwargs for the loading flags)
+    with profile.step("generation model"):
+        gen_tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        gen_model = AutoModelForCausalLM.from_pretrained(
+            MODEL_NAME, torch_dtype=torch.float16, **low_memory_kwargs()
+        ).to(DEVICE)
+        gen_model.eval()
+
+    # Query Encoder (ENCODER in .env selects the backend)
+    # The llama encoder runs on gen_model's base transformer: one copy of the weights
+    # serves both embedding (mean-pooled hidden states) and generation (LM head)
+    with profile.step("query encoder"):
+        encoder = get_encoder(
+            model_name=MODEL_NAME,
+            device=DEVICE,
+            base_model=gen_model.model if SHARE_MODEL else None,
+            tokenizer=gen_tokenizer if SHARE_MODEL else None,
         )
-    query_embedding = query_embedding.astype("float32")
 
-    distances, indices = idx.search(query_embedding, top_k)
-    results = [
-        {"text": texts[i], "score": distances[0][j]} for j, i in enumerate(indices[0])
-    ]
-    return results
+    # Embedding store, indexes, context packer and answer cache
+    retriever.load(
+        profile,
+        encoder=encoder,
+        tokenizer=gen_tokenizer,
+        overhead_tokens=len(gen_tokenizer(build_prompt(" ", "")).input_ids),
+    )
 
+    # Prefix KV Cache (prefill then only covers context and question)
+    with profile.step("prefix kv cache"):
+        from lib.prefix_cache import PrefixCache
 
-def llama_generate_response(context: str, query: str, max_token: int) -> str:
+        prefix_cache = None
+        if get_env("PREFIX_CACHE_ENABLED", 1, int):
+            prefix_cache = PrefixCache(
+                model=gen_model, tokenizer=gen_tokenizer, device=DEVICE
+            )
+            for preamble in (ANSWER_PREAMBLE, JUDGEMENT_PREAMBLE):
+                print(f">>> Cached prompt prefix: {prefix_cache.add(preamble)} tokens")
+
+    # Generation Scheduler (continuous batching over gen_model)
+    with profile.step("generation scheduler"):
+        from lib.gen_scheduler import GenerationScheduler
+
+        gen_scheduler = None
+        if GENERATION_MODE == "scheduler":
+            gen_scheduler = GenerationScheduler(
+                model=gen_model,
+                tokenizer=gen_tokenizer,
+                device=DEVICE,
+                max_batch_size=get_env("GEN_MAX_BATCH", 8, int),
+                prefix_cache=prefix_cache,
+                # Held per forward pass, so scoring passes interleave with decoding
+                lock=generation_lock,
+            )
+    print(f">>> Resident memory after model load: {rss_mb()} MB")
+
+
+loader = LazyLoader("rag", _load)
+
+
+def __getattr__(name: str) -> Any:
+    # `rag.gen_model` etc. trigger the load instead of failing
+    if name in LAZY_GLOBALS:
+        loader.ensure()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def build_prompt(context: str, query: str) -> str:
     # Prompt
-    prompt = """
-        你是一位台灣法律諮詢顧問。請閱讀使用者的問題與檢索資料，並提供清楚的法律回覆，內容包含：
-        1. 相關法規的名稱、條號與條文內容
-        2. 使用者敘述與法條構成要件的對應說明
-        3. 初步法律建議（例如是否需尋求律師協助）
-        4. 不確定時請回答「不知道」，避免提供不實資訊
-        5. 回覆結尾請提醒使用者這不是正式法律意見
-        """
+    prompt = ANSWER_PREAMBLE
     if context:
         prompt += f"\n下列為檢索法條後的參考資料，請摘要重點做為參考: {context}"
     prompt += f"\n使用者的問題: {query}"
+    return prompt
+
 
-    inputs = gen_tokenizer(prompt, return_tensors="pt", padding=True).to(DEVICE)
+def encode_prompt(prompt: str, n: int = 1) -> tuple:
+    # Input ids of the whole prompt plus the cached preamble KV (None if no match),
+    # repeated `n` times for n sampled continuations of the same prompt
+    loader.ensure()
+    if prefix_cache is not None:
+        input_ids, prefix_kv = prefix_cache.encode(prompt)
+    else:
+        input_ids = gen_tokenizer(prompt, return_tensors="pt").input_ids.to(DEVICE)
+        prefix_kv = None
+    if n > 1:
+        input_ids = input_ids.repeat(n, 1)
+        if prefix_kv is not None:
+            prefix_kv.key_cache = [k.repeat(n, 1, 1, 1) for k in prefix_kv.key_cache]
+            prefix_kv.value_cache = [
+                v.repeat(n, 1, 1, 1) for v in prefix_kv.value_cache
+            ]
+    return input_ids, prefix_kv
+
+
+def llama_generate_response(context: str, query: str, max_token: int) -> str:
+    import torch
+
+    loader.ensure()
+    prompt = build_prompt(context=context, query=query)
+    if gen_scheduler is not None:
+        answers = gen_scheduler.generate(
+            prompt, max_new_tokens=max_token, temperature=0.1
+        )
+        return answers[0].strip()
+    input_ids, prefix_kv = encode_prompt(prompt)
     print(">>> Calling generate...")
     with generation_lock:
         with torch.no_grad():
             output_ids = gen_model.generate(
-                input_ids=inputs.input_ids,
-                attention_mask=inputs.attention_mask,
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=prefix_kv,
                 pad_token_id=gen_tokenizer.pad_token_id,
                 max_new_tokens=max_token,
                 temperature=0.1,
             )
     print(">>> Generate done")
-    decoded = gen_tokenizer.decode(output_ids[0], skip_special_tokens=True)
-    cleaned = decoded[len(prompt) :].strip()
-    return cleaned
+    new_ids = output_ids[0][input_ids.shape[1] :]
+    return gen_tokenizer.decode(new_ids, skip_special_tokens=True).strip()
 
 
-def llama_rag_process(query: str) -> str:
-    # Retrieve relevant content
-    top_results = search_faiss_idx(
-        query=query,
-        idx=index_cache,
-        texts=texts_cache,
-        top_k=8,
-        max_length=512,
+def llama_generate_stream(context: str, query: str, max_token: int) -> Iterator[str]:
+    # Same decoding as llama_generate_response, but text is yielded as soon as the
+    # tokenizer can decode it; the scheduler (or a generate() thread) feeds the streamer
+    import torch
+    from transformers import TextIteratorStreamer
+
+    loader.ensure()
+    prompt = build_prompt(context=context, query=query)
+    if gen_scheduler is not None:
+        # The scheduler only hands new tokens to the streamer, never the prompt
+        streamer = TextIteratorStreamer(
+            gen_tokenizer, skip_special_tokens=True, timeout=STREAM_TIMEOUT
+        )
+        gen_scheduler.submit(
+            prompt, max_new_tokens=max_token, temperature=0.1, streamer=streamer
+        )
+        for text in streamer:
+            if text:
+                yield text
+        return
+    input_ids, prefix_kv = encode_prompt(prompt)
+    streamer = TextIteratorStreamer(
+        gen_tokenizer,
+        skip_prompt=True,
+        skip_special_tokens=True,
+        timeout=STREAM_TIMEOUT,
     )
-    # Merge the retrieved content into the context
-    context = "\n".join([result["text"] for result in top_results])
+
+    def run():
+        try:
+            with generation_lock:
+                with torch.no_grad():
+                    gen_model.generate(
+                        input_ids=input_ids,
+                        attention_mask=torch.ones_like(input_ids),
+                        past_key_values=prefix_kv,
+                        pad_token_id=gen_tokenizer.pad_token_id,
+                        max_new_tokens=max_token,
+                        temperature=0.1,
+                        streamer=streamer,
+                    )
+        except Exception as e:
+            print(f">>> Streaming generate failed: {str(e)}")
+            # Unblock the consumer
+            streamer.end()
+
+    print(">>> Calling streaming generate...")
+    Thread(target=run, daemon=True).start()
+    for text in streamer:
+        if text:
+            yield text
+
+
+def llama_stream_response(query: str, max_token: int = 256) -> Iterator[str]:
+    # Streaming skips the two-candidate judgement: a single answer is streamed
+    context = build_context(query=query)
+    yield from llama_generate_stream(context=context, query=query, max_token=max_token)
+
+
+def llama_generate_candidates(
+    context: str, query: str, max_token: int, n_candidates: int = 2
+) -> list:
+    # One generate call: the prompt is encoded once and N sampled continuations
+    # are decoded side by side in a single batch
+    import torch
+
+    loader.ensure()
+    prompt = build_prompt(context=context, query=query)
+    if gen_scheduler is not None:
+        # The scheduler prefills once and decodes the N copies as separate rows
+        answers = gen_scheduler.generate(
+            prompt,
+            max_new_tokens=max_token,
+            do_sample=True,
+            temperature=CANDIDATE_TEMPERATURE,
+            top_p=0.9,
+            n=n_candidates,
+        )
+        return [answer.strip() for answer in answers]
+    # N copies of the prompt (and of its cached preamble KV) decoded side by side
+    input_ids, prefix_kv = encode_prompt(prompt, n=n_candidates)
+    print(f">>> Calling generate for {n_candidates} candidates...")
+    with generation_lock:
+        with torch.no_grad():
+            output_ids = gen_model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=prefix_kv,
+                pad_token_id=gen_tokenizer.pad_token_id,
+                max_new_tokens=max_token,
+                do_sample=True,
+                temperature=CANDIDATE_TEMPERATURE,
+                top_p=0.9,
+            )
+    print(">>> Generate done")
+    prompt_length = input_ids.shape[1]
+    return [
+        gen_tokenizer.decode(ids[prompt_length:], skip_special_tokens=True).strip()
+        for ids in output_ids
+    ]
+
+
+def generate_candidates(context: str, query: str, max_token: int = 256) -> list:
+    if CANDIDATE_MODE == "batched":
+        return llama_generate_candidates(
+            context=context, query=query, max_token=max_token
+        )
+    # Sequential: two futures that take turns on generation_lock
+    future1 = executor.submit(
+        llama_generate_response, context=context, query=query, max_token=max_token
+    )
+    future2 = executor.submit(
+        llama_generate_response, context=context, query=query, max_token=max_token
+    )
+    return [future1.result(), future2.result()]
+
+
+def build_context(query: str, top_k: int = 8, cited: Optional[list] = None) -> str:
+    return retriever.build_context(query=query, top_k=top_k, cited=cited)
+
+
+def llama_rag_process(query: str) -> str:
+    context = build_context(query=query)
     result = llama_generate_response(context=context, query=query, max_token=256)
     return result
 
 
+def judgement_prompt(answer_x: str, answer_y: str) -> str:
+    prompt = JUDGEMENT_PREAMBLE
+    prompt += f"\n回答1: {answer_x}\n回答2: {answer_y}\n較佳的回答是："
+    return prompt
+
+
+def label_probabilities(
+    model, input_ids, label_ids: list, past_key_values=None
+) -> list:
+    """
+    Probability of each label token as the next token after `input_ids`,
+    renormalised over the labels: a single forward pass, nothing is decoded.
+    """
+    import torch
+
+    cached = past_key_values.get_seq_length() if past_key_values is not None else 0
+    with torch.no_grad():
+        logits = model(
+            input_ids=input_ids[:, cached:], past_key_values=past_key_values
+        ).logits[0, -1]
+    return torch.softmax(logits[label_ids].float(), dim=-1).tolist()
+
+
+def llama_judgement_score(answer_x: str, answer_y: str) -> tuple:
+    """Return (1 or 2, probability of that label) from one forward pass."""
+    loader.ensure()
+    # After "回答" the next token is the label; Llama 3 splits digits off as tokens
+    prompt = judgement_prompt(answer_x=answer_x, answer_y=answer_y) + "回答"
+    input_ids, prefix_kv = encode_prompt(prompt)
+    label_ids = [
+        gen_tokenizer(label, add_special_tokens=False).input_ids[-1]
+        for label in ("1", "2")
+    ]
+    # The scheduler holds this lock per forward pass, lock mode per generate call
+    with generation_lock:
+        probs = label_probabilities(gen_model, input_ids, label_ids, prefix_kv)
+    choice = 1 if probs[0] >= probs[1] else 2
+    return choice, probs[choice - 1]
+
+
 def llama_judgement(
     answer_x: str,
     answer_y: str,
 ) -> str:
-    # Set the prompt
-    prompt = """
-    你是一位台灣法律諮詢顧問。請閱讀「回答1」與「回答2」，根據兩者的法律正確性與表達清晰度，判斷哪一個回答比較適當。
-    請僅回覆「回答1」或「回答2」。
-    """
-    prompt += f"\n回答1: {answer_x}\n回答2: {answer_y}\n較佳的回答是："
+    import torch
+
+    loader.ensure()
+    if JUDGEMENT_MODE == "score":
+        choice, confidence = llama_judgement_score(answer_x=answer_x, answer_y=answer_y)
+        print(f">>> Judgement: 回答{choice} (confidence {confidence:.2f})")
+        return f"回答{choice}"
 
-    inputs = gen_tokenizer(prompt, return_tensors="pt", padding=True).to(DEVICE)
+    # Set the prompt
+    prompt = judgement_prompt(answer_x=answer_x, answer_y=answer_y)
+    if gen_scheduler is not None:
+        answers = gen_scheduler.generate(prompt, max_new_tokens=8, temperature=0.1)
+        return answers[0].strip()
+    input_ids, prefix_kv = encode_prompt(prompt)
     with generation_lock:
         with torch.no_grad():
             output_ids = gen_model.generate(
-                input_ids=inputs.input_ids,
-                attention_mask=inputs.attention_mask,
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=prefix_kv,
                 pad_token_id=gen_tokenizer.pad_token_id,
                 max_new_tokens=8,
                 temperature=0.1,
             )
-    decoded = gen_tokenizer.decode(output_ids[0], skip_special_tokens=True)
-    cleaned = decoded[len(prompt) :].strip()
-    return cleaned
+    new_ids = output_ids[0][input_ids.shape[1] :]
+    return gen_tokenizer.decode(new_ids, skip_special_tokens=True).strip()
 
 
 def response_with_judgement(query: str) -> str:
-    try:
-        future1 = executor.submit(llama_rag_process, query)
-        future2 = executor.submit(llama_rag_process, query)
-
-        answer_1 = future1.result()
-        answer_2 = future2.result()
-
-        if not answer_1.strip() or not answer_2.strip():
-            return "⚠️ 未成功產生回覆，請稍後再試。"
-
-        answer_1 = answer_1.replace("\n", "").replace("。", "。\n")
-        answer_2 = answer_2.replace("\n", "").replace("。", "。\n")
-
-        judgement = llama_judgement(answer_x=answer_1, answer_y=answer_2)
-        if "回答1" in judgement:
-            return answer_1
-        elif "回答2" in judgement:
-            return answer_2
-        return "⚠️ 無法判斷最佳回覆，請稍後再試。"
-    except TimeoutError:
-        return "⚠️ 回覆超時，請稍後再試。"
+    return judgement.respond(query)
+
+
+def judge_candidates(query: str, cited: Optional[list] = None) -> str:
+    return judgement.judge_candidates(query, cited=cited)
@@ -1,15 +1,12 @@
 import os
-import json
-import torch
-import faiss
-import numpy as np
-from typing import Any
-from google import genai
-from google.genai import types
+from typing import Any, AsyncIterator, Iterator, Optional
 from concurrent.futures import ThreadPoolExecutor
-from transformers import AutoTokenizer, AutoModel
-from lib.path import get_path
+from lib.judge_gate import JudgeGate
+from lib.judgement import CandidateJudge
+from lib.retrieval import Retriever
+from lib.config import get_env
 from lib.token_utils import TokenManager
+from lib.startup import LazyLoader, StartupProfiler
 
 # === Global Settings ===
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -18,76 +15,178 @@ MODEL_LIST = [
     "lianghsun/Llama-3.2-Taiwan-Legal-3B-Instruct",
 ]
 MODEL_NAME = MODEL_LIST[1]
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
-# === Load Embeddings and FAISS Index Once ===
-embedding_path = os.path.join(get_path(key="DATA"), "embeddings", "laws_embedding.json")
-with open(embedding_path, "r") as f:
-    data = json.load(f)
-texts_cache = [item["text"] for item in data]
-embeddings_cache = np.array([item["embedding"] for item in data], dtype="float32")
-index_cache = faiss.IndexFlatL2(embeddings_cache.shape[1])
-index_cache.add(embeddings_cache)
-
-# === Preload Embeddings and Model and Tokenizer ===
-embedding_tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-embedding_model = AutoModel.from_pretrained(MODEL_NAME, torch_dtype=torch.float16).to(
-    DEVICE
-)
-embedding_model.eval()
 
 # === Thread Pool Executor ===
 executor = ThreadPoolExecutor(max_workers=2)
 
-# === Gemini initialization ===
-tm = TokenManager()
-client = genai.Client(api_key=tm.get_google_api_key())
-
-
-# === Embedding Related Works ===
-def search_faiss_idx(
-    query: str,
-    idx: Any,
-    texts: list,
-    top_k: int,
-    max_length: int,
-) -> list:
-    tokens = embedding_tokenizer(
-        query, padding=True, truncation=True, max_length=max_length, return_tensors="pt"
-    ).to(DEVICE)
-    with torch.no_grad():
-        query_embedding = (
-            embedding_model(**tokens).last_hidden_state.mean(dim=1).cpu().numpy()
+# === Judgement Gate ===
+# Candidates at least this similar are returned without a judge call
+judge_gate = JudgeGate(
+    threshold=get_env("JUDGE_SKIP_THRESHOLD", 0.9, float),
+    enabled=bool(get_env("JUDGE_SKIP_ENABLED", 1, int)),
+)
+
+# === Retrieval (caches, batcher, indexes and context packing) ===
+retriever = Retriever(ensure=lambda: loader.ensure(), answer_db="answers_gemini.sqlite")
+
+# === Candidate Judgement (answer cache, judge gate and judge call) ===
+# Module functions are looked up per call, so the benches can stub them
+judgement = CandidateJudge(
+    retriever=retriever,
+    gate=judge_gate,
+    build_context=lambda query, cited: build_context(query=query, cited=cited),
+    generate=lambda context, query: gemini_generate_candidates(
+        context=context, query=query
+    ),
+    judge=lambda answer_x, answer_y: gemini_judgement(
+        answer_x=answer_x, answer_y=answer_y
+    ),
+)
+
+
+# === Heavy Globals (loaded on first use, or early by loader.warm_up()) ===
+LAZY_GLOBALS = (
+    "DEVICE",
+    "encoder",
+    "client",
+    "gemini",
+)
+
+
+def _load(profile: StartupProfiler) -> None:
+    global DEVICE, encoder, client, gemini
+
+    with profile.step("import torch/transformers"):
+        import torch
+        from lib.encoders import get_encoder
+
+        DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    # Query Encoder (ENCODER in .env selects the backend)
+    with profile.step("query encoder"):
+        encoder = get_encoder(model_name=MODEL_NAME, device=DEVICE)
+
+    # Gemini's tokenizer is not available offline, so context lengths are counted
+    # with the legal Llama tokenizer as an approximation
+    with profile.step("tokenizer"):
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+
+    # Embedding store, indexes, context packer and answer cache
+    retriever.load(
+        profile,
+        encoder=encoder,
+        tokenizer=tokenizer,
+        overhead_tokens=len(tokenizer(build_prompt(" ", "")).input_ids),
+    )
+
+    # Gemini initialization
+    with profile.step("gemini client"):
+        from google import genai
+        from google.genai import types
+        from lib.gemini_client import AsyncGeminiClient
+        from lib.http_pool import gemini_async_http_client, gemini_http_client
+
+        tm = TokenManager()
+        client = genai.Client(
+            api_key=tm.get_google_api_key(),
+            http_options=types.HttpOptions(
+                base_url=GEMINI_API_HOST,
+                httpx_client=gemini_http_client,
+                httpx_async_client=gemini_async_http_client,
+            ),
+        )
+        gemini = AsyncGeminiClient(
+            generate_fn=gemini_call,
+            stream_fn=gemini_stream_call,
+            max_concurrency=get_env("GEMINI_MAX_CONCURRENCY", 8, int),
+            timeout=get_env("GEMINI_TIMEOUT", 60, float),
+            deadline=get_env("GEMINI_DEADLINE", 120, float),
+            max_retries=get_env("GEMINI_MAX_RETRIES", 3, int),
+            hedge_after=get_env("GEMINI_HEDGE_AFTER", 0, float),
         )
-    query_embedding = query_embedding.astype("float32")
 
-    distances, indices = idx.search(query_embedding, top_k)
-    results = [
-        {"text": texts[i], "score": distances[0][j]} for j, i in enumerate(indices[0])
-    ]
-    return results
+
+loader = LazyLoader("rag_gemini", _load)
+
+
+def __getattr__(name: str) -> Any:
+    # `rag_gemini.gemini` etc. trigger the load instead of failing
+    if name in LAZY_GLOBALS:
+        loader.ensure()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def gemini_stats() -> dict:
+    # Does not trigger the model load just to report counters
+    return gemini.stats() if loader.ready.is_set() else {}
 
 
 # === Gemini wrapper ===
+GEMINI_MODEL = "gemini-2.5-flash-preview-04-17"
+# Base URL of the Gemini API (empty = Google), e.g. scripts/bench/fake_gemini_api.py
+GEMINI_API_HOST = get_env("GEMINI_API_HOST") or None
+
+
+def generation_config(max_token: int) -> Any:
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        response_mime_type="text/plain",
+        temperature=0.0,
+        max_output_tokens=max_token,
+    )
+
+
+async def gemini_call(prompt: str, max_token: int) -> str:
+    response = await client.aio.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=[prompt],
+        config=generation_config(max_token),
+    )
+    return (response.text or "").strip()
+
+
+async def gemini_stream_call(prompt: str, max_token: int) -> AsyncIterator[str]:
+    async for chunk in await client.aio.models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=[prompt],
+        config=generation_config(max_token),
+    ):
+        if chunk.text:
+            yield chunk.text
+
+
 def gemini_generate(prompt: str, max_token: int = 1024) -> str:
+    # Concurrency limit, timeouts, retries and hedging live in AsyncGeminiClient
+    loader.ensure()
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash-preview-04-17",
-            contents=[prompt],
-            config=types.GenerateContentConfig(
-                response_mime_type="text/plain",
-                temperature=0.0,
-                max_output_tokens=max_token,
-            ),
-        )
-        return response.text.strip()
+        return gemini.generate(prompt=prompt, max_token=max_token)
+    except TimeoutError as e:
+        print(f"[Gemini Timeout] {e}")
+        return "⚠️ 回覆超時，請稍後再試。"
     except Exception as e:
         print(f"[Gemini Error] {e}")
         return "⚠️ 模型回應失敗。"
 
 
+def gemini_generate_stream(prompt: str, max_token: int = 1024) -> Iterator[str]:
+    # Streams share the client's slots, per-chunk timeout and deadline
+    loader.ensure()
+    try:
+        yield from gemini.stream(prompt=prompt, max_token=max_token)
+    except TimeoutError as e:
+        print(f"[Gemini Timeout] {e}")
+        yield "⚠️ 回覆超時，請稍後再試。"
+    except Exception as e:
+        print(f"[Gemini Error] {e}")
+        yield "⚠️ 模型回應失敗。"
+
+
 # === Prompt generator for answering ===
-def gemini_generate_response(context: str, query: str, max_token: int = 1024) -> str:
+def build_prompt(context: str, query: str) -> str:
     prompt = """
     你是一位台灣法律諮詢顧問。請閱讀使用者的問題與檢索資料，並提供清楚的法律回覆，內容包含：
     1. 相關法規的名稱、條號與條文內容
@@ -99,24 +198,42 @@ def gemini_generate_response(context: str, query: str, max_token: int = 1024) ->
     if context:
         prompt += f"\n下列為檢索後的參考資料，摘要重點做為參考: {context}"
     prompt += f"\n使用者的問題: {query}"
+    return prompt
+
+
+def gemini_generate_response(context: str, query: str, max_token: int = 1024) -> str:
+    prompt = build_prompt(context=context, query=query)
     return gemini_generate(prompt=prompt, max_token=max_token)
 
 
+def build_context(query: str, top_k: int = 5, cited: Optional[list] = None) -> str:
+    return retriever.build_context(query=query, top_k=top_k, cited=cited)
+
+
+def gemini_stream_response(query: str, max_token: int = 1024) -> Iterator[str]:
+    # Streaming skips the two-candidate judgement: a single answer is streamed
+    context = build_context(query=query)
+    prompt = build_prompt(context=context, query=query)
+    yield from gemini_generate_stream(prompt=prompt, max_token=max_token)
+
+
 def gemini_rag_process(query: str, max_token: int = 1024) -> str:
-    # Retrieve relevant content
-    top_results = search_faiss_idx(
-        query=query,
-        idx=index_cache,
-        texts=texts_cache,
-        top_k=5,
-        max_length=512,
-    )
-    # Merge the retrieved content into the context
-    context = "\n".join([result["text"] for result in top_results])
+    context = build_context(query=query)
     result = gemini_generate_response(context=context, query=query, max_token=max_token)
     return result
 
 
+def gemini_generate_candidates(context: str, query: str, max_token: int = 1024) -> list:
+    # Both candidates are requested concurrently from the same context
+    futures = [
+        executor.submit(
+            gemini_generate_response, context=context, query=query, max_token=max_token
+        )
+        for _ in range(2)
+    ]
+    return [future.result() for future in futures]
+
+
 # === Prompt generator for comparison ===
 def gemini_judgement(answer_x: str, answer_y: str, max_token: int = 64) -> str:
     prompt = f"""
@@ -133,24 +250,8 @@ def gemini_judgement(answer_x: str, answer_y: str, max_token: int = 64) -> str:
 
 
 def response_with_judgement(query: str) -> str:
-    try:
-        future1 = executor.submit(gemini_rag_process, query=query, max_token=1024)
-        future2 = executor.submit(gemini_rag_process, query=query, max_token=1024)
+    return judgement.respond(query)
 
-        answer_1 = future1.result()
-        answer_2 = future2.result()
 
-        if not answer_1.strip() or not answer_2.strip():
-            return "⚠️ 未成功產生回覆，請稍後再試。"
-
-        answer_1 = answer_1.replace("\n", "").replace("。", "。\n")
-        answer_2 = answer_2.replace("\n", "").replace("。", "。\n")
-
-        judgement = gemini_judgement(answer_x=answer_1, answer_y=answer_2)
-        if "回答1" in judgement:
-            return answer_1
-        elif "回答2" in judgement:
-            return answer_2
-        return "⚠️ 無法判斷最佳回覆，請稍後再試。"
-    except TimeoutError:
-        return "⚠️ 回覆超時，請稍後再試。"
+def judge_candidates(query: str, cited: Optional[list] = None) -> str:
+    return judgement.judge_candidates(query, cited=cited)
@@ -0,0 +1,292 @@
+import os
+import numpy as np
+from typing import Any, Callable, Optional
+from lib.batcher import RetrievalBatcher
+from lib.query_cache import QueryCache, normalize_query
+from lib.path import get_path
+from lib.config import get_env
+from lib.startup import StartupProfiler
+
+
+class Retriever:
+    """
+    Query embedding, vector search, context packing and index versions shared by
+    the generation backends. Caches and the batcher exist from the start; the
+    encoder, store, indexes, context packer and answer cache are set by `load()`
+    from the backend's LazyLoader, which `ensure()` runs on first use.
+    """
+
+    def __init__(self, ensure: Callable[[], None], answer_db: str):
+        self.ensure = ensure
+        self.answer_db = answer_db
+
+        # Query caches (keyed by normalized query text)
+        self.embedding_cache = QueryCache(
+            max_size=get_env("QUERY_CACHE_SIZE", 1024, int),
+            ttl_seconds=get_env("QUERY_CACHE_TTL", 3600, float),
+        )
+        self.result_cache = QueryCache(
+            max_size=get_env("QUERY_CACHE_SIZE", 1024, int),
+            ttl_seconds=get_env("QUERY_CACHE_TTL", 3600, float),
+        )
+        # Concurrent queries within RETRIEVAL_MAX_WAIT_MS share one forward pass
+        self.batcher = RetrievalBatcher(
+            search_fn=lambda queries, top_k: self.search_snapshot(queries, top_k),
+            max_batch_size=get_env("RETRIEVAL_MAX_BATCH", 8, int),
+            max_wait_ms=get_env("RETRIEVAL_MAX_WAIT_MS", 5.0, float),
+        )
+
+        self.encoder = None
+        self.embedding_store = None
+        self.texts = None
+        self.index = None
+        self.index_version = None
+        self.citation_index = None
+        self.index_manager = None
+        self.context_packer = None
+        self.answer_cache = None
+
+    def load(
+        self,
+        profile: StartupProfiler,
+        encoder: Any,
+        tokenizer: Any,
+        overhead_tokens: int,
+    ) -> None:
+        from lib.encoders import check_encoder
+
+        self.encoder = encoder
+
+        # Embeddings stay memory-mapped; the FAISS index is mmapped as well
+        with profile.step("embedding store"):
+            from lib.embedding_store import load_embedding_store
+
+            self.embedding_store = load_embedding_store(encoder_id=encoder.encoder_id)
+            check_encoder(self.embedding_store.encoder_id, encoder)
+            self.texts = self.embedding_store.texts
+        with profile.step("citation index"):
+            from lib.citation_index import CitationIndex
+
+            if get_env("CITATION_INDEX_ENABLED", 1, int):
+                self.citation_index = CitationIndex(self.texts)
+                articles = self.citation_index.stats()["articles"]
+                print(f">>> Citation index: {articles} articles")
+        with profile.step("faiss index"):
+            from lib.faiss_index import load_or_build_index
+
+            if get_env("SHARDED_INDEX", 0, int):
+                # One index per law, queries routed to the shards they are about
+                from lib.sharded_index import ShardedIndex, law_labels
+
+                self.index = ShardedIndex(
+                    self.embedding_store.vectors_float32(),
+                    law_labels(self.texts),
+                    index_type=get_env("INDEX_TYPE", "flat"),
+                    min_shard_size=get_env("SHARD_MIN_SIZE", 32, int),
+                    n_route=get_env("SHARD_ROUTE", 2, int),
+                    nprobe=get_env("INDEX_NPROBE", 16, int),
+                    ef_search=get_env("INDEX_EF_SEARCH", 64, int),
+                )
+                # Built in memory from the store, so the store's vectors name it
+                fingerprint = self.embedding_store.fingerprint
+                self.index_version = f"sharded:{fingerprint[:8]}"
+                print(f">>> Sharded index: {self.index.stats()['shard_sizes']}")
+            else:
+                # The version of the index actually loaded or just (re)built, which
+                # snapshots of article updates record as their base
+                self.index, self.index_version = load_or_build_index(
+                    self.embedding_store.vectors,
+                    encoder_id=encoder.encoder_id,
+                    fingerprint=self.embedding_store.fingerprint,
+                )
+
+        # Versioned snapshots: article updates are built in the background and swapped
+        with profile.step("index snapshot"):
+            from lib.index_manager import IndexManager, IndexSnapshot
+            from lib.index_manager import get_snapshot_dir, load_snapshot
+
+            snapshot, snapshot_dir = None, None
+            if get_env("INDEX_SNAPSHOTS", 1, int) and not getattr(
+                self.index, "is_sharded", False
+            ):
+                snapshot_dir = get_snapshot_dir(
+                    get_env("INDEX_TYPE", "flat"), encoder.encoder_id
+                )
+                snapshot = load_snapshot(snapshot_dir, self.texts, self.index_version)
+            self.index_manager = IndexManager(
+                snapshot
+                or IndexSnapshot.base(self.index, self.texts, self.index_version),
+                encode_fn=lambda texts: encoder.encode(texts, max_length=512),
+                snapshot_dir=snapshot_dir,
+                on_build=self.attach_citation_index,
+                on_swap=self.clear_answer_cache,
+                keep=get_env("INDEX_SNAPSHOT_KEEP", 3, int),
+            )
+            print(f">>> Index version: {self.index_manager.version}")
+
+        # Context Packer (token budget over article lengths counted once per corpus)
+        with profile.step("context packer"):
+            from lib.context_packer import ContextPacker, load_or_count_lengths
+
+            self.context_packer = ContextPacker(
+                tokenizer=tokenizer,
+                lengths=load_or_count_lengths(
+                    self.texts, tokenizer, self.embedding_store.store_dir
+                ),
+                max_tokens=get_env("CONTEXT_MAX_TOKENS", 1024, int),
+                dedup_threshold=get_env("CONTEXT_DEDUP_THRESHOLD", 0.9, float),
+                overhead_tokens=overhead_tokens,
+            )
+
+        # Semantic Answer Cache (persisted in SQLite across restarts)
+        with profile.step("answer cache"):
+            # Off by default: questions differing in one legal fact (amount, date,
+            # party) can embed above the threshold and get each other's answer
+            if get_env("ANSWER_CACHE_ENABLED", 0, int):
+                from lib.answer_cache import SemanticAnswerCache
+
+                self.answer_cache = SemanticAnswerCache(
+                    db_path=os.path.join(get_path(key="DATA"), "cache", self.answer_db),
+                    encoder_id=encoder.encoder_id,
+                    threshold=get_env("ANSWER_CACHE_THRESHOLD", 0.95, float),
+                    ttl_seconds=get_env("ANSWER_CACHE_TTL", 7 * 24 * 3600, float),
+                    max_entries=get_env("ANSWER_CACHE_MAX", 5000, int),
+                )
+
+    # === Search ===
+    def embed_queries(self, queries: list, max_length: int) -> np.ndarray:
+        # Only queries missing from the cache go through the encoder
+        self.ensure()
+        keys = [(normalize_query(query), max_length) for query in queries]
+        cached = [self.embedding_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        if missing:
+            encoded = self.encoder.encode(
+                [queries[i] for i in missing], max_length=max_length
+            )
+            for i, embedding in zip(missing, encoded):
+                self.embedding_cache.put(keys[i], embedding)
+                cached[i] = embedding
+        return np.vstack(cached).astype("float32")
+
+    def search_faiss_batch(
+        self,
+        queries: list,
+        idx: Any,
+        texts: list,
+        top_k: int,
+        max_length: int,
+    ) -> list:
+        query_embeddings = self.embed_queries(queries=queries, max_length=max_length)
+        # A sharded index also routes on the question text (law names)
+        kwargs = {"queries": queries} if getattr(idx, "is_sharded", False) else {}
+        distances, indices = idx.search(query_embeddings, top_k, **kwargs)
+        results = [
+            [
+                {"id": int(i), "text": texts[i], "score": distances[row][j]}
+                for j, i in enumerate(ids)
+            ]
+            for row, ids in enumerate(indices)
+        ]
+        return results
+
+    def search_faiss_idx(
+        self,
+        query: str,
+        idx: Any,
+        texts: list,
+        top_k: int,
+        max_length: int,
+    ) -> list:
+        return self.search_faiss_batch(
+            queries=[query], idx=idx, texts=texts, top_k=top_k, max_length=max_length
+        )[0]
+
+    def search_snapshot(self, queries: list, top_k: int) -> list:
+        # One snapshot per batch, so a swap never mixes ids and texts of two versions
+        snapshot = self.index_manager.current
+        return self.search_faiss_batch(
+            queries=queries,
+            idx=snapshot,
+            texts=snapshot.texts,
+            top_k=top_k,
+            max_length=512,
+        )
+
+    def retrieve(self, query: str, top_k: int) -> list:
+        # Cached hits are only valid for the index version they were searched on
+        self.ensure()
+        self.result_cache.check_version(self.index_manager.version)
+        key = (normalize_query(query), top_k)
+        top_results = self.result_cache.get(key)
+        if top_results is None:
+            top_results = self.batcher.search(query=query, top_k=top_k)
+            self.result_cache.put(key, top_results)
+        return top_results
+
+    def cite(self, query: str) -> list:
+        """Hits of the articles cited in the query ("民法第184條"), or []."""
+        self.ensure()
+        snapshot = self.index_manager.current
+        citations = snapshot.extras.get("citation_index")
+        cited = citations.lookup(query) if citations is not None else []
+        return [{"id": i, "text": snapshot.texts[i], "score": 0.0} for i in cited]
+
+    def build_context(
+        self, query: str, top_k: int, cited: Optional[list] = None
+    ) -> str:
+        # Explicit citations skip the vector search; `cited` if already looked up
+        self.ensure()
+        if cited is None:
+            cited = self.cite(query)
+        top_results = cited or self.retrieve(query=query, top_k=top_k)
+        # Best articles first, near-duplicates dropped, within CONTEXT_MAX_TOKENS
+        return self.context_packer.pack(top_results, query=query)
+
+    # === Index Updates (admin: add / replace / delete articles without a restart) ===
+    def attach_citation_index(self, snapshot: Any) -> None:
+        # Citation lookups must return ids of the snapshot they are served with
+        from lib.citation_index import CitationIndex
+
+        if self.citation_index is None:
+            return
+        if snapshot.version == self.index_version:
+            snapshot.extras["citation_index"] = self.citation_index
+            return
+        items = list(snapshot.live_items())
+        snapshot.extras["citation_index"] = CitationIndex(
+            [text for _, text in items], ids=[i for i, _ in items]
+        )
+
+    def clear_answer_cache(self, snapshot: Any) -> None:
+        # Stored answers may quote articles the new version replaced or deleted
+        if self.answer_cache is not None:
+            cleared = self.answer_cache.purge()
+            print(f">>> Index {snapshot.version}: {cleared} answers cleared")
+
+    def update_index(
+        self,
+        add: Optional[list] = None,
+        replace: Optional[dict] = None,
+        delete: Optional[list] = None,
+    ) -> str:
+        """Build the next index version in the background; returns its label."""
+        self.ensure()
+        return self.index_manager.update(add=add, replace=replace, delete=delete)
+
+    # === Stats (none of them trigger the model load) ===
+    def index_status(self) -> dict:
+        return self.index_manager.status() if self.index_manager is not None else {}
+
+    def context_stats(self) -> dict:
+        if self.context_packer is None:
+            return {}
+        citations = self.index_manager.current.extras.get("citation_index")
+        citation = citations.stats() if citations is not None else {}
+        return {**self.context_packer.stats(), "citation": citation}
+
+    def cache_stats(self) -> dict:
+        return {
+            "embedding": self.embedding_cache.stats(),
+            "result": self.result_cache.stats(),
+        }
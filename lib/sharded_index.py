@@ -0,0 +1,128 @@
+import numpy as np
+from threading import Lock
+from typing import Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from lib.citation_index import law_names, law_of
+from lib.faiss_index import build_index, set_search_params
+
+OTHER_SHARD = "其他"
+
+
+def law_labels(texts: Sequence[str]) -> list:
+    # Law of every text; chunks without a "<law>第N條" head inherit the previous law
+    labels, last = [], OTHER_SHARD
+    for text in texts:
+        last = law_of(text) or last
+        labels.append(last)
+    return labels
+
+
+class ShardedIndex:
+    """
+    One FAISS index per law (laws under `min_shard_size` vectors share one shard).
+    A query is routed to the shards of the laws it names, otherwise to the `n_route`
+    shards with the nearest centroids; the shards are searched in parallel and the
+    hits merged by distance. `search` returns (distances, global ids) like a single
+    index, so it can stand in for `Retriever.index`.
+    """
+
+    is_sharded = True
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        labels: Sequence[str],
+        index_type: str = "flat",
+        min_shard_size: int = 32,
+        n_route: int = 2,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        self.ntotal, self.d = vectors.shape
+        sizes = {}
+        for label in labels:
+            sizes[label] = sizes.get(label, 0) + 1
+        groups = {}
+        for i, label in enumerate(labels):
+            name = label if sizes[label] >= min_shard_size else OTHER_SHARD
+            groups.setdefault(name, []).append(i)
+
+        self.shards = sorted(groups)
+        self.ids = [np.asarray(groups[name], dtype="int64") for name in self.shards]
+        self.indexes = [
+            set_search_params(
+                build_index(vectors[ids], index_type),
+                nprobe=nprobe,
+                ef_search=ef_search,
+            )
+            for ids in self.ids
+        ]
+        self.centroids = np.stack([vectors[ids].mean(axis=0) for ids in self.ids])
+        # Law named in a question -> its shard
+        shard_of = {label: label if label in groups else OTHER_SHARD for label in sizes}
+        self.names = {
+            name: self.shards.index(shard_of[law])
+            for name, law in law_names(set(sizes)).items()
+        }
+        self.n_route = max(1, min(n_route, len(self.shards)))
+        self.executor = ThreadPoolExecutor(max_workers=self.n_route)
+        self.lock = Lock()
+        self.counts = {"queries": 0, "keyword": 0, "centroid": 0, "shards": 0}
+
+    def route(self, vector: np.ndarray, query: Optional[str] = None) -> list:
+        if query:
+            named = {shard for name, shard in self.names.items() if name in query}
+            if named:
+                with self.lock:
+                    self.counts["keyword"] += 1
+                return sorted(named)
+        distances = ((self.centroids - vector) ** 2).sum(axis=1)
+        with self.lock:
+            self.counts["centroid"] += 1
+        return np.argsort(distances)[: self.n_route].tolist()
+
+    def search(self, x: np.ndarray, k: int, queries: Optional[list] = None) -> tuple:
+        x = np.ascontiguousarray(x, dtype="float32")
+        rows_of = {}
+        for row, vector in enumerate(x):
+            query = queries[row] if queries is not None else None
+            for shard in self.route(vector, query):
+                rows_of.setdefault(shard, []).append(row)
+
+        def search_shard(shard: int) -> tuple:
+            rows = rows_of[shard]
+            distances, local = self.indexes[shard].search(x[rows], k)
+            ids = np.where(local >= 0, self.ids[shard][np.maximum(local, 0)], -1)
+            return rows, distances, ids
+
+        # Scatter to the shards, then keep the k nearest hits of each query
+        found = [[] for _ in range(len(x))]
+        for rows, distances, ids in self.executor.map(search_shard, list(rows_of)):
+            for j, row in enumerate(rows):
+                found[row].append((distances[j], ids[j]))
+
+        merged_d = np.full((len(x), k), np.inf, dtype="float32")
+        merged_i = np.full((len(x), k), -1, dtype="int64")
+        for row, parts in enumerate(found):
+            distances = np.concatenate([d for d, _ in parts])
+            ids = np.concatenate([i for _, i in parts])
+            order = np.argsort(distances[ids >= 0], kind="stable")[:k]
+            merged_d[row, : len(order)] = distances[ids >= 0][order]
+            merged_i[row, : len(order)] = ids[ids >= 0][order]
+        with self.lock:
+            self.counts["queries"] += len(x)
+            self.counts["shards"] += sum(len(rows) for rows in rows_of.values())
+        return merged_d, merged_i
+
+    def stats(self) -> dict:
+        with self.lock:
+            queries = self.counts["queries"]
+            return {
+                **self.counts,
+                "n_shards": len(self.shards),
+                "shard_sizes": {n: len(i) for n, i in zip(self.shards, self.ids)},
+                "mean_shards_searched": (
+                    round(self.counts["shards"] / queries, 2) if queries else 0.0
+                ),
+            }
@@ -0,0 +1,97 @@
+import time
+from threading import Event, Lock, Thread
+from contextlib import contextmanager
+from typing import Callable, Optional
+from lib.utils import rss_mb
+
+
+class StartupProfiler:
+    """Wall time and resident-memory growth of each named initialization step."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.steps = []
+
+    @contextmanager
+    def step(self, label: str):
+        time_s, rss_s = time.perf_counter(), rss_mb()
+        yield
+        row = {
+            "step": label,
+            "seconds": round(time.perf_counter() - time_s, 3),
+            "rss_mb": rss_mb(),
+            "delta_mb": round(rss_mb() - rss_s, 1),
+        }
+        self.steps.append(row)
+        print(
+            f">>> [{self.name}] {label}: {row['seconds']} s, "
+            f"+{row['delta_mb']} MB (RSS {row['rss_mb']} MB)"
+        )
+
+    def summary(self) -> dict:
+        return {
+            "seconds": round(sum(row["seconds"] for row in self.steps), 3),
+            "rss_mb": self.steps[-1]["rss_mb"] if self.steps else rss_mb(),
+            "steps": list(self.steps),
+        }
+
+
+class LazyLoader:
+    """
+    Runs `load_fn(profiler)` exactly once: on the first `ensure()` (first use), or
+    ahead of time from `warm_up()` in a background thread. Concurrent callers block
+    until loading finishes; a failed load is retried by the next caller.
+    """
+
+    def __init__(self, name: str, load_fn: Callable[[StartupProfiler], None]):
+        self.name = name
+        self.load_fn = load_fn
+        self.lock = Lock()
+        self.ready = Event()
+        self.error: Optional[Exception] = None
+        self.thread: Optional[Thread] = None
+        self.profiler = StartupProfiler(name)
+
+    def ensure(self) -> None:
+        if self.ready.is_set():
+            return
+        with self.lock:
+            if self.ready.is_set():
+                return
+            self.profiler.steps.clear()
+            try:
+                self.load_fn(self.profiler)
+            except Exception as e:
+                # Reported by status() (and /health) until a later call loads
+                self.error = e
+                raise
+            self.error = None
+            self.ready.set()
+            print(f">>> [{self.name}] Ready in {self.profiler.summary()['seconds']} s")
+
+    def warm_up(self) -> Thread:
+        def run():
+            try:
+                self.ensure()
+            except Exception as e:
+                print(f">>> [{self.name}] Warm-up failed: {str(e)}")
+
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = Thread(target=run, name=f"{self.name}-warm-up", daemon=True)
+            self.thread.start()
+        return self.thread
+
+    def status(self) -> dict:
+        if self.ready.is_set():
+            state = "ready"
+        elif self.error is not None:
+            state = "error"
+        elif self.lock.locked():
+            state = "loading"
+        else:
+            state = "cold"
+        return {
+            "status": state,
+            "error": str(self.error) if self.error else None,
+            **self.profiler.summary(),
+        }
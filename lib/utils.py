@@ -1,3 +1,38 @@
+import time
+import resource
+from typing import Iterator, Optional
+
+
 def timer(end_time: float, bgn_time: float) -> str:
     str_result = str(round((end_time - bgn_time), 2))
     return str_result
+
+
+def timed_stream(chunks: Iterator[str], stats: Optional[dict] = None) -> Iterator[str]:
+    """
+    Pass chunks through while recording time-to-first-token and total time (seconds)
+    into `stats`, so streamed responses can be measured without changing them.
+    """
+    stats = {} if stats is None else stats
+    bgn_time = time.perf_counter()
+    stats.update({"ttft": None, "total": None, "chunks": 0})
+    for chunk in chunks:
+        if stats["ttft"] is None:
+            stats["ttft"] = time.perf_counter() - bgn_time
+        stats["chunks"] += 1
+        yield chunk
+    stats["total"] = time.perf_counter() - bgn_time
+    ttft = "n/a" if stats["ttft"] is None else round(stats["ttft"], 2)
+    print(f">>> Stream TTFT: {ttft} seconds, total: {round(stats['total'], 2)} seconds")
+
+
+def rss_mb() -> float:
+    # Current resident set size; falls back to the peak where /proc is unavailable
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
@@ -0,0 +1,39 @@
+import os
+import argparse
+from lib.config import get_env
+from lib.path import get_path
+from lib.answer_cache import SemanticAnswerCache
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Inspect or purge the persisted semantic answer cache."
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=["gemini", "llama"],
+        default="gemini",
+        help="Which pipeline's cache (answers_<backend>.sqlite)",
+    )
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--purge-expired", action="store_true", help="Delete entries past their TTL"
+    )
+    group.add_argument("--question", type=str, help="Delete entries of one question")
+    group.add_argument("--clear", action="store_true", help="Delete every entry")
+    args = parser.parse_args()
+
+    cache = SemanticAnswerCache(
+        db_path=os.path.join(
+            get_path(key="DATA"), "cache", f"answers_{args.backend}.sqlite"
+        ),
+        encoder_id="",
+        ttl_seconds=get_env("ANSWER_CACHE_TTL", 7 * 24 * 3600, float),
+    )
+    if args.purge_expired:
+        print(f">>> Purged {cache.purge(expired_only=True)} expired entries")
+    elif args.question:
+        print(f">>> Purged {cache.purge(question=args.question)} entries")
+    elif args.clear:
+        print(f">>> Purged {cache.purge()} entries")
+    print(f">>> {cache.stats()}")
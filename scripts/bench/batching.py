@@ -0,0 +1,63 @@
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from scripts.bench.common import SAMPLE_QUERIES, latency_summary, write_report
+
+
+def run_load(search_one, concurrency: int, n_requests: int) -> dict:
+    # Fire n_requests queries from `concurrency` client threads
+    def one_request(i: int) -> float:
+        time_s = time.perf_counter()
+        search_one(SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)])
+        return time.perf_counter() - time_s
+
+    time_s = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one_request, range(n_requests)))
+    elapsed = time.perf_counter() - time_s
+    row = {"concurrency": concurrency, "qps": round(n_requests / elapsed, 2)}
+    row.update(latency_summary(latencies))
+    return row
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Throughput and tail latency of batched vs per-query retrieval."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 4, 8, 16], help="Clients"
+    )
+    parser.add_argument("--requests", type=int, default=64, help="Queries per run")
+    parser.add_argument("--top-k", type=int, default=5, help="Neighbours per query")
+    args = parser.parse_args()
+
+    from lib import rag_gemini as rag
+
+    rag.loader.ensure()
+    retriever = rag.retriever
+    # Repeated sample queries would be served from the embedding cache; with it off
+    # every request of both paths runs the encoder
+    retriever.embedding_cache.clear()
+    retriever.embedding_cache.max_size = 0
+
+    def direct(query: str) -> list:
+        return retriever.search_faiss_idx(
+            query=query,
+            idx=retriever.index,
+            texts=retriever.texts,
+            top_k=args.top_k,
+            max_length=512,
+        )
+
+    def batched(query: str) -> list:
+        return retriever.batcher.search(query=query, top_k=args.top_k)
+
+    rows = []
+    for concurrency in args.concurrency:
+        for path, search_one in (("direct", direct), ("batched", batched)):
+            row = {"path": path}
+            row.update(run_load(search_one, concurrency, args.requests))
+            rows.append(row)
+            print(f">>> {row}")
+    print(f">>> Batcher stats: {retriever.batcher.stats()}")
+    write_report("retrieval_batching", rows, title="Retrieval micro-batching")
@@ -0,0 +1,38 @@
+import time
+import argparse
+from scripts.bench.common import SAMPLE_QUERIES, latency_summary, write_report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Batched (num_return_sequences) vs sequential candidate generation."
+    )
+    parser.add_argument("--queries", type=int, default=4, help="Queries to time")
+    parser.add_argument("--max-token", type=int, default=256, help="New tokens")
+    args = parser.parse_args()
+
+    from lib import rag
+
+    queries = SAMPLE_QUERIES[: args.queries]
+    contexts = {query: rag.build_context(query=query) for query in queries}
+
+    rows = []
+    for mode in ("sequential", "batched"):
+        rag.CANDIDATE_MODE = mode
+        latencies = []
+        for query in queries:
+            time_s = time.perf_counter()
+            rag.generate_candidates(
+                context=contexts[query], query=query, max_token=args.max_token
+            )
+            latencies.append(time.perf_counter() - time_s)
+        row = {"mode": mode}
+        row.update(latency_summary(latencies))
+        rows.append(row)
+        print(f">>> {row}")
+    rows.append(
+        {
+            "mode": "speedup",
+            "mean_ms": round(rows[0]["mean_ms"] / rows[1]["mean_ms"], 2),
+        }
+    )
+    write_report("candidate_generation", rows, title="Candidate generation modes")
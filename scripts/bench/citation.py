@@ -0,0 +1,66 @@
+import argparse
+from scripts.bench.common import (
+    SAMPLE_QUERIES,
+    latency_summary,
+    time_calls,
+    write_report,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Citation lookup vs vector retrieval for explicit statute queries."
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per query")
+    args = parser.parse_args()
+
+    from lib import rag_gemini as rag
+
+    rag.loader.ensure()
+    retriever = rag.retriever
+    # Citing queries from the sample set plus variants with Chinese numerals
+    queries = SAMPLE_QUERIES + [
+        "民法第一百八十四條的要件",
+        "刑法第三百二十條竊盜罪",
+        "民法第184條與第185條有什麼不同？",
+    ]
+    cited = [query for query in queries if retriever.citation_index.lookup(query)]
+
+    def vector_search(query: str):
+        return retriever.search_faiss_idx(
+            query=query,
+            idx=retriever.index,
+            texts=retriever.texts,
+            top_k=5,
+            max_length=512,
+        )
+
+    lookup, vector = [], []
+    for query in cited:
+        lookup += time_calls(
+            lambda: retriever.citation_index.lookup(query), args.repeat
+        )
+        # The embedding cache is cleared so every call pays for the forward pass
+        vector += time_calls(
+            lambda: (retriever.embedding_cache.clear(), vector_search(query)),
+            args.repeat,
+        )
+
+    stats = retriever.citation_index.stats()
+    rows = [
+        {
+            "path": "citation lookup",
+            "queries": len(queries),
+            "resolved": len(cited),
+            **latency_summary(lookup or [0.0]),
+        },
+        {
+            "path": "embedding + faiss",
+            "queries": len(queries),
+            "resolved": len(cited),
+            **latency_summary(vector or [0.0]),
+        },
+    ]
+    for row in rows:
+        print(f">>> {row}")
+    print(f">>> Citation index: {stats}")
+    write_report("citation", rows, title="Explicit citations: lookup vs vector search")
@@ -0,0 +1,65 @@
+import os
+import json
+import time
+import numpy as np
+from typing import Callable
+from lib.path import get_path
+
+# Typical LINE questions used as benchmark load
+SAMPLE_QUERIES = [
+    "民法第184條的侵權行為要件是什麼？",
+    "房東不退還押金該怎麼辦？",
+    "車禍對方逃逸，我可以提告嗎？",
+    "公司沒有給加班費違法嗎？",
+    "網路上被人罵可以告誹謗嗎？",
+    "借錢不還可以告詐欺嗎？",
+    "離婚時夫妻財產要怎麼分配？",
+    "刑法第320條竊盜罪的刑責是多少？",
+    "買到瑕疵商品可以退貨嗎？",
+    "遺產繼承的順序是什麼？",
+    "被資遣可以領多少資遣費？",
+    "酒駕被抓會有什麼處罰？",
+]
+
+
+def latency_summary(latencies: list) -> dict:
+    # Latencies in seconds -> milliseconds percentiles
+    arr = np.asarray(latencies, dtype="float64") * 1000
+    return {
+        "n": int(arr.size),
+        "mean_ms": round(float(arr.mean()), 3),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+    }
+
+
+def time_calls(fn: Callable, n_repeat: int, warmup: int = 1) -> list:
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(n_repeat):
+        time_s = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - time_s)
+    return latencies
+
+
+def write_report(name: str, rows: list, title: str = "") -> str:
+    # Write rows as JSON and as a markdown table under reports/
+    report_dir = get_path(key="REPORTS")
+    os.makedirs(report_dir, exist_ok=True)
+    json_path = os.path.join(report_dir, f"{name}.json")
+    with open(json_path, "w") as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+
+    md_path = os.path.join(report_dir, f"{name}.md")
+    columns = list(rows[0].keys()) if rows else []
+    with open(md_path, "w") as f:
+        f.write(f"# {title or name}\n\n")
+        f.write("| " + " | ".join(columns) + " |\n")
+        f.write("|" + "---|" * len(columns) + "\n")
+        for row in rows:
+            f.write("| " + " | ".join(str(row.get(c, "")) for c in columns) + " |\n")
+    print(f">>> Report written to: {md_path}")
+    return md_path
@@ -0,0 +1,65 @@
+import gc
+import torch
+import argparse
+import numpy as np
+from lib.encoders import ENCODER_TYPES, get_encoder
+from lib.embedding_store import load_embedding_store
+from lib.faiss_index import build_index
+from scripts.reembed_store import MODEL_NAME, DEVICE, encode_corpus
+from scripts.bench.common import (
+    SAMPLE_QUERIES,
+    latency_summary,
+    time_calls,
+    write_report,
+)
+
+
+def top_ids(encoder, corpus: list, top_k: int) -> np.ndarray:
+    # Embed a corpus sample and the sample queries with the same encoder
+    index = build_index(encode_corpus(encoder, corpus, 16, 512), "flat")
+    _, ids = index.search(encoder.encode(SAMPLE_QUERIES), top_k)
+    return ids
+
+
+def overlap(reference: np.ndarray, found: np.ndarray) -> float:
+    return float(
+        np.mean([len(set(r) & set(f)) / len(r) for r, f in zip(reference, found)])
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Encode latency and retrieval overlap of encoders vs the llama one."
+    )
+    parser.add_argument(
+        "--encoders",
+        type=str,
+        nargs="+",
+        choices=ENCODER_TYPES,
+        default=["llama", "llama-int8", "sentence"],
+        help="Encoders to compare; the first one is the reference",
+    )
+    parser.add_argument("--corpus", type=int, default=1000, help="Corpus sample size")
+    parser.add_argument("--top-k", type=int, default=5, help="Neighbours per query")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed encode calls")
+    args = parser.parse_args()
+
+    corpus = load_embedding_store().texts[: args.corpus]
+    rows, reference = [], None
+    for encoder_type in args.encoders:
+        encoder = get_encoder(MODEL_NAME, DEVICE, encoder_type=encoder_type)
+        ids = top_ids(encoder, corpus, args.top_k)
+        reference = ids if reference is None else reference
+        latencies = time_calls(lambda: encoder.encode([SAMPLE_QUERIES[0]]), args.repeat)
+        row = {
+            "encoder": encoder.encoder_id,
+            f"overlap@{args.top_k}": round(overlap(reference, ids), 4),
+        }
+        row.update(latency_summary(latencies))
+        rows.append(row)
+        print(f">>> {row}")
+        del encoder
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    write_report("encoder_comparison", rows, title="Query encoder comparison")
@@ -0,0 +1,129 @@
+import json
+import random
+import asyncio
+import argparse
+import uvicorn
+from threading import Lock
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Stand-in for generativelanguage.googleapis.com (GEMINI_API_HOST). Every call sleeps
+# `latency_ms`, a `slow_ratio` share of calls sleeps `slow_ms` instead (tail latency)
+# and an `error_rate` share fails with 503 so retries can be exercised.
+app = FastAPI()
+app.state.latency_ms = 50.0
+app.state.slow_ratio = 0.0
+app.state.slow_ms = 2000.0
+app.state.error_rate = 0.0
+counts = {"calls": 0, "errors": 0, "slow": 0, "cancelled": 0}
+counts_lock = Lock()
+
+ANSWER = (
+    "依民法第184條，因故意或過失不法侵害他人權利者，負損害賠償責任。"
+    "這不是正式法律意見。"
+)
+
+
+def _count(key: str) -> None:
+    with counts_lock:
+        counts[key] += 1
+
+
+def _answer(payload: dict) -> str:
+    parts = payload.get("contents", [{}])[0].get("parts", [{}])
+    prompt = parts[0].get("text", "") if parts else ""
+    return "回答1" if "較佳的回答是" in prompt else ANSWER
+
+
+def _response(text: str) -> dict:
+    return {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+                "index": 0,
+            }
+        ],
+        "modelVersion": "fake-gemini",
+    }
+
+
+async def _delay() -> bool:
+    # Returns False when this call should fail
+    _count("calls")
+    delay = app.state.latency_ms
+    if random.random() < app.state.slow_ratio:
+        _count("slow")
+        delay = app.state.slow_ms
+    try:
+        await asyncio.sleep(delay / 1000)
+    except asyncio.CancelledError:
+        _count("cancelled")
+        raise
+    if random.random() < app.state.error_rate:
+        _count("errors")
+        return False
+    return True
+
+
+UNAVAILABLE = {
+    "error": {
+        "code": 503,
+        "message": "The model is overloaded.",
+        "status": "UNAVAILABLE",
+    }
+}
+
+
+@app.post("/{version}/models/{model}:generateContent")
+async def generate_content(version: str, model: str, request: Request):
+    payload = await request.json()
+    if not await _delay():
+        return JSONResponse(UNAVAILABLE, status_code=503)
+    return _response(_answer(payload))
+
+
+@app.post("/{version}/models/{model}:streamGenerateContent")
+async def stream_generate_content(version: str, model: str, request: Request):
+    payload = await request.json()
+    if not await _delay():
+        return JSONResponse(UNAVAILABLE, status_code=503)
+    text = _answer(payload)
+
+    async def events():
+        for i in range(0, len(text), 8):
+            chunk = json.dumps(_response(text[i : i + 8]), ensure_ascii=False)
+            yield f"data: {chunk}\r\n\r\n"
+            await asyncio.sleep(0.005)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def stats():
+    with counts_lock:
+        return dict(counts)
+
+
+@app.post("/reset")
+async def reset():
+    with counts_lock:
+        for key in counts:
+            counts[key] = 0
+    return {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini API.")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--slow-ratio", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=2000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app.state.latency_ms = args.latency_ms
+    app.state.slow_ratio = args.slow_ratio
+    app.state.slow_ms = args.slow_ms
+    app.state.error_rate = args.error_rate
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
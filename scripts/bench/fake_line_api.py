@@ -0,0 +1,75 @@
+import asyncio
+import argparse
+import uvicorn
+from threading import Lock
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# Stand-in for api.line.me: accepts replies/pushes, counts them, optionally sleeps
+# `latency_ms` per call. Reply tokens starting with "expired" get LINE's 400 error.
+app = FastAPI()
+app.state.latency_ms = 0.0
+counts = {"reply": 0, "push": 0, "expired": 0, "webhook": 0}
+counts_lock = Lock()
+
+
+def _count(key: str) -> None:
+    with counts_lock:
+        counts[key] += 1
+
+
+async def _delay() -> None:
+    if app.state.latency_ms > 0:
+        await asyncio.sleep(app.state.latency_ms / 1000)
+
+
+SENT = {"sentMessages": [{"id": "0", "quoteToken": "fake"}]}
+
+
+@app.post("/v2/bot/message/reply")
+async def reply(request: Request):
+    payload = await request.json()
+    await _delay()
+    if str(payload.get("replyToken", "")).startswith("expired"):
+        _count("expired")
+        return JSONResponse({"message": "Invalid reply token"}, status_code=400)
+    _count("reply")
+    return SENT
+
+
+@app.post("/v2/bot/message/push")
+async def push(request: Request):
+    await request.json()
+    await _delay()
+    _count("push")
+    return SENT
+
+
+@app.put("/v2/bot/channel/webhook/endpoint")
+async def webhook_endpoint():
+    _count("webhook")
+    return {}
+
+
+@app.get("/stats")
+async def stats():
+    with counts_lock:
+        return dict(counts)
+
+
+@app.post("/reset")
+async def reset():
+    with counts_lock:
+        for key in counts:
+            counts[key] = 0
+    return {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the LINE API.")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app.state.latency_ms = args.latency_ms
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
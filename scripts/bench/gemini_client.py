@@ -0,0 +1,134 @@
+import time
+import argparse
+import httpx
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from google import genai
+from google.genai import types
+from lib.gemini_client import AsyncGeminiClient
+from lib.rag_gemini import GEMINI_MODEL, generation_config
+from scripts.bench.common import SAMPLE_QUERIES, latency_summary, write_report
+from scripts.bench.webhook import serve_asgi
+
+# name -> AsyncGeminiClient settings; "sync" is the old blocking generate_content
+CONFIGS = {
+    "sync": None,
+    "async": {"max_retries": 0},
+    "async+retry": {"max_retries": 3},
+    "async+retry+hedge": {"max_retries": 3, "hedge_after": None},
+}
+
+
+def run(call, n_requests: int, concurrency: int) -> tuple:
+    latencies, failures = [], 0
+
+    def one(i: int):
+        time_s = time.perf_counter()
+        try:
+            call(SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)])
+            return time.perf_counter() - time_s
+        except Exception:
+            return None
+
+    time_s = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency in pool.map(one, range(n_requests)):
+            if latency is None:
+                failures += 1
+            else:
+                latencies.append(latency)
+    return latencies, failures, time.perf_counter() - time_s
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gemini call latency/success with retries and hedging (fake API)."
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--slow-ratio", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=1000)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument(
+        "--hedge-ms", type=float, default=150, help="Hedge delay of the hedged config"
+    )
+    parser.add_argument("--port", type=int, default=9200)
+    args = parser.parse_args()
+
+    from scripts.bench import fake_gemini_api
+
+    fake = fake_gemini_api.app.state
+    fake.latency_ms, fake.slow_ratio = args.latency_ms, args.slow_ratio
+    fake.slow_ms, fake.error_rate = args.slow_ms, args.error_rate
+    server = serve_asgi(fake_gemini_api.app, args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    def make_call(client: genai.Client):
+        async def gemini_call(prompt: str, max_token: int) -> str:
+            response = await client.aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=[prompt],
+                config=generation_config(max_token),
+            )
+            return (response.text or "").strip()
+
+        return gemini_call
+
+    def sync_call(prompt: str) -> str:
+        return client.models.generate_content(
+            model=GEMINI_MODEL, contents=[prompt], config=generation_config(1024)
+        ).text
+
+    rows = []
+    for name, settings in CONFIGS.items():
+        httpx.post(f"{base_url}/reset")
+        # A fresh async pool per config: its connections belong to one event loop
+        client = genai.Client(
+            api_key="fake",
+            http_options=types.HttpOptions(
+                base_url=base_url, httpx_async_client=httpx.AsyncClient(timeout=60)
+            ),
+        )
+        gemini = None
+        if settings is None:
+            call = sync_call
+        else:
+            settings = dict(settings)
+            if "hedge_after" in settings:
+                settings["hedge_after"] = args.hedge_ms / 1000
+            gemini = AsyncGeminiClient(
+                generate_fn=make_call(client),
+                max_concurrency=args.concurrency,
+                timeout=30,
+                deadline=60,
+                backoff_base=0.05,
+                **settings,
+            )
+            call = partial(gemini.generate, max_token=1024)
+
+        latencies, failures, elapsed = run(call, args.requests, args.concurrency)
+        row = {
+            "config": name,
+            "succeeded": len(latencies),
+            "failed": failures,
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            **latency_summary(latencies or [0.0]),
+            "api_calls": httpx.get(f"{base_url}/stats").json()["calls"],
+        }
+        if gemini is not None:
+            stats = gemini.stats()
+            row.update({k: stats[k] for k in ("retries", "hedges", "hedge_wins")})
+        rows.append(row)
+        print(f">>> {row}")
+
+    server.should_exit = True
+    write_report(
+        "gemini_client",
+        rows,
+        title=(
+            f"Gemini client ({args.requests} calls, {args.concurrency} concurrent, "
+            f"{args.slow_ratio:.0%} slow at {args.slow_ms} ms, "
+            f"{args.error_rate:.0%} errors)"
+        ),
+    )
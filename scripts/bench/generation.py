@@ -0,0 +1,70 @@
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from scripts.bench.common import SAMPLE_QUERIES, latency_summary, write_report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Continuous-batching scheduler vs generation_lock under load."
+    )
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent callers")
+    parser.add_argument("--requests", type=int, default=8, help="Answers per mode")
+    parser.add_argument("--max-token", type=int, default=64, help="New tokens")
+    args = parser.parse_args()
+
+    from lib import rag
+    from lib.gen_scheduler import GenerationScheduler
+
+    queries = [SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)] for i in range(args.requests)]
+    contexts = {query: rag.build_context(query=query) for query in set(queries)}
+    scheduler = rag.gen_scheduler or GenerationScheduler(
+        model=rag.gen_model, tokenizer=rag.gen_tokenizer, device=rag.DEVICE
+    )
+
+    # Generated tokens are counted at the source: generate() outputs for the lock
+    # path, the scheduler's own counter for the scheduler path
+    lock_tokens = []
+    generate = rag.gen_model.generate
+
+    def counting_generate(*a, **kwargs):
+        output_ids = generate(*a, **kwargs)
+        lock_tokens.append(output_ids.shape[1] - kwargs["input_ids"].shape[1])
+        return output_ids
+
+    rag.gen_model.generate = counting_generate
+
+    def answer(query: str) -> tuple:
+        time_s = time.perf_counter()
+        text = rag.llama_generate_response(
+            context=contexts[query], query=query, max_token=args.max_token
+        )
+        return time.perf_counter() - time_s, text
+
+    rows = []
+    for mode in ("lock", "scheduler"):
+        rag.gen_scheduler = scheduler if mode == "scheduler" else None
+        lock_tokens.clear()
+        scheduler_tokens = scheduler.stats()["tokens"]
+        time_s = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            results = list(pool.map(answer, queries))
+        wall = time.perf_counter() - time_s
+        if mode == "lock":
+            tokens = sum(lock_tokens)
+        else:
+            tokens = scheduler.stats()["tokens"] - scheduler_tokens
+        row = {
+            "mode": mode,
+            "clients": args.clients,
+            "tokens_per_s": round(tokens / wall, 2),
+            "wall_s": round(wall, 3),
+        }
+        row.update(latency_summary([latency for latency, _ in results]))
+        rows.append(row)
+        print(f">>> {row}")
+    print(f">>> Scheduler stats: {scheduler.stats()}")
+    write_report(
+        "generation_scheduler",
+        rows,
+        title=f"Generation scheduler vs lock ({args.clients} clients)",
+    )
@@ -0,0 +1,101 @@
+import time
+import argparse
+import numpy as np
+from lib.embedding_store import load_embedding_store
+from lib.faiss_index import build_index, set_search_params
+from scripts.bench.common import latency_summary, write_report
+
+# (index_type, nprobe, ef_search) settings compared against the exact flat scan
+SETTINGS = [
+    ("flat", None, None),
+    ("ivf", 1, None),
+    ("ivf", 4, None),
+    ("ivf", 16, None),
+    ("ivf", 64, None),
+    ("hnsw", None, 16),
+    ("hnsw", None, 64),
+    ("hnsw", None, 128),
+    ("sq8", None, None),
+    ("ivfpq", 16, None),
+    ("ivfpq", 64, None),
+]
+
+
+def make_queries(vectors: np.ndarray, n_queries: int, seed: int = 0) -> np.ndarray:
+    # Perturbed corpus vectors stand in for real questions near existing articles
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = np.asarray(vectors[rows], dtype="float32")
+    noise = rng.normal(scale=queries.std() * 0.1, size=queries.shape)
+    return (queries + noise).astype("float32")
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    hits = [len(set(t) & set(f)) / len(t) for t, f in zip(truth, found)]
+    return float(np.mean(hits))
+
+
+def run(vectors: np.ndarray, n_queries: int, top_k: int) -> list:
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    queries = make_queries(vectors, n_queries)
+    flat = build_index(vectors, "flat")
+    _, truth = flat.search(queries, top_k)
+
+    rows = []
+    built = {}
+    for index_type, nprobe, ef_search in SETTINGS:
+        if index_type not in built:
+            time_s = time.perf_counter()
+            built[index_type] = (
+                build_index(vectors, index_type),
+                time.perf_counter() - time_s,
+            )
+        index, build_seconds = built[index_type]
+        set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+
+        latencies, found = [], []
+        for query in queries:
+            time_s = time.perf_counter()
+            _, ids = index.search(query[None, :], top_k)
+            latencies.append(time.perf_counter() - time_s)
+            found.append(ids[0])
+        row = {
+            "index": index_type,
+            "nprobe": nprobe or "",
+            "ef_search": ef_search or "",
+            f"recall@{top_k}": round(recall_at_k(truth, np.array(found)), 4),
+            "build_s": round(build_seconds, 2),
+        }
+        row.update(latency_summary(latencies))
+        rows.append(row)
+        print(f">>> {row}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recall vs latency of FAISS index types against the flat index."
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--top-k", type=int, default=8, help="Neighbours per query")
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="Replicate the corpus with noise up to N vectors to simulate growth",
+    )
+    args = parser.parse_args()
+
+    vectors = load_embedding_store().vectors_float32()
+    if args.synthetic > len(vectors):
+        rng = np.random.default_rng(1)
+        extra = vectors[rng.integers(0, len(vectors), args.synthetic - len(vectors))]
+        extra = extra + rng.normal(scale=vectors.std() * 0.05, size=extra.shape)
+        vectors = np.vstack([vectors, extra]).astype("float32")
+
+    rows = run(vectors, n_queries=args.queries, top_k=args.top_k)
+    write_report(
+        f"index_recall_{len(vectors)}",
+        rows,
+        title=f"Index recall vs latency ({len(vectors)} vectors, top_k={args.top_k})",
+    )
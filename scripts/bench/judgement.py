@@ -0,0 +1,54 @@
+import argparse
+from scripts.bench.common import (
+    SAMPLE_QUERIES,
+    latency_summary,
+    time_calls,
+    write_report,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Logit-scored vs generated judgement of the local Llama."
+    )
+    parser.add_argument("--pairs", type=int, default=8, help="Candidate pairs")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed calls per pair")
+    args = parser.parse_args()
+
+    from lib import rag
+
+    # Candidate pairs: two different retrieved articles for the same question
+    pairs = []
+    for query in SAMPLE_QUERIES[: args.pairs]:
+        hits = rag.retriever.retrieve(query=query, top_k=2)
+        pairs.append((hits[0]["text"][:300], hits[-1]["text"][:300]))
+
+    rows, choices = [], {}
+    for mode in ("generate", "score"):
+        rag.JUDGEMENT_MODE = mode
+        latencies, decided, choices[mode] = [], 0, []
+        for answer_x, answer_y in pairs:
+            latencies += time_calls(
+                lambda: rag.llama_judgement(answer_x, answer_y), args.repeat
+            )
+            judgement = rag.llama_judgement(answer_x, answer_y)
+            choice = 1 if "回答1" in judgement else 2 if "回答2" in judgement else None
+            decided += choice is not None
+            choices[mode].append(choice)
+        row = {
+            "mode": mode,
+            "pairs": len(pairs),
+            "decided": decided,
+            **latency_summary(latencies),
+        }
+        if mode == "score":
+            confidences = [rag.llama_judgement_score(x, y)[1] for x, y in pairs]
+            row["mean_confidence"] = round(sum(confidences) / len(confidences), 3)
+            row["agrees_with_generate"] = sum(
+                a == b for a, b in zip(choices["generate"], choices["score"])
+            )
+        rows.append(row)
+        print(f">>> {row}")
+
+    write_report(
+        "judgement", rows, title="Local judgement: generate + string match vs scoring"
+    )
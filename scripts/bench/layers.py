@@ -0,0 +1,98 @@
+import torch
+import argparse
+import numpy as np
+from lib.encoders import LlamaMeanPoolEncoder, mean_pool, truncate_layers
+from lib.embedding_store import load_embedding_store
+from lib.faiss_index import build_index
+from scripts.reembed_store import MODEL_NAME, DEVICE
+from scripts.bench.common import (
+    SAMPLE_QUERIES,
+    latency_summary,
+    time_calls,
+    write_report,
+)
+
+
+def embed_all_layers(
+    encoder: LlamaMeanPoolEncoder, texts: list, batch_size: int
+) -> list:
+    """
+    One full-depth pass per batch yields every layer's hidden states; each is passed
+    through the final norm so it matches what a truncated model would return.
+    """
+    per_layer = None
+    for bgn in range(0, len(texts), batch_size):
+        tokens = encoder.tokenizer(
+            texts[bgn : bgn + batch_size],
+            padding=True,
+            truncation=True,
+            max_length=512,
+            return_tensors="pt",
+        ).to(encoder.device)
+        with torch.no_grad():
+            output = encoder.model(**tokens, output_hidden_states=True)
+            states = list(output.hidden_states[1:-1]) + [output.last_hidden_state]
+            states = [encoder.model.norm(h) for h in states[:-1]] + [states[-1]]
+        pooled = [
+            mean_pool(h.float(), tokens.attention_mask).cpu().numpy() for h in states
+        ]
+        per_layer = (
+            pooled
+            if per_layer is None
+            else [np.vstack([a, b]) for a, b in zip(per_layer, pooled)]
+        )
+    return [p.astype("float32") for p in per_layer]
+
+
+def agreement(reference: np.ndarray, found: np.ndarray) -> float:
+    return float(
+        np.mean([len(set(r) & set(f)) / len(r) for r, f in zip(reference, found)])
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Retrieval agreement and encode latency of early-exit layers."
+    )
+    parser.add_argument("--corpus", type=int, default=1000, help="Corpus sample size")
+    parser.add_argument("--top-k", type=int, default=5, help="Neighbours per query")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed encode calls")
+    parser.add_argument("--step", type=int, default=2, help="Evaluate every Nth layer")
+    args = parser.parse_args()
+
+    encoder = LlamaMeanPoolEncoder(model_name=MODEL_NAME, device=DEVICE)
+    n_layers = len(encoder.model.layers)
+    corpus = load_embedding_store().texts[: args.corpus]
+    corpus_layers = embed_all_layers(encoder, corpus, batch_size=16)
+    query_layers = embed_all_layers(encoder, SAMPLE_QUERIES, batch_size=16)
+
+    _, reference = build_index(corpus_layers[-1], "flat").search(
+        query_layers[-1], args.top_k
+    )
+    full_latency = None
+    rows = []
+    layers = sorted(set(range(args.step, n_layers + 1, args.step)) | {n_layers})
+    for layer in reversed(layers):
+        _, found = build_index(corpus_layers[layer - 1], "flat").search(
+            query_layers[layer - 1], args.top_k
+        )
+        model = truncate_layers(encoder.model, layer)
+        tokens = encoder.tokenizer([SAMPLE_QUERIES[0]], return_tensors="pt").to(
+            encoder.device
+        )
+
+        def encode_once():
+            with torch.no_grad():
+                model(**tokens)
+
+        summary = latency_summary(time_calls(encode_once, args.repeat))
+        full_latency = full_latency or summary["p50_ms"]
+        row = {
+            "layer": layer,
+            f"agreement@{args.top_k}": round(agreement(reference, found), 4),
+            "speedup": round(full_latency / summary["p50_ms"], 2),
+        }
+        row.update(summary)
+        rows.append(row)
+        print(f">>> {row}")
+    write_report("encoder_layers", rows, title=f"Early-exit layers ({MODEL_NAME})")
@@ -0,0 +1,80 @@
+import sys
+import json
+import argparse
+import subprocess
+from scripts.bench.common import SAMPLE_QUERIES, write_report
+
+
+def load(mode: str) -> dict:
+    # Runs in a fresh interpreter so every mode starts from the same baseline
+    import torch
+    import numpy as np
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+    from lib.encoders import LlamaMeanPoolEncoder
+    from lib.utils import rss_mb
+    from scripts.reembed_store import MODEL_NAME, DEVICE
+
+    before = rss_mb()
+    gen_tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    gen_model = AutoModelForCausalLM.from_pretrained(
+        MODEL_NAME, torch_dtype=torch.float16
+    ).to(DEVICE)
+    if mode == "shared":
+        encoder = LlamaMeanPoolEncoder(
+            model_name=MODEL_NAME,
+            device=DEVICE,
+            model=gen_model.model,
+            tokenizer=gen_tokenizer,
+        )
+    else:
+        encoder = LlamaMeanPoolEncoder(model_name=MODEL_NAME, device=DEVICE)
+    after = rss_mb()
+
+    params = {id(p): p for p in gen_model.parameters()}
+    params.update({id(p): p for p in encoder.model.parameters()})
+    return {
+        "mode": mode,
+        "rss_before_mb": before,
+        "rss_after_mb": after,
+        "rss_models_mb": round(after - before, 1),
+        "param_mb": round(
+            sum(p.numel() * p.element_size() for p in params.values()) / 2**20, 1
+        ),
+        "embedding": np.round(encoder.encode(SAMPLE_QUERIES[:2])[:, :8], 4).tolist(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Resident memory of separate vs shared embedding/generation models."
+    )
+    parser.add_argument("--child", type=str, choices=["separate", "shared"])
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(load(args.child)))
+        sys.exit(0)
+
+    rows = []
+    for mode in ("separate", "shared"):
+        output = subprocess.run(
+            [sys.executable, "-m", "scripts.bench.memory", "--child", mode],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        rows.append(json.loads(output.strip().splitlines()[-1]))
+    same = rows[0].pop("embedding") == rows[1].pop("embedding")
+    for row in rows:
+        row["same_embeddings"] = same
+        print(f">>> {row}")
+    rows.append(
+        {
+            "mode": "saved",
+            "rss_models_mb": round(
+                rows[0]["rss_models_mb"] - rows[1]["rss_models_mb"], 1
+            ),
+            "param_mb": round(rows[0]["param_mb"] - rows[1]["param_mb"], 1),
+        }
+    )
+    write_report("model_memory", rows, title="Shared vs separate model memory")
@@ -0,0 +1,78 @@
+import torch
+import argparse
+from scripts.bench.common import (
+    SAMPLE_QUERIES,
+    latency_summary,
+    time_calls,
+    write_report,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Prefill latency with and without the cached prompt preambles."
+    )
+    parser.add_argument("--queries", type=int, default=6, help="Prompts to time")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed prefills each")
+    args = parser.parse_args()
+
+    from lib import rag
+    from lib.prefix_cache import PrefixCache
+
+    prefix_cache = rag.prefix_cache or PrefixCache(
+        model=rag.gen_model, tokenizer=rag.gen_tokenizer, device=rag.DEVICE
+    )
+    for preamble in (rag.ANSWER_PREAMBLE, rag.JUDGEMENT_PREAMBLE):
+        prefix_cache.add(preamble)
+
+    prompts = {"answer": [], "judgement": []}
+    for query in SAMPLE_QUERIES[: args.queries]:
+        context = rag.build_context(query=query)
+        prompts["answer"].append(rag.build_prompt(context=context, query=query))
+        prompts["judgement"].append(
+            rag.JUDGEMENT_PREAMBLE + f"\n回答1: {context[:200]}\n回答2: {query}"
+        )
+
+    rows = []
+    for kind, texts in prompts.items():
+        full, cached, shared_tokens, prompt_tokens = [], [], 0, 0
+        for prompt in texts:
+            # Only the prefix tokens the whole prompt's tokenization agrees with count
+            input_ids, prefix_kv = prefix_cache.encode(prompt)
+            joint_ids = rag.gen_tokenizer(prompt, return_tensors="pt").input_ids
+            shared_tokens += prefix_kv.get_seq_length() if prefix_kv is not None else 0
+            prompt_tokens += input_ids.shape[1]
+
+            def prefill_full():
+                with torch.no_grad():
+                    rag.gen_model(input_ids=joint_ids.to(rag.DEVICE))
+
+            def prefill_cached():
+                ids, prefix_kv = prefix_cache.encode(prompt)
+                n_cached = prefix_kv.get_seq_length() if prefix_kv is not None else 0
+                with torch.no_grad():
+                    rag.gen_model(
+                        input_ids=ids[:, n_cached:], past_key_values=prefix_kv
+                    )
+
+            full += time_calls(prefill_full, args.repeat)
+            cached += time_calls(prefill_cached, args.repeat)
+
+        for mode, latencies in (("full prompt", full), ("cached prefix", cached)):
+            row = {
+                "prompt": kind,
+                "mode": mode,
+                "mean_prompt_tokens": round(prompt_tokens / len(texts), 1),
+                "mean_cached_tokens": round(shared_tokens / len(texts), 1),
+            }
+            row.update(latency_summary(latencies))
+            rows.append(row)
+            print(f">>> {row}")
+        rows.append(
+            {
+                "prompt": kind,
+                "mode": "speedup",
+                "mean_ms": round(rows[-2]["mean_ms"] / rows[-1]["mean_ms"], 2),
+            }
+        )
+    print(f">>> Prefix cache: {prefix_cache.stats()}")
+    write_report("prefill_prefix_cache", rows, title="Prefill with cached preambles")
@@ -0,0 +1,90 @@
+import time
+import argparse
+import numpy as np
+from lib.embedding_store import load_embedding_store
+from lib.faiss_index import build_index
+from lib.sharded_index import ShardedIndex, law_labels
+from scripts.bench.common import latency_summary, write_report
+from scripts.bench.index_recall import recall_at_k
+
+
+def timed_search(index, queries: np.ndarray, top_k: int, texts=None) -> tuple:
+    latencies, found = [], []
+    for row, query in enumerate(queries):
+        kwargs = {"queries": [texts[row]]} if texts is not None else {}
+        time_s = time.perf_counter()
+        _, ids = index.search(query[None, :], top_k, **kwargs)
+        latencies.append(time.perf_counter() - time_s)
+        found.append(ids[0])
+    return latencies, np.array(found)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Latency and recall of per-law index shards vs the flat index."
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--top-k", type=int, default=8, help="Neighbours per query")
+    parser.add_argument("--min-shard-size", type=int, default=32)
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="Replicate the corpus with noise up to N vectors to simulate growth",
+    )
+    args = parser.parse_args()
+
+    store = load_embedding_store()
+    vectors = np.ascontiguousarray(store.vectors_float32(), dtype="float32")
+    labels = law_labels(store.texts)
+    rng = np.random.default_rng(1)
+    if args.synthetic > len(vectors):
+        rows = rng.integers(0, len(vectors), args.synthetic - len(vectors))
+        extra = vectors[rows] + rng.normal(
+            scale=vectors.std() * 0.05, size=(len(rows), vectors.shape[1])
+        )
+        vectors = np.vstack([vectors, extra]).astype("float32")
+        labels = labels + [labels[row] for row in rows]
+
+    # Perturbed corpus vectors as questions; the keyword run also names their law
+    rows = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[rows] + rng.normal(
+        scale=vectors.std() * 0.1, size=(len(rows), vectors.shape[1])
+    )
+    queries = queries.astype("float32")
+    texts = [f"請問{labels[row]}的相關規定" for row in rows]
+
+    flat = build_index(vectors, "flat")
+    _, truth = flat.search(queries, args.top_k)
+    configs = [("flat", flat, None, None)]
+    for n_route in (1, 2, 3):
+        sharded = ShardedIndex(
+            vectors, labels, min_shard_size=args.min_shard_size, n_route=n_route
+        )
+        configs.append((f"sharded centroid top-{n_route}", sharded, None, n_route))
+    sharded = ShardedIndex(vectors, labels, min_shard_size=args.min_shard_size)
+    configs.append(("sharded law keyword", sharded, texts, ""))
+
+    rows_out = []
+    for name, index, query_texts, n_route in configs:
+        latencies, found = timed_search(index, queries, args.top_k, query_texts)
+        row = {
+            "index": name,
+            "shards": len(index.shards) if hasattr(index, "shards") else 1,
+            "mean_shards_searched": (
+                index.stats()["mean_shards_searched"] if hasattr(index, "stats") else 1
+            ),
+            f"recall@{args.top_k}": round(recall_at_k(truth, found), 4),
+            **latency_summary(latencies),
+        }
+        rows_out.append(row)
+        print(f">>> {row}")
+
+    write_report(
+        f"sharding_{len(vectors)}",
+        rows_out,
+        title=(
+            f"Per-law shards vs flat index ({len(vectors)} vectors, "
+            f"top_k={args.top_k})"
+        ),
+    )
@@ -0,0 +1,76 @@
+import time
+import argparse
+from scripts.bench.common import SAMPLE_QUERIES, latency_summary, write_report
+
+
+def legacy_candidates(rag, query: str) -> tuple:
+    # The previous pipeline: every candidate runs its own retrieval
+    rag_process = getattr(rag, "gemini_rag_process", None) or rag.llama_rag_process
+    future1 = rag.executor.submit(rag_process, query)
+    future2 = rag.executor.submit(rag_process, query)
+    return future1.result(), future2.result()
+
+
+def measure(fn, queries: list) -> tuple:
+    wall, cpu = [], []
+    for query in queries:
+        wall_s, cpu_s = time.perf_counter(), time.process_time()
+        fn(query)
+        wall.append(time.perf_counter() - wall_s)
+        cpu.append(time.process_time() - cpu_s)
+    return wall, cpu
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Latency/CPU saved by sharing retrieval between candidates."
+    )
+    parser.add_argument(
+        "--backend", type=str, choices=["gemini", "llama"], default="gemini"
+    )
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over queries")
+    args = parser.parse_args()
+
+    if args.backend == "gemini":
+        from lib import rag_gemini as rag
+
+        rag.gemini_generate = lambda prompt, max_token=1024: "回答1"
+    else:
+        from lib import rag as rag
+
+        rag.llama_generate_response = lambda context, query, max_token: "回答1"
+        # judge_candidates generates both candidates through this one (batched mode)
+        rag.llama_generate_candidates = (
+            lambda context, query, max_token, n_candidates=2: ["回答1"] * n_candidates
+        )
+        rag.llama_judgement = lambda answer_x, answer_y: "回答1"
+
+    # Caches off and generation stubbed, so only retrieval cost is compared
+    rag.retriever.embedding_cache.max_size = 0
+    rag.retriever.result_cache.max_size = 0
+    queries = SAMPLE_QUERIES * args.rounds
+
+    rows = []
+    for path, fn in (
+        ("per-candidate retrieval", lambda q: legacy_candidates(rag, q)),
+        ("shared retrieval", rag.judge_candidates),
+    ):
+        wall, cpu = measure(fn, queries)
+        row = {"path": path, "cpu_ms_per_request": round(1000 * sum(cpu) / len(cpu), 3)}
+        row.update(latency_summary(wall))
+        rows.append(row)
+        print(f">>> {row}")
+    rows.append(
+        {
+            "path": "saved per request",
+            "cpu_ms_per_request": round(
+                rows[0]["cpu_ms_per_request"] - rows[1]["cpu_ms_per_request"], 3
+            ),
+            "mean_ms": round(rows[0]["mean_ms"] - rows[1]["mean_ms"], 3),
+        }
+    )
+    write_report(
+        f"shared_retrieval_{args.backend}",
+        rows,
+        title=f"Shared retrieval between judgement candidates ({args.backend})",
+    )
@@ -0,0 +1,43 @@
+import sys
+import time
+import argparse
+import importlib
+from lib.utils import rss_mb
+from scripts.bench.common import write_report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import time and per-step load time/memory of the RAG modules."
+    )
+    parser.add_argument(
+        "--backend", type=str, choices=["gemini", "llama"], default="gemini"
+    )
+    args = parser.parse_args()
+    module_name = "lib.rag_gemini" if args.backend == "gemini" else "lib.rag"
+
+    rss_s, time_s = rss_mb(), time.perf_counter()
+    rag = importlib.import_module(module_name)
+    rows = [
+        {
+            "step": f"import {module_name}",
+            "seconds": round(time.perf_counter() - time_s, 3),
+            "rss_mb": rss_mb(),
+            "delta_mb": round(rss_mb() - rss_s, 1),
+            "torch_imported": "torch" in sys.modules,
+        }
+    ]
+    rag.loader.ensure()
+    rows += rag.loader.profiler.steps
+    rows.append(
+        {
+            "step": "total",
+            "seconds": round(sum(row["seconds"] for row in rows), 3),
+            "rss_mb": rss_mb(),
+            "delta_mb": round(rss_mb() - rss_s, 1),
+        }
+    )
+    for row in rows:
+        print(f">>> {row}")
+    write_report(
+        f"startup_{args.backend}", rows, title=f"Cold start profile ({module_name})"
+    )
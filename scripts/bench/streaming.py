@@ -0,0 +1,37 @@
+import argparse
+from lib.utils import timed_stream
+from scripts.bench.common import SAMPLE_QUERIES, latency_summary, write_report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time-to-first-token vs total time of streamed answers."
+    )
+    parser.add_argument(
+        "--backend", type=str, choices=["gemini", "llama"], default="llama"
+    )
+    parser.add_argument("--queries", type=int, default=4, help="Queries to time")
+    parser.add_argument("--max-token", type=int, default=256, help="New tokens")
+    args = parser.parse_args()
+
+    if args.backend == "gemini":
+        from lib.rag_gemini import gemini_stream_response as stream_response
+    else:
+        from lib.rag import llama_stream_response as stream_response
+
+    ttft, total = [], []
+    for query in SAMPLE_QUERIES[: args.queries]:
+        stats = {}
+        for _ in timed_stream(stream_response(query, max_token=args.max_token), stats):
+            pass
+        ttft.append(stats["ttft"] if stats["ttft"] is not None else stats["total"])
+        total.append(stats["total"])
+
+    rows = []
+    for metric, latencies in (("time to first token", ttft), ("total", total)):
+        row = {"metric": metric}
+        row.update(latency_summary(latencies))
+        rows.append(row)
+        print(f">>> {row}")
+    write_report(
+        f"streaming_{args.backend}", rows, title=f"Streamed answers ({args.backend})"
+    )
@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from lib.path import get_path, get_root
+from scripts.bench.common import SAMPLE_QUERIES, latency_summary, write_report
+
+LAWS = ["民法", "刑法", "勞動基準法", "道路交通管理處罰條例", "消費者保護法"]
+# Rows are matched to the baseline on these columns
+KEY_COLUMNS = ("case", "size")
+
+
+# === Synthetic Corpus / Tiny Model (no downloads, no credentials) ===
+def synthetic_texts(n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    words = "".join(SAMPLE_QUERIES)
+    texts = []
+    for i in range(n):
+        law = LAWS[i % len(LAWS)]
+        body = "".join(rng.choice(list(words), size=int(rng.integers(20, 120))))
+        texts.append(f"{law}第{i // len(LAWS) + 1}條：{body}。")
+    return texts
+
+
+def build_tiny_llama(model_dir: str, texts: list, hidden_size: int) -> None:
+    # Character-level tokenizer + randomly initialised Llama: real code paths, tiny cost
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    vocab = {"<pad>": 0, "<s>": 1, "</s>": 2, "<unk>": 3}
+    for ch in sorted(set("".join(texts + SAMPLE_QUERIES)) | set("回答12：，。\n ")):
+        vocab.setdefault(ch, len(vocab))
+    tokenizer = Tokenizer(models.WordLevel(vocab=vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Split(pattern="", behavior="isolated")
+    tokenizer.decoder = decoders.Fuse()
+    PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        bos_token="<s>",
+        eos_token="</s>",
+        unk_token="<unk>",
+        pad_token="<pad>",
+        model_input_names=["input_ids", "attention_mask"],
+    ).save_pretrained(model_dir)
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=len(vocab),
+        hidden_size=hidden_size,
+        intermediate_size=2 * hidden_size,
+        num_hidden_layers=4,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=4096,
+        pad_token_id=0,
+        bos_token_id=1,
+        eos_token_id=2,
+    )
+    LlamaForCausalLM(config).save_pretrained(model_dir)
+
+
+def prepare_rag(work_dir: str, args):
+    """lib.rag loaded through its normal lazy load, on the tiny model and corpus."""
+    import torch
+    from lib.encoders import get_encoder
+    from lib.embedding_store import get_store_dir, write_store
+
+    model_dir = os.path.join(work_dir, "model")
+    texts = synthetic_texts(args.corpus_size)
+    build_tiny_llama(model_dir, texts, args.hidden_size)
+    encoder = get_encoder(model_dir, torch.device("cpu"), encoder_type="llama")
+    vectors = np.vstack(
+        [encoder.encode(texts[i : i + 32]) for i in range(0, len(texts), 32)]
+    )
+    write_store(
+        get_store_dir(encoder.encoder_id),
+        texts,
+        vectors,
+        meta={"encoder_id": encoder.encoder_id},
+    )
+    del encoder
+
+    from lib import rag
+
+    rag.MODEL_NAME = model_dir
+    rag.loader.ensure()
+    return rag
+
+
+# === Measurement ===
+def run_case(fn, n: int, concurrency: int = 1, warmup: int = 1) -> dict:
+    # Latency percentiles of n calls, and calls/s with `concurrency` callers
+    for i in range(warmup):
+        fn(i)
+
+    def timed(i: int) -> float:
+        time_s = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - time_s
+
+    wall_s = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, range(n)))
+    wall = time.perf_counter() - wall_s
+    return {**latency_summary(latencies), "throughput_per_s": round(n / wall, 3)}
+
+
+def bench_loading(work_dir: str, size: int, dim: int, repeat: int) -> list:
+    from lib.embedding_store import EmbeddingStore, write_store
+
+    texts = synthetic_texts(size, seed=1)
+    vectors = np.random.default_rng(1).normal(size=(size, dim)).astype("float32")
+    json_path = os.path.join(work_dir, "laws_embedding.json")
+    with open(json_path, "w") as f:
+        items = [{"text": t, "embedding": v.tolist()} for t, v in zip(texts, vectors)]
+        json.dump(items, f, ensure_ascii=False)
+    store_dir = os.path.join(work_dir, "load_store")
+    write_store(store_dir, texts, vectors)
+
+    def load_json(_):
+        with open(json_path, "r") as f:
+            data = json.load(f)
+        np.array([item["embedding"] for item in data], dtype="float32")
+
+    def load_store(_):
+        # Open, widen the vectors for FAISS and decode a page of texts
+        store = EmbeddingStore(store_dir)
+        np.asarray(store.vectors_float32()).sum()
+        store.texts[:100]
+
+    return [
+        {"case": "load_json", "size": size, **run_case(load_json, repeat)},
+        {"case": "load_store", "size": size, **run_case(load_store, repeat)},
+    ]
+
+
+def bench_retrieval(rag, args) -> list:
+    from lib.faiss_index import build_index
+
+    def query(i: int) -> str:
+        return SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]
+
+    rows = [
+        {
+            "case": "query_embedding",
+            "size": 1,
+            # Uncached: the encoder forward pass of one question
+            **run_case(lambda i: rag.encoder.encode([query(i)]), args.repeat),
+        },
+        {
+            "case": "query_embedding",
+            "size": 8,
+            **run_case(
+                lambda i: rag.encoder.encode([query(i + j) for j in range(8)]),
+                args.repeat,
+            ),
+        },
+    ]
+    dim = rag.retriever.index.d
+    for size in args.sizes:
+        vectors = np.random.default_rng(2).normal(size=(size, dim)).astype("float32")
+        texts = synthetic_texts(size, seed=2)
+        index = build_index(vectors, "flat")
+
+        def search(i):
+            rag.retriever.search_faiss_idx(
+                query=query(i), idx=index, texts=texts, top_k=8, max_length=512
+            )
+
+        # Warm-up fills the query embedding cache: rows time the search itself
+        result = run_case(search, args.repeat, warmup=len(SAMPLE_QUERIES))
+        rows.append({"case": "search_faiss_idx", "size": size, **result})
+    return rows
+
+
+def bench_generation(rag, args) -> list:
+    contexts = [rag.build_context(query) for query in SAMPLE_QUERIES]
+
+    def generate(i):
+        j = i % len(SAMPLE_QUERIES)
+        rag.llama_generate_response(
+            context=contexts[j], query=SAMPLE_QUERIES[j], max_token=args.max_tokens
+        )
+
+    return [
+        {
+            "case": "llama_generate_response",
+            "size": args.max_tokens,
+            **run_case(generate, args.repeat),
+        }
+    ]
+
+
+def bench_end_to_end(rag, args) -> list:
+    # Candidates and judge are stubbed with fixed latencies; everything else is real
+    stub_s = args.stub_ms / 1000
+
+    def generate_candidates(context: str, query: str, max_token: int = 256) -> list:
+        time.sleep(stub_s)
+        answer = f"依{context[:12]}，{query}"
+        # Identical candidates skip the judge; even-length questions exercise it
+        return [answer, answer if len(query) % 2 else f"{answer}。另請洽詢律師。"]
+
+    def llama_judgement(answer_x: str, answer_y: str) -> str:
+        time.sleep(stub_s / 4)
+        return "回答1"
+
+    def respond(i):
+        # Distinct questions: the query caches must not answer from memory
+        rag.retriever.embedding_cache.clear()
+        rag.retriever.result_cache.clear()
+        rag.response_with_judgement(SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)])
+
+    originals = rag.generate_candidates, rag.llama_judgement
+    rag.generate_candidates, rag.llama_judgement = generate_candidates, llama_judgement
+    try:
+        result = run_case(respond, args.repeat, concurrency=args.concurrency)
+    finally:
+        rag.generate_candidates, rag.llama_judgement = originals
+    return [{"case": "response_with_judgement", "size": args.concurrency, **result}]
+
+
+# === Baseline Comparison ===
+def compare(rows: list, baseline: list, threshold: float, min_delta_ms: float) -> list:
+    """
+    Mark rows whose p50/p95 grew, or throughput fell, by more than `threshold`
+    (0.2 = 20%) against the baseline. Latency changes under `min_delta_ms` are noise.
+    p99 is reported only: over a few dozen calls it is close to the single slowest.
+    """
+    previous = {tuple(row[c] for c in KEY_COLUMNS): row for row in baseline}
+    regressions = []
+    for row in rows:
+        base = previous.get(tuple(row[c] for c in KEY_COLUMNS))
+        if base is None:
+            row["vs_baseline"] = "new"
+            continue
+        worse = []
+        for p in ("p50_ms", "p95_ms"):
+            change = row[p] / max(base[p], 1e-9) - 1
+            if change > threshold and row[p] - base[p] > min_delta_ms:
+                worse.append(f"{p} +{round(100 * change)}%")
+        drop = 1 - row["throughput_per_s"] / max(base["throughput_per_s"], 1e-9)
+        if drop > threshold and row["p50_ms"] - base["p50_ms"] > min_delta_ms:
+            worse.append(f"throughput -{round(100 * drop)}%")
+        if worse:
+            row["vs_baseline"] = "REGRESSION " + ", ".join(worse)
+            regressions.append(row)
+        else:
+            change = row["p95_ms"] / max(base["p95_ms"], 1e-9) - 1
+            row["vs_baseline"] = f"ok (p95 {round(100 * change):+d}%)"
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark suite: loading, embedding, search, generation and "
+        "end-to-end latency on a tiny local model, compared to a stored baseline."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda s: [int(x) for x in s.split(",")],
+        default=[1000, 10000, 100000],
+        help="Corpus sizes of the search_faiss_idx runs (comma separated)",
+    )
+    parser.add_argument("--load-size", type=int, default=2000, help="Texts to load")
+    parser.add_argument("--load-dim", type=int, default=3072, help="Stored vector dim")
+    parser.add_argument("--corpus-size", type=int, default=500, help="RAG corpus size")
+    parser.add_argument("--hidden-size", type=int, default=256, help="Tiny model width")
+    parser.add_argument("--max-tokens", type=int, default=32, help="Generated tokens")
+    parser.add_argument("--stub-ms", type=float, default=50, help="Stubbed LLM latency")
+    parser.add_argument("--concurrency", type=int, default=4, help="End-to-end callers")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per case")
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=os.path.join(get_path(key="REPORTS"), "suite_baseline.json"),
+        help="Baseline results to compare against",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed slowdown (0.2 = 20%%)"
+    )
+    parser.add_argument(
+        "--min-delta-ms", type=float, default=1.0, help="Ignore smaller slowdowns"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store this run as the baseline"
+    )
+    parser.add_argument(
+        "--fail-on-regression", action="store_true", help="Exit 1 on a regression"
+    )
+    args = parser.parse_args()
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        # Without a baseline every case would pass as "new": nothing is compared
+        parser.error(f"no baseline at {args.baseline}; run `make bench-baseline` first")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_suite_")
+    # Everything the RAG module reads from DATA lives in the temporary directory
+    get_root()
+    os.environ["DATA"] = os.path.relpath(work_dir, os.environ["PROJECT_ROOT"])
+    os.environ.update(
+        {
+            "ENCODER": "llama",
+            "ENCODER_LAYER": "",
+            "INDEX_TYPE": "flat",
+            "SHARDED_INDEX": "0",
+            "INDEX_SNAPSHOTS": "0",
+            "ANSWER_CACHE_ENABLED": "0",
+        }
+    )
+
+    try:
+        rows = bench_loading(work_dir, args.load_size, args.load_dim, args.repeat)
+        rag = prepare_rag(work_dir, args)
+        rows += bench_retrieval(rag, args)
+        rows += bench_generation(rag, args)
+        rows += bench_end_to_end(rag, args)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    regressions = []
+    if not args.save_baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(rows, json.load(f), args.threshold, args.min_delta_ms)
+    for row in rows:
+        print(f">>> {row}")
+    write_report("suite", rows, title="Benchmark suite")
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        print(f">>> Baseline saved to: {args.baseline}")
+    if regressions:
+        limit = f"{args.threshold:.0%}"
+        print(f">>> {len(regressions)} case(s) regressed by more than {limit}")
+        if args.fail_on_regression:
+            sys.exit(1)
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import hmac
+import base64
+import hashlib
+import asyncio
+import argparse
+import httpx
+import uvicorn
+from threading import Thread
+from werkzeug.serving import make_server
+from scripts.bench.common import latency_summary, write_report
+
+
+def serve_asgi(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    server.thread = Thread(target=server.run, daemon=True)
+    server.thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def serve_wsgi(app, port: int):
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def webhook_body(i: int) -> str:
+    event = {
+        "type": "message",
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": {"type": "user", "userId": f"U{i}"},
+        "webhookEventId": f"bench-{i}",
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": f"reply-{i}",
+        "message": {"type": "text", "id": str(i), "quoteToken": "q", "text": "民法"},
+    }
+    return json.dumps({"destination": "bench", "events": [event]})
+
+
+def sign(body: str, secret: str) -> str:
+    digest = hmac.new(secret.encode(), body.encode(), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+async def fire(url: str, secret: str, n_requests: int, concurrency: int) -> list:
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def post(client: httpx.AsyncClient, i: int):
+        body = webhook_body(i)
+        headers = {"X-Line-Signature": sign(body, secret)}
+        async with slots:
+            time_s = time.perf_counter()
+            response = await client.post(url, content=body, headers=headers)
+            latencies.append(time.perf_counter() - time_s)
+            response.raise_for_status()
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        await asyncio.gather(*[post(client, i) for i in range(n_requests)])
+    return latencies
+
+
+def wait_delivered(line_url: str, n_requests: int, timeout: float = 600) -> int:
+    deadline = time.monotonic() + timeout
+    delivered = 0
+    while time.monotonic() < deadline:
+        stats = httpx.get(f"{line_url}/stats").json()
+        delivered = stats["reply"] + stats["push"]
+        if delivered >= n_requests:
+            break
+        time.sleep(0.02)
+    return delivered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Webhook throughput of the Flask and ASGI entry points."
+    )
+    parser.add_argument("--requests", type=int, default=100, help="Webhook calls")
+    parser.add_argument("--concurrency", type=int, default=16, help="In-flight calls")
+    parser.add_argument(
+        "--answer-ms", type=float, default=200, help="Stubbed answer latency"
+    )
+    parser.add_argument(
+        "--line-latency-ms", type=float, default=20, help="Stand-in LINE API latency"
+    )
+    parser.add_argument("--port", type=int, default=9101, help="Bot server port")
+    parser.add_argument("--line-port", type=int, default=9100, help="LINE API port")
+    args = parser.parse_args()
+
+    # Must be set before the entry points build their LINE clients and queues
+    line_url = f"http://127.0.0.1:{args.line_port}"
+    os.environ["LINE_API_HOST"] = line_url
+    os.environ["WEBHOOK_QUEUE_SIZE"] = str(args.requests)
+    os.environ["WARM_UP"] = "0"
+
+    from scripts.bench import fake_line_api
+    from scripts import main as flask_main
+    from scripts import main_asgi
+
+    fake_line_api.app.state.latency_ms = args.line_latency_ms
+    line_server = serve_asgi(fake_line_api.app, args.line_port)
+
+    # Only the serving path is compared: the RAG answer is a fixed-latency stub
+    def stub_answer(query: str) -> str:
+        time.sleep(args.answer_ms / 1000)
+        return f"stub answer: {query}"
+
+    flask_main.response_with_judgement = stub_answer
+    main_asgi.response_with_judgement = stub_answer
+    secret = flask_main.LINE_CHANNEL_SECRET or ""
+
+    rows = []
+    for name in ("flask", "asgi"):
+        httpx.post(f"{line_url}/reset")
+        if name == "flask":
+            server = serve_wsgi(flask_main.app, args.port)
+        else:
+            server = serve_asgi(main_asgi.app, args.port)
+
+        time_s = time.perf_counter()
+        latencies = asyncio.run(
+            fire(
+                f"http://127.0.0.1:{args.port}/",
+                secret,
+                args.requests,
+                args.concurrency,
+            )
+        )
+        delivered = wait_delivered(line_url, args.requests)
+        elapsed = time.perf_counter() - time_s
+
+        if name == "flask":
+            server.shutdown()
+        else:
+            server.should_exit = True
+            server.thread.join(timeout=30)
+
+        row = {
+            "server": name,
+            "delivered": delivered,
+            "throughput_rps": round(delivered / elapsed, 2),
+        }
+        row.update({f"ack_{k}": v for k, v in latency_summary(latencies).items()})
+        rows.append(row)
+        print(f">>> {row}")
+
+    line_server.should_exit = True
+    write_report(
+        "webhook_throughput",
+        rows,
+        title=(
+            f"Webhook throughput ({args.requests} requests, answer {args.answer_ms} ms,"
+            f" LINE API {args.line_latency_ms} ms)"
+        ),
+    )
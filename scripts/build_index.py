@@ -0,0 +1,52 @@
+import time
+import argparse
+from lib.config import get_env
+from lib.embedding_store import load_embedding_store
+from lib.faiss_index import INDEX_TYPES, build_index, get_index_path, save_index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Train a FAISS index over the embedding store and write it to disk."
+    )
+    parser.add_argument(
+        "--type",
+        type=str,
+        choices=INDEX_TYPES,
+        default=get_env("INDEX_TYPE", "flat"),
+        help="Index type (default: INDEX_TYPE in .env)",
+    )
+    parser.add_argument("--nlist", type=int, default=None, help="IVF cell count")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW graph degree")
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ sub-quantizers")
+    parser.add_argument("--output", type=str, default=None, help="Index file path")
+    parser.add_argument(
+        "--store", type=str, default=None, help="Store directory (default encoder's)"
+    )
+    args = parser.parse_args()
+
+    store = load_embedding_store(store_dir=args.store)
+    embeddings = store.vectors_float32()
+    time_s = time.time()
+    index = build_index(
+        embeddings,
+        index_type=args.type,
+        nlist=args.nlist,
+        hnsw_m=args.hnsw_m,
+        pq_m=args.pq_m,
+    )
+    build_seconds = round(time.time() - time_s, 2)
+    path = args.output or get_index_path(args.type, store.encoder_id)
+    save_index(
+        index,
+        path,
+        meta={
+            "index_type": args.type,
+            "encoder_id": store.encoder_id,
+            "store_fingerprint": store.fingerprint,
+            "nlist": args.nlist,
+            "hnsw_m": args.hnsw_m,
+            "pq_m": args.pq_m,
+            "build_seconds": build_seconds,
+        },
+    )
+    print(f">>> {args.type} index ({index.ntotal} vectors) saved to: {path}")
@@ -0,0 +1,41 @@
+import argparse
+from lib.embedding_store import (
+    DEFAULT_ENCODER_ID,
+    STORE_DTYPES,
+    convert_json_to_store,
+    get_json_path,
+    get_store_dir,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert laws_embedding.json into the mmap embedding store."
+    )
+    parser.add_argument(
+        "--input", type=str, default=None, help="Source JSON file (default: DATA)"
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="Target store directory"
+    )
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        choices=STORE_DTYPES,
+        default="float32",
+        help="Vector dtype on disk; float16 halves the file but is widened on load",
+    )
+    parser.add_argument(
+        "--encoder-id",
+        type=str,
+        default=DEFAULT_ENCODER_ID,
+        help="Encoder that produced the JSON vectors (queries must use the same one)",
+    )
+    args = parser.parse_args()
+
+    store = convert_json_to_store(
+        json_path=args.input or get_json_path(),
+        store_dir=args.output or get_store_dir(args.encoder_id),
+        dtype=args.dtype,
+        encoder_id=args.encoder_id,
+    )
+    print(f">>> Store ready: {len(store)} vectors, dim={store.dim}")
@@ -0,0 +1,200 @@
+import os
+import time
+import torch
+import argparse
+import multiprocessing
+from lib.config import get_env
+from lib.path import get_path
+from lib.corpus import (
+    EmbeddingCheckpoint,
+    build_corpus,
+    corpus_fingerprint,
+    load_articles,
+    plan_batches,
+)
+from lib.encoders import ENCODER_TYPES, get_encoder
+from lib.embedding_store import STORE_DTYPES, EmbeddingStore, get_store_dir, write_store
+from lib.faiss_index import INDEX_TYPES, build_index, get_index_path, save_index
+
+MODEL_NAME = "lianghsun/Llama-3.2-Taiwan-Legal-3B-Instruct"
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+# === Worker Process (one encoder per process) ===
+encoder = None
+
+
+def init_worker(encoder_type: str, layer, n_threads: int) -> None:
+    global encoder
+    # Processes split the cores instead of all of them oversubscribing every core
+    torch.set_num_threads(n_threads)
+    encoder = get_encoder(
+        model_name=MODEL_NAME, device=DEVICE, encoder_type=encoder_type, layer=layer
+    )
+
+
+def worker_encoder_id() -> str:
+    return encoder.encoder_id
+
+
+def encode_batch(task: tuple) -> tuple:
+    # Same tokenizer call and mean pooling as query embedding, padded to the batch
+    k, texts, max_length = task
+    return k, encoder.encode(texts, max_length=max_length)
+
+
+def embed_batches(
+    checkpoint: EmbeddingCheckpoint, texts: list, max_length: int, pool=None
+) -> None:
+    pending = checkpoint.pending()
+    tasks = (
+        (k, [texts[i] for i in checkpoint.batches[k]], max_length) for k in pending
+    )
+    results = (
+        pool.imap_unordered(encode_batch, tasks) if pool else map(encode_batch, tasks)
+    )
+    time_s, done = time.time(), len(checkpoint.batches) - len(pending)
+    for n, (k, vectors) in enumerate(results, start=1):
+        checkpoint.save(k, vectors)
+        if n % 10 == 0 or n == len(pending):
+            rate = n / (time.time() - time_s)
+            print(
+                f">>> Embedded batch {done + n}/{len(checkpoint.batches)} "
+                f"({round(rate, 2)} batches/s)"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Chunk raw law texts, embed them and write the store and index."
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        nargs="+",
+        default=[os.path.join(get_path(key="DATA"), "raw")],
+        help="<law>.txt / 全國法規資料庫 JSON files or directories (default: DATA/raw)",
+    )
+    parser.add_argument(
+        "--encoder",
+        type=str,
+        choices=ENCODER_TYPES,
+        default=get_env("ENCODER", "llama"),
+        help="Backend (default: ENCODER in .env)",
+    )
+    parser.add_argument(
+        "--layer", type=int, default=None, help="Early-exit layer (llama encoders)"
+    )
+    parser.add_argument("--max-chars", type=int, default=400, help="Chunk size")
+    parser.add_argument("--max-length", type=int, default=512, help="Token limit")
+    parser.add_argument("--batch-size", type=int, default=16, help="Texts per batch")
+    parser.add_argument(
+        "--max-batch-chars",
+        type=int,
+        default=4096,
+        help="Padded characters per batch (count x longest text)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Encoder processes (CPU only)"
+    )
+    parser.add_argument(
+        "--dtype", type=str, choices=STORE_DTYPES, default="float32", help="Store dtype"
+    )
+    parser.add_argument(
+        "--index-type",
+        type=str,
+        choices=INDEX_TYPES,
+        default=get_env("INDEX_TYPE", "flat"),
+        help="Index type (default: INDEX_TYPE in .env)",
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="Store directory (encoder's default)"
+    )
+    parser.add_argument(
+        "--index-output", type=str, default=None, help="Index file path"
+    )
+    parser.add_argument(
+        "--work-dir", type=str, default=None, help="Checkpoint directory (<store>.work)"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="Discard the checkpoint and start over"
+    )
+    parser.add_argument(
+        "--keep-work", action="store_true", help="Keep the checkpoint when finished"
+    )
+    args = parser.parse_args()
+
+    time_s = time.time()
+    articles = load_articles(args.input)
+    texts = build_corpus(articles, max_chars=args.max_chars)
+    if not texts:
+        raise SystemExit(f">>> No law articles found in: {args.input}")
+    print(f">>> {len(articles)} articles -> {len(texts)} chunks")
+
+    # Every worker loads its own model copy; a GPU is shared better by one process
+    workers = 1 if DEVICE.type == "cuda" else max(1, args.workers)
+    n_threads = max(1, (os.cpu_count() or 1) // workers)
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.get_context("spawn").Pool(
+            workers,
+            initializer=init_worker,
+            initargs=(args.encoder, args.layer, n_threads),
+        )
+        encoder_id = pool.apply(worker_encoder_id)
+    else:
+        init_worker(args.encoder, args.layer, n_threads)
+        encoder_id = worker_encoder_id()
+    print(f">>> Encoder: {encoder_id} on {workers} process(es)")
+
+    store_dir = args.output or get_store_dir(encoder_id)
+    work_dir = args.work_dir or f"{store_dir.rstrip(os.sep)}.work"
+    batches = plan_batches(
+        [len(text) for text in texts], args.batch_size, args.max_batch_chars
+    )
+    fingerprint = corpus_fingerprint(
+        texts, encoder_id=encoder_id, max_length=args.max_length, batches=batches
+    )
+    checkpoint = EmbeddingCheckpoint(work_dir, fingerprint, batches, args.restart)
+    if len(checkpoint.pending()) < len(batches):
+        print(f">>> Resuming: {len(checkpoint.pending())}/{len(batches)} batches left")
+    try:
+        embed_batches(checkpoint, texts, args.max_length, pool=pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    embeddings = checkpoint.assemble(len(texts))
+    embed_seconds = round(time.time() - time_s, 2)
+
+    write_store(
+        store_dir=store_dir,
+        texts=texts,
+        embeddings=embeddings,
+        dtype=args.dtype,
+        meta={
+            "encoder_id": encoder_id,
+            "max_chars": args.max_chars,
+            "max_length": args.max_length,
+            "embed_seconds": embed_seconds,
+        },
+    )
+    print(f">>> {len(texts)} texts in {embed_seconds}s -> {store_dir}")
+
+    index_s = time.time()
+    index = build_index(embeddings, index_type=args.index_type)
+    index_path = args.index_output or get_index_path(args.index_type, encoder_id)
+    save_index(
+        index,
+        index_path,
+        meta={
+            "index_type": args.index_type,
+            "encoder_id": encoder_id,
+            "store_fingerprint": EmbeddingStore(store_dir).fingerprint,
+            "build_seconds": round(time.time() - index_s, 2),
+        },
+    )
+    print(
+        f">>> {args.index_type} index ({index.ntotal} vectors) saved to: {index_path}"
+    )
+    if not args.keep_work:
+        checkpoint.clear()
@@ -0,0 +1,83 @@
+import os
+import json
+import torch
+import argparse
+from transformers import AutoTokenizer, AutoModel
+from lib.path import get_path
+from lib.encoders import DEFAULT_SENTENCE_MODEL
+
+
+class _LastHidden(torch.nn.Module):
+    # Export only last_hidden_state; pooling happens in OnnxEncoder
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(
+            input_ids=input_ids, attention_mask=attention_mask
+        ).last_hidden_state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export a sentence encoder to ONNX, optionally int8-quantized."
+    )
+    parser.add_argument(
+        "--model", type=str, default=DEFAULT_SENTENCE_MODEL, help="HF model name"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=os.path.join(get_path(key="MODELS"), "encoder_onnx"),
+        help="Output directory (ENCODER_ONNX_DIR)",
+    )
+    parser.add_argument(
+        "--quantize", action="store_true", help="Apply dynamic int8 quantization"
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModel.from_pretrained(args.model, torch_dtype=torch.float32).eval()
+    dummy = tokenizer(["範例"], return_tensors="pt")
+    fp32_path = os.path.join(args.output, "model.onnx")
+    torch.onnx.export(
+        _LastHidden(model),
+        (dummy["input_ids"], dummy["attention_mask"]),
+        fp32_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "seq"},
+            "attention_mask": {0: "batch", 1: "seq"},
+            "last_hidden_state": {0: "batch", 1: "seq"},
+        },
+        opset_version=17,
+    )
+    tokenizer.save_pretrained(args.output)
+
+    # The fp32 export computes the same vectors as SentenceEncoder and can share its
+    # store; the int8 export is a different encoder and needs its own store
+    model_file, encoder_id = "model.onnx", f"sentence:{args.model}"
+    if args.quantize:
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError:
+            raise RuntimeError(
+                ">>> Please install onnxruntime first: pip install onnxruntime"
+            )
+        model_file, encoder_id = "model_int8.onnx", f"sentence-int8:{args.model}"
+        quantize_dynamic(
+            fp32_path,
+            os.path.join(args.output, model_file),
+            weight_type=QuantType.QInt8,
+        )
+
+    with open(os.path.join(args.output, "encoder.json"), "w") as f:
+        json.dump(
+            {"encoder_id": encoder_id, "model_file": model_file, "normalize": True},
+            f,
+            indent=2,
+        )
+    print(f">>> Exported {encoder_id} to: {args.output}")
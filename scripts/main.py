@@ -1,20 +1,30 @@
 import os
+import json
 import time
 from pyngrok import ngrok
-from flask import Flask, request, abort
+from flask import Flask, Response, request, abort, jsonify, stream_with_context
 from linebot.v3 import WebhookHandler
 from linebot.v3.messaging import (
     MessagingApi,
+    PushMessageRequest,
     ReplyMessageRequest,
     TextMessage,
     Configuration,
     ApiClient,
+    ApiException,
 )
-from linebot.v3.webhooks import MessageEvent, TextMessageContent
+from linebot.v3.webhooks import MessageEvent
 from lib.ngrok import start_ngrok
+from lib.handler import BUSY_MESSAGE, can_reply, job_from_event, token_error
 from lib.handler import update_line_webhook
 from lib.token_utils import TokenManager
-from lib.rag_gemini import response_with_judgement
+from lib.rag_gemini import gemini_stream_response, response_with_judgement
+from lib.rag_gemini import loader as rag_loader, gemini_stats, judge_gate
+from lib.rag_gemini import retriever
+from lib.index_manager import IndexBuildBusy
+from lib.utils import timed_stream
+from lib.job_queue import JobQueue
+from lib.config import get_env
 
 # Add HuggingFace token
 tm = TokenManager()
@@ -25,9 +35,16 @@ os.environ["GOOGLE_API_KEY"] = tm.get_google_api_key() or ""
 # Line bot deployment
 LINE_CHANNEL_ACCESS_TOKEN = tm.get_line_access()
 LINE_CHANNEL_SECRET = tm.get_line_secret()
-configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
+# LINE_API_HOST points the bot at a stand-in API (scripts/bench/fake_line_api.py)
+LINE_API_HOST = get_env("LINE_API_HOST")
+configuration = Configuration(
+    access_token=LINE_CHANNEL_ACCESS_TOKEN, host=LINE_API_HOST
+)
 messaging_api = MessagingApi(ApiClient(configuration))
 handler = WebhookHandler(channel_secret=LINE_CHANNEL_SECRET)
+# Bearer tokens of the /stream and /admin routes (empty = route disabled)
+STREAM_TOKEN = get_env("STREAM_TOKEN", "")
+ADMIN_TOKEN = get_env("ADMIN_TOKEN", "")
 
 # Flask application
 app = Flask(__name__)
@@ -50,29 +67,127 @@ def callback():
     return ">>> [Webhook] Webhook processed successfully."
 
 
-@handler.add(MessageEvent)
-# Even handling
-def handle_message(event):
-    try:
-        if isinstance(event.message, TextMessageContent):
-            # Timing start
-            time_s = time.time()
+# Server-sent events: the answer is pushed chunk by chunk as the model produces it
+@app.route("/stream", methods=["GET", "POST"])
+def stream():
+    # Every request runs a full RAG generation, so callers need the stream token
+    check_token(STREAM_TOKEN)
+    payload = request.get_json(silent=True) or {}
+    query = request.args.get("q") or payload.get("query", "")
+    if not query:
+        abort(400)
 
-            # Receive user messages
-            user_message = event.message.text
-            print(">>> Successfully received user message")
+    def events():
+        stats = {}
+        for chunk in timed_stream(gemini_stream_response(query), stats):
+            yield f"data: {json.dumps({'text': chunk}, ensure_ascii=False)}\n\n"
+        yield f"event: done\ndata: {json.dumps(stats)}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Answers 200 while the models are still warming up; 503 only if loading failed
+@app.route("/health", methods=["GET"])
+def health():
+    status = rag_loader.status()
+    return jsonify(status), 503 if status["status"] == "error" else 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return jsonify(
+        {
+            **job_queue.stats(),
+            "gemini": gemini_stats(),
+            "judge": judge_gate.stats(),
+            "context": retriever.context_stats(),
+            "index": retriever.index_status(),
+        }
+    )
+
+
+def check_token(secret: str) -> None:
+    status = token_error(request.headers.get("Authorization", ""), secret)
+    if status is not None:
+        abort(status)
+
+
+# Article updates: {"add": [text], "replace": {id: text}, "delete": [id]} is indexed
+# in the background and swapped in without a restart; GET reports the live version
+@app.route("/admin/index", methods=["GET", "POST"])
+def admin_index():
+    check_token(ADMIN_TOKEN)
+    if request.method == "GET":
+        return jsonify(retriever.index_status())
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        abort(400)
+    try:
+        version = retriever.update_index(
+            add=payload.get("add"),
+            replace=payload.get("replace"),
+            delete=payload.get("delete"),
+        )
+    except IndexBuildBusy as e:
+        return jsonify({"error": str(e)}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"building": version}), 202
 
-            # Llama generates answers
-            response = response_with_judgement(user_message)
-            # response = f"Test: receiving user message: {user_message}"
 
-            # Return answers to Line users
+def deliver(reply_token: str, target_id: str, text: str, received_at: float) -> None:
+    messages = [TextMessage(text=text)]
+    if can_reply(received_at):
+        try:
             messaging_api.reply_message(
-                ReplyMessageRequest(
-                    replyToken=event.reply_token, messages=[TextMessage(text=response)]
-                )
+                ReplyMessageRequest(replyToken=reply_token, messages=messages)
             )
-            print(f">>> Processing time: {round((time.time() - time_s), 2)} seconds")
+            return
+        except ApiException as e:
+            # Typically "Invalid reply token": expired or already used
+            print(f">>> Reply failed ({e.status}), falling back to push")
+    if not target_id:
+        print(">>> No user/group id to push to; answer dropped")
+        return
+    messaging_api.push_message(PushMessageRequest(to=target_id, messages=messages))
+
+
+def process_message(job: dict) -> None:
+    # Runs on a job queue worker, off the webhook request thread
+    time_s = time.time()
+    print(f">>> Job waited {round(time_s - job['received_at'], 2)} seconds in queue")
+    response = response_with_judgement(job["text"])
+    deliver(job["reply_token"], job["target_id"], response, job["received_at"])
+    print(f">>> Processing time: {round((time.time() - time_s), 2)} seconds")
+
+
+job_queue = JobQueue(
+    handler=process_message,
+    num_workers=get_env("WEBHOOK_WORKERS", 2, int),
+    max_size=get_env("WEBHOOK_QUEUE_SIZE", 64, int),
+    name="webhook-worker",
+)
+
+
+@handler.add(MessageEvent)
+# Even handling: only enqueues, so the webhook returns 200 right away
+def handle_message(event):
+    try:
+        job = job_from_event(event)
+        if job is not None:
+            print(">>> Successfully received user message")
+            if not job_queue.submit(job):
+                print(f">>> Job queue full: {job_queue.stats()['queue_depth']} waiting")
+                messaging_api.reply_message(
+                    ReplyMessageRequest(
+                        replyToken=event.reply_token,
+                        messages=[TextMessage(text=BUSY_MESSAGE)],
+                    )
+                )
         else:
             print(
                 f">>> Received user message is not a TextMessage: {type(event.message)}"
@@ -85,7 +200,14 @@ if __name__ == "__main__":
     ngrok_url = start_ngrok(port=5000)
     ngrok_url = str(ngrok_url).split(" ")[1].replace('"', "")
     print(f">>> {str(ngrok_url)}")
-    update_line_webhook(public_url=ngrok_url, access_token=LINE_CHANNEL_ACCESS_TOKEN)
+    update_line_webhook(
+        public_url=ngrok_url,
+        access_token=LINE_CHANNEL_ACCESS_TOKEN,
+        api_host=LINE_API_HOST,
+    )
+    # Models load in the background while Flask already serves /health
+    if get_env("WARM_UP", 1, int):
+        rag_loader.warm_up()
     try:
         app.run(host="0.0.0.0", port=5000, debug=False)
     except KeyboardInterrupt:
@@ -0,0 +1,241 @@
+import os
+import time
+import asyncio
+import argparse
+import uvicorn
+from collections import deque
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
+from linebot.v3 import WebhookParser
+from linebot.v3.exceptions import InvalidSignatureError
+from linebot.v3.messaging import (
+    ApiException,
+    AsyncApiClient,
+    AsyncMessagingApi,
+    Configuration,
+    PushMessageRequest,
+    ReplyMessageRequest,
+    TextMessage,
+)
+from lib.handler import BUSY_MESSAGE, can_reply, job_from_event, token_error
+from lib.handler import update_line_webhook
+from lib.token_utils import TokenManager
+from lib.rag_gemini import response_with_judgement
+from lib.rag_gemini import loader as rag_loader, gemini_stats, judge_gate
+from lib.rag_gemini import retriever
+from lib.index_manager import IndexBuildBusy
+from lib.config import get_env
+
+# Add HuggingFace token
+tm = TokenManager()
+hf_token = tm.get_hf_token()
+print(hf_token if hf_token is not None else ">>> HuggingFace token NOT found.")
+os.environ["GOOGLE_API_KEY"] = tm.get_google_api_key() or ""
+
+# Line bot deployment
+LINE_CHANNEL_ACCESS_TOKEN = tm.get_line_access()
+LINE_CHANNEL_SECRET = tm.get_line_secret()
+# LINE_API_HOST points the bot at a stand-in API (scripts/bench/fake_line_api.py)
+LINE_API_HOST = get_env("LINE_API_HOST")
+configuration = Configuration(
+    access_token=LINE_CHANNEL_ACCESS_TOKEN, host=LINE_API_HOST
+)
+parser = WebhookParser(channel_secret=LINE_CHANNEL_SECRET)
+# Same knobs as the Flask job queue: concurrent answers / answers allowed to wait
+WEBHOOK_WORKERS = get_env("WEBHOOK_WORKERS", 2, int)
+WEBHOOK_QUEUE_SIZE = get_env("WEBHOOK_QUEUE_SIZE", 64, int)
+# Bearer token of the /admin routes (empty = admin routes disabled)
+ADMIN_TOKEN = get_env("ADMIN_TOKEN", "")
+
+metrics = {"received": 0, "rejected": 0, "replied": 0, "pushed": 0, "failed": 0}
+waits = deque(maxlen=1000)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One aiohttp session (keep-alive connection pool) for every LINE call
+    app.state.api_client = AsyncApiClient(configuration)
+    app.state.messaging_api = AsyncMessagingApi(app.state.api_client)
+    app.state.slots = asyncio.Semaphore(WEBHOOK_WORKERS)
+    app.state.tasks = set()
+    # Models load in the background while the server already serves /health
+    if get_env("WARM_UP", 1, int):
+        rag_loader.warm_up()
+    yield
+    if app.state.tasks:
+        await asyncio.gather(*app.state.tasks, return_exceptions=True)
+    await app.state.api_client.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def deliver(
+    messaging_api: AsyncMessagingApi,
+    reply_token: str,
+    target_id: str,
+    text: str,
+    received_at: float,
+) -> None:
+    messages = [TextMessage(text=text)]
+    if can_reply(received_at):
+        try:
+            await messaging_api.reply_message(
+                ReplyMessageRequest(replyToken=reply_token, messages=messages)
+            )
+            metrics["replied"] += 1
+            return
+        except ApiException as e:
+            # Typically "Invalid reply token": expired or already used
+            print(f">>> Reply failed ({e.status}), falling back to push")
+    if not target_id:
+        print(">>> No user/group id to push to; answer dropped")
+        return
+    await messaging_api.push_message(
+        PushMessageRequest(to=target_id, messages=messages)
+    )
+    metrics["pushed"] += 1
+
+
+async def process_message(job: dict) -> None:
+    async with app.state.slots:
+        time_s = time.time()
+        waits.append(time_s - job["received_at"])
+        try:
+            # The RAG pipeline blocks on model calls, so it runs in a worker thread
+            response = await asyncio.to_thread(response_with_judgement, job["text"])
+            await deliver(
+                app.state.messaging_api,
+                job["reply_token"],
+                job["target_id"],
+                response,
+                job["received_at"],
+            )
+            print(f">>> Processing time: {round((time.time() - time_s), 2)} seconds")
+        except Exception as e:
+            metrics["failed"] += 1
+            print(f">>> An error occurred during processing: {str(e)}")
+
+
+@app.post("/")
+@app.post("/callback")
+async def callback(request: Request):
+    # Verify the Line signature, schedule the answers and acknowledge immediately
+    signature = request.headers.get("X-Line-Signature", "")
+    body = (await request.body()).decode("utf-8")
+    try:
+        events = parser.parse(body, signature)
+    except InvalidSignatureError as e:
+        print(f">>> [Webhook] Webhook handler error: {str(e)}")
+        raise HTTPException(status_code=400, detail="Invalid signature")
+
+    for event in events:
+        job = job_from_event(event)
+        if job is None:
+            print(f">>> Received event is not a TextMessage: {type(event)}")
+            continue
+        metrics["received"] += 1
+        if len(app.state.tasks) >= WEBHOOK_WORKERS + WEBHOOK_QUEUE_SIZE:
+            metrics["rejected"] += 1
+            # A failed busy reply must not drop the other events of this batch
+            try:
+                await app.state.messaging_api.reply_message(
+                    ReplyMessageRequest(
+                        replyToken=event.reply_token,
+                        messages=[TextMessage(text=BUSY_MESSAGE)],
+                    )
+                )
+            except Exception as e:
+                print(f">>> An error occurred during processing: {str(e)}")
+            continue
+        task = asyncio.create_task(process_message(job))
+        app.state.tasks.add(task)
+        task.add_done_callback(app.state.tasks.discard)
+    return ">>> [Webhook] Webhook processed successfully."
+
+
+@app.get("/health")
+async def health():
+    # 200 while the models are still warming up; 503 only if loading failed
+    status = rag_loader.status()
+    return JSONResponse(status, status_code=503 if status["status"] == "error" else 200)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    ordered = sorted(waits)
+    return {
+        **metrics,
+        "in_flight": len(app.state.tasks),
+        "wait_p50_ms": round(1000 * ordered[len(ordered) // 2], 3) if ordered else 0.0,
+        "wait_max_ms": round(1000 * ordered[-1], 3) if ordered else 0.0,
+        "gemini": gemini_stats(),
+        "judge": judge_gate.stats(),
+        "context": retriever.context_stats(),
+        "index": retriever.index_status(),
+    }
+
+
+def check_admin(request: Request) -> None:
+    status = token_error(request.headers.get("Authorization", ""), ADMIN_TOKEN)
+    if status == 403:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled")
+    if status == 401:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.get("/admin/index")
+async def get_admin_index(request: Request):
+    check_admin(request)
+    return retriever.index_status()
+
+
+@app.post("/admin/index")
+async def post_admin_index(request: Request):
+    # {"add": [text], "replace": {id: text}, "delete": [id]}, indexed in the background
+    check_admin(request)
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Expected a JSON body")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Expected a JSON object")
+    try:
+        # May load the models first, so it runs off the event loop
+        version = await asyncio.to_thread(
+            retriever.update_index,
+            add=payload.get("add"),
+            replace=payload.get("replace"),
+            delete=payload.get("delete"),
+        )
+    except IndexBuildBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse({"building": version}, status_code=202)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Serve the LINE bot webhook with FastAPI/uvicorn."
+    )
+    arg_parser.add_argument("--host", type=str, default="0.0.0.0")
+    arg_parser.add_argument("--port", type=int, default=8000)
+    arg_parser.add_argument(
+        "--ngrok", action="store_true", help="Expose via ngrok and update the webhook"
+    )
+    args = arg_parser.parse_args()
+
+    if args.ngrok:
+        from lib.ngrok import start_ngrok
+
+        ngrok_url = start_ngrok(port=args.port)
+        ngrok_url = str(ngrok_url).split(" ")[1].replace('"', "")
+        print(f">>> {str(ngrok_url)}")
+        update_line_webhook(
+            public_url=ngrok_url,
+            access_token=LINE_CHANNEL_ACCESS_TOKEN,
+            api_host=LINE_API_HOST,
+        )
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,56 @@
+import time
+import torch
+import argparse
+import numpy as np
+from lib.encoders import ENCODER_TYPES, get_encoder
+from lib.embedding_store import get_store_dir, load_embedding_store, write_store
+
+MODEL_NAME = "lianghsun/Llama-3.2-Taiwan-Legal-3B-Instruct"
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def encode_corpus(encoder, texts: list, batch_size: int, max_length: int) -> np.ndarray:
+    # Length-sorted batches keep padding small; rows are restored to corpus order
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    embeddings = None
+    for bgn in range(0, len(order), batch_size):
+        rows = order[bgn : bgn + batch_size]
+        batch = encoder.encode([texts[i] for i in rows], max_length=max_length)
+        if embeddings is None:
+            embeddings = np.zeros((len(texts), batch.shape[1]), dtype="float32")
+        embeddings[rows] = batch
+        print(f">>> Encoded {min(bgn + batch_size, len(order))}/{len(order)}")
+    return embeddings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Re-embed the corpus texts with another encoder into its own store."
+    )
+    parser.add_argument(
+        "--encoder", type=str, choices=ENCODER_TYPES, required=True, help="Backend"
+    )
+    parser.add_argument(
+        "--layer", type=int, default=None, help="Early-exit layer (llama encoders)"
+    )
+    parser.add_argument("--batch-size", type=int, default=16, help="Texts per batch")
+    parser.add_argument("--max-length", type=int, default=512, help="Token limit")
+    args = parser.parse_args()
+
+    texts = list(load_embedding_store().texts)
+    encoder = get_encoder(
+        model_name=MODEL_NAME,
+        device=DEVICE,
+        encoder_type=args.encoder,
+        layer=args.layer,
+    )
+    time_s = time.time()
+    embeddings = encode_corpus(encoder, texts, args.batch_size, args.max_length)
+    store_dir = get_store_dir(encoder.encoder_id)
+    write_store(
+        store_dir=store_dir,
+        texts=texts,
+        embeddings=embeddings,
+        meta={"encoder_id": encoder.encoder_id},
+    )
+    print(f">>> {len(texts)} texts in {round(time.time() - time_s, 2)}s -> {store_dir}")
@@ -0,0 +1,40 @@
+import pytest
+
+
+class CharTokenizer:
+    """One token per character; enough to drive a randomly initialised Llama."""
+
+    eos_token_id = 2
+
+    def __call__(self, text, return_tensors=None, add_special_tokens=True):
+        import torch
+
+        ids = ([1] if add_special_tokens else []) + [3 + ord(ch) % 60 for ch in text]
+
+        class Encoded:
+            input_ids = torch.tensor([ids])
+
+        return Encoded()
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(str(i) for i in ids)
+
+
+@pytest.fixture
+def tiny_llama():
+    import torch
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=64,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        bos_token_id=1,
+        eos_token_id=2,
+        pad_token_id=0,
+    )
+    return LlamaForCausalLM(config).eval(), CharTokenizer()
@@ -0,0 +1,30 @@
+import numpy as np
+
+
+def test_answer_cache_persists(tmp_path):
+    from lib.answer_cache import SemanticAnswerCache
+
+    db_path = str(tmp_path / "answers.sqlite")
+    cache = SemanticAnswerCache(db_path, encoder_id="enc", threshold=0.99)
+    question = np.array([1.0, 0.0, 0.0], dtype="float32")
+    assert cache.lookup(question) is None
+    cache.store("押金不退怎麼辦？", question, "可以寄存證信函。")
+
+    reopened = SemanticAnswerCache(db_path, encoder_id="enc", threshold=0.99)
+    assert reopened.lookup(question * 2 + 0.001) == "可以寄存證信函。"
+    assert reopened.lookup(np.array([0.0, 1.0, 0.0])) is None
+    assert SemanticAnswerCache(db_path, encoder_id="other").lookup(question) is None
+
+    assert reopened.purge(question="押金不退怎麼辦？") == 1
+    assert reopened.lookup(question) is None
+
+
+def test_answer_cache_capacity(tmp_path):
+    from lib.answer_cache import SemanticAnswerCache
+
+    cache = SemanticAnswerCache(str(tmp_path / "a.sqlite"), "enc", max_entries=2)
+    for i in range(3):
+        cache.store(f"q{i}", np.eye(3, dtype="float32")[i], f"a{i}")
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup(np.eye(3, dtype="float32")[0]) is None
+    assert cache.lookup(np.eye(3, dtype="float32")[2]) == "a2"
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_batcher_groups_and_fans_out():
+    from lib.batcher import RetrievalBatcher
+
+    calls = []
+
+    def search_fn(queries, top_k):
+        calls.append(list(queries))
+        return [[f"{q}-{i}" for i in range(top_k)] for q in queries]
+
+    batcher = RetrievalBatcher(search_fn, max_batch_size=4, max_wait_ms=50)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(batcher.search, f"q{i}", top_k=i + 1) for i in range(4)]
+        results = [f.result(timeout=5) for f in futures]
+
+    assert results == [[f"q{i}-{j}" for j in range(i + 1)] for i in range(4)]
+    assert len(calls) < 4
+    assert batcher.stats()["queries"] == 4
+
+
+def test_batcher_propagates_errors():
+    import pytest
+    from lib.batcher import RetrievalBatcher
+
+    def search_fn(queries, top_k):
+        raise RuntimeError("index unavailable")
+
+    batcher = RetrievalBatcher(search_fn, max_batch_size=2, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.search("q", top_k=1, timeout=5)
+
+
+def test_batcher_fails_callers_missing_from_short_results():
+    import pytest
+    from lib.batcher import RetrievalBatcher
+
+    batcher = RetrievalBatcher(
+        lambda queries, top_k: [["hit"]], max_batch_size=2, max_wait_ms=1000
+    )
+    futures = [batcher.submit(f"q{i}", top_k=1) for i in range(2)]
+    assert futures[0].result(timeout=5) == ["hit"]
+    with pytest.raises(RuntimeError):
+        futures[1].result(timeout=5)
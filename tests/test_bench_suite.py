@@ -0,0 +1,39 @@
+def row(case, size, p50, p95, throughput):
+    return {
+        "case": case,
+        "size": size,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "throughput_per_s": throughput,
+    }
+
+
+def test_compare_flags_regressions_over_threshold():
+    from scripts.bench.suite import compare
+
+    baseline = [
+        row("search", 1000, 10.0, 20.0, 100.0),
+        row("search", 10000, 0.2, 0.4, 5000.0),
+        row("generate", 32, 50.0, 60.0, 20.0),
+        row("load", 2000, 10.0, 20.0, 100.0),
+    ]
+    rows = [
+        # p95 +50%: a regression
+        row("search", 1000, 11.0, 30.0, 95.0),
+        # +100% but under min_delta_ms: timer noise
+        row("search", 10000, 0.4, 0.8, 2500.0),
+        # Within the threshold
+        row("generate", 32, 55.0, 66.0, 18.0),
+        # Throughput halved along with a slower p50
+        row("load", 2000, 13.0, 23.0, 50.0),
+        row("end_to_end", 4, 80.0, 90.0, 10.0),
+    ]
+
+    regressions = compare(rows, baseline, threshold=0.2, min_delta_ms=1.0)
+
+    assert [r["case"] for r in regressions] == ["search", "load"]
+    assert rows[0]["vs_baseline"] == "REGRESSION p95_ms +50%"
+    assert rows[1]["vs_baseline"] == "ok (p95 +100%)"
+    assert rows[2]["vs_baseline"] == "ok (p95 +10%)"
+    assert rows[3]["vs_baseline"] == "REGRESSION p50_ms +30%, throughput -50%"
+    assert rows[4]["vs_baseline"] == "new"
@@ -0,0 +1,38 @@
+def test_parse_chinese_numerals():
+    from lib.citation_index import article_key, parse_number
+
+    assert parse_number("184") == 184
+    assert parse_number("一百八十四") == 184
+    assert parse_number("十") == 10
+    assert parse_number("二十一") == 21
+    assert parse_number("三百二十") == 320
+    assert parse_number("一千零五") == 1005
+    assert article_key("一百八十四", "一") == "184-1"
+
+
+def test_citation_lookup_and_fallback():
+    from lib.citation_index import CitationIndex
+
+    texts = [
+        "民法第184條：因故意或過失，不法侵害他人之權利者，負損害賠償責任。",
+        "民法第184條之1：（續）",
+        "【中華民國刑法】第320條 意圖為自己或第三人不法之所有，而竊取他人之動產者。",
+        "勞動基準法 第 24 條：雇主延長勞工工作時間者，其延長工作時間之工資。",
+        "民法 第 185 條：數人共同不法侵害他人之權利者，連帶負損害賠償責任。",
+        "（本條無標題的續行文字）",
+    ]
+    index = CitationIndex(texts)
+    assert index.stats()["articles"] == 5
+
+    assert index.lookup("民法第184條的侵權行為要件是什麼？") == [0]
+    assert index.lookup("請問民法第一百八十四條之一") == [1]
+    assert index.lookup("刑法第三百二十條竊盜罪的刑責") == [2]
+    assert index.lookup("勞基法24條加班費") == [3]
+    assert index.lookup("民法第184條與第185條的差別") == [0, 4]
+    # Unknown article or no citation: fall back to vector search
+    assert index.lookup("民法第999條") == []
+    assert index.lookup("房東不退還押金該怎麼辦？") == []
+
+    stats = index.stats()
+    assert stats["lookups"] == 7 and stats["hits"] == 5
+    assert stats["misses"] == 2 and stats["unresolved"] == 1
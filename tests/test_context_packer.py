@@ -0,0 +1,58 @@
+class CharListTokenizer:
+    """Every character is a token; batches and single texts like HF tokenizers."""
+
+    name_or_path = "chars"
+
+    def __call__(self, text, add_special_tokens=False):
+        class Encoded:
+            input_ids = (
+                [list(t) for t in text] if isinstance(text, list) else list(text)
+            )
+
+        return Encoded()
+
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(ids)
+
+
+def test_pack_orders_dedups_and_fits_budget():
+    from lib.context_packer import ContextPacker
+
+    hits = [
+        {"id": 2, "text": "刑法第320條竊盜罪", "score": 0.5},
+        {"id": 0, "text": "民法第184條侵權行為", "score": 0.1},
+        {"id": 1, "text": "民法第184條侵權行為。", "score": 0.2},
+        {"id": 3, "text": "很長的條文" * 10, "score": 0.3},
+    ]
+    packer = ContextPacker(CharListTokenizer(), max_tokens=25, overhead_tokens=5)
+    context = packer.pack(hits, query="侵權")
+    assert context == "民法第184條侵權行為\n刑法第320條竊盜罪"
+    stats = packer.stats()
+    assert stats["duplicates"] == 1 and stats["over_budget"] == 1
+    assert stats["context_tokens_max"] == 11 + 1 + 10
+    assert stats["prompt_tokens_max"] == 5 + 22 + 2
+
+    # A single article longer than the budget is truncated instead of dropped
+    assert ContextPacker(CharListTokenizer(), max_tokens=4).pack(hits[3:]) == "很長的條"
+
+
+def test_token_lengths_are_counted_once(tmp_path):
+    import numpy as np
+    from lib.context_packer import ContextPacker, load_or_count_lengths
+
+    texts = ["民法", "刑法第320條", "勞動基準法"]
+    lengths = load_or_count_lengths(texts, CharListTokenizer(), str(tmp_path))
+    assert lengths.tolist() == [2, 7, 5]
+    assert len(list(tmp_path.glob("token_lengths_*.npy"))) == 1
+
+    class FailingTokenizer(CharListTokenizer):
+        def __call__(self, text, add_special_tokens=False):
+            raise AssertionError("lengths should come from the saved file")
+
+    cached = load_or_count_lengths(texts, FailingTokenizer(), str(tmp_path))
+    assert np.array_equal(cached, lengths)
+
+    # Pre-counted lengths are used instead of re-tokenizing the article
+    packer = ContextPacker(CharListTokenizer(), lengths=np.array([100]), max_tokens=50)
+    hit = {"id": 0, "text": "短", "score": 0.0}
+    assert packer.hit_length(hit) == 100
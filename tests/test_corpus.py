@@ -0,0 +1,83 @@
+def test_parse_law_text_skips_section_headings():
+    from lib.corpus import parse_law_text
+
+    text = (
+        "民法\n第一編 總則\n第一章 法例\n第 1 條\n民事，法律所未規定者，依習慣；\n"
+        "無習慣者，依法理。\n第二章 人\n第１８４條之１ 測試用條文。\n"
+    )
+    assert parse_law_text(text, "民法") == [
+        ("民法", "1", "民事，法律所未規定者，依習慣；無習慣者，依法理。"),
+        ("民法", "184-1", "測試用條文。"),
+    ]
+
+
+def test_parse_law_json_keeps_articles_only():
+    from lib.corpus import parse_law_json
+
+    data = {
+        "Laws": [
+            {
+                "LawName": "勞動基準法",
+                "LawArticles": [
+                    {"ArticleType": "C", "ArticleNo": "", "ArticleContent": "第一章"},
+                    {
+                        "ArticleType": "A",
+                        "ArticleNo": "第 24 條",
+                        "ArticleContent": "雇主延長工時者，\r\n依下列標準加給：",
+                    },
+                ],
+            }
+        ]
+    }
+    assert parse_law_json(data) == [
+        ("勞動基準法", "24", "雇主延長工時者，依下列標準加給：")
+    ]
+    assert parse_law_json([{"text": "民法第1條：內容"}]) == [
+        (None, None, "民法第1條：內容")
+    ]
+
+
+def test_long_articles_are_chunked_under_their_citation():
+    from lib.corpus import chunk_article
+    from lib.citation_index import CitationIndex
+
+    body = (
+        "因故意或過失，不法侵害他人之權利者，負損害賠償責任。"
+        "故意以背於善良風俗之方法，加損害於他人者亦同。"
+    )
+    chunks = chunk_article("民法", "184", body, max_chars=40)
+    assert len(chunks) > 1 and all(len(chunk) <= 40 for chunk in chunks)
+    assert chunks[1].startswith("民法第184條（續）：")
+    assert "".join(chunk.split("：", 1)[1] for chunk in chunks) == body
+    index = CitationIndex(chunks)
+    assert index.lookup("民法第184條") == list(range(len(chunks)))
+    assert chunk_article("民法", "1", "短條文。") == ["民法第1條：短條文。"]
+
+
+def test_plan_batches_sorts_by_length_within_budget():
+    from lib.corpus import plan_batches
+
+    lengths = [50, 10, 12, 11, 48, 200]
+    batches = plan_batches(lengths, batch_size=3, max_batch_chars=120)
+    assert batches == [[1, 3, 2], [4, 0], [5]]
+    assert sorted(i for batch in batches for i in batch) == list(range(6))
+
+
+def test_checkpoint_resumes_and_refuses_other_corpus(tmp_path):
+    import pytest
+    import numpy as np
+    from lib.corpus import EmbeddingCheckpoint
+
+    work_dir = str(tmp_path / "work")
+    batches = [[2, 0], [1]]
+    checkpoint = EmbeddingCheckpoint(work_dir, "a", batches)
+    checkpoint.save(0, np.array([[2.0], [0.0]]))
+
+    resumed = EmbeddingCheckpoint(work_dir, "a", [[0, 1, 2]])
+    assert resumed.batches == batches and resumed.pending() == [1]
+    resumed.save(1, np.array([[1.0]]))
+    assert resumed.assemble(3).ravel().tolist() == [0.0, 1.0, 2.0]
+
+    with pytest.raises(ValueError):
+        EmbeddingCheckpoint(work_dir, "b", batches)
+    assert EmbeddingCheckpoint(work_dir, "b", batches, restart=True).pending() == [0, 1]
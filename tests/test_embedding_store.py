@@ -0,0 +1,71 @@
+import json
+import numpy as np
+
+
+def test_store_roundtrip(tmp_path):
+    from lib.embedding_store import EmbeddingStore, write_store
+
+    texts = ["民法第184條", "", "刑法第320條：意圖為自己或第三人不法之所有"]
+    embeddings = np.arange(12, dtype="float32").reshape(3, 4)
+    write_store(str(tmp_path), texts=texts, embeddings=embeddings)
+
+    store = EmbeddingStore(str(tmp_path))
+    assert len(store) == 3 and store.dim == 4
+    assert isinstance(store.vectors, np.memmap)
+    assert list(store.texts) == texts
+    assert store.texts[-1] == texts[-1]
+    np.testing.assert_array_equal(store.vectors_float32(), embeddings)
+
+
+def test_convert_json_float16(tmp_path):
+    from lib.embedding_store import convert_json_to_store, load_embedding_store
+
+    json_path = tmp_path / "laws_embedding.json"
+    data = [{"text": f"第{i}條", "embedding": [i, i + 0.5]} for i in range(5)]
+    json_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    # Legacy migration writes float32; float16 is halved on disk, widened on load
+    store_dir = tmp_path / "store"
+    load_embedding_store(store_dir=str(store_dir), json_path=str(json_path))
+    store = load_embedding_store(store_dir=str(store_dir))
+    assert store.texts[3] == "第3條" and store.vectors.dtype == np.float32
+
+    half = convert_json_to_store(str(json_path), str(tmp_path / "half"), "float16")
+    assert half.vectors.dtype == np.float16 and half.meta["dtype"] == "float16"
+    assert half.vectors_float32().dtype == np.float32
+    np.testing.assert_array_equal(half.vectors_float32(), store.vectors_float32())
+
+
+def test_store_encoder_tag(tmp_path):
+    from lib.embedding_store import (
+        DEFAULT_ENCODER_ID,
+        EmbeddingStore,
+        get_store_dir,
+        write_store,
+    )
+
+    write_store(str(tmp_path), ["a"], np.ones((1, 2)), meta={"encoder_id": "x:y"})
+    assert EmbeddingStore(str(tmp_path)).encoder_id == "x:y"
+    assert get_store_dir(DEFAULT_ENCODER_ID) == get_store_dir()
+    assert get_store_dir("sentence:BAAI/bge-small-zh").endswith(
+        "laws_store_sentence_baai_bge_small_zh"
+    )
+
+
+def test_rewriting_store_keeps_open_readers_valid(tmp_path):
+    import os
+    from lib.embedding_store import EmbeddingStore, write_store
+
+    old = np.random.default_rng(0).random((50, 8)).astype("float32")
+    write_store(str(tmp_path), [f"舊{i}" for i in range(50)], old)
+    store = EmbeddingStore(str(tmp_path))
+    store.texts[0]
+    inode = os.stat(tmp_path / "vectors.npy").st_ino
+
+    # A shorter store replaces the files: the open mmaps keep the old contents
+    write_store(str(tmp_path), ["新"], np.ones((1, 8), dtype="float32"))
+    assert os.stat(tmp_path / "vectors.npy").st_ino != inode
+    np.testing.assert_array_equal(store.vectors, old)
+    assert store.texts[49] == "舊49"
+    assert EmbeddingStore(str(tmp_path)).texts[0] == "新"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
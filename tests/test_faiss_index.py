@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def test_index_roundtrip(tmp_path):
+    from lib.faiss_index import build_index, load_index, load_index_meta, save_index
+
+    vectors = np.random.default_rng(0).random((500, 16)).astype("float32")
+    for index_type in ("flat", "hnsw", "sq8"):
+        path = str(tmp_path / f"{index_type}.faiss")
+        save_index(build_index(vectors, index_type), path, {"index_type": index_type})
+        index = load_index(path)
+        _, ids = index.search(vectors[:4], 1)
+        assert ids[:, 0].tolist() == [0, 1, 2, 3]
+        assert load_index_meta(path)["ntotal"] == 500
+
+
+def test_unknown_index_type():
+    import pytest
+    from lib.faiss_index import factory_string
+
+    with pytest.raises(ValueError):
+        factory_string("lsh", n_vectors=100, dim=8)
+
+
+def test_index_rebuilt_when_store_vectors_change(tmp_path, monkeypatch):
+    import lib.faiss_index as faiss_index
+    from lib.embedding_store import vectors_fingerprint
+
+    path = str(tmp_path / "flat.faiss")
+    monkeypatch.setattr(faiss_index, "get_index_path", lambda *args: path)
+    rng = np.random.default_rng(0)
+    old, new = rng.random((2, 50, 8)).astype("float32")
+
+    _, old_version = faiss_index.load_or_build_index(
+        old, "flat", "x", vectors_fingerprint(old)
+    )
+    # Same row count and encoder, other vectors: the saved index is stale
+    index, version = faiss_index.load_or_build_index(
+        new, "flat", "x", vectors_fingerprint(new)
+    )
+    assert version != old_version
+    assert version == faiss_index.get_index_version("x", "flat")
+    assert index.search(new[:2], 1)[1][:, 0].tolist() == [0, 1]
+    meta = faiss_index.load_index_meta(path)
+    assert meta["store_fingerprint"] == vectors_fingerprint(new)
+    assert vectors_fingerprint(new) != vectors_fingerprint(new.astype("float16"))
@@ -0,0 +1,114 @@
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def test_gemini_client_retries_retryable_errors():
+    from lib.gemini_client import AsyncGeminiClient
+
+    calls = []
+
+    async def generate(prompt, max_token):
+        calls.append(prompt)
+        if len(calls) < 3:
+            raise FakeAPIError(503)
+        return f"ok {prompt}"
+
+    gemini = AsyncGeminiClient(generate, max_retries=3, backoff_base=0.001)
+    assert gemini.generate("q", 16) == "ok q"
+    assert len(calls) == 3
+    assert gemini.stats()["retries"] == 2
+
+
+def test_gemini_client_does_not_retry_client_errors():
+    import pytest
+    from lib.gemini_client import AsyncGeminiClient
+
+    calls = []
+
+    async def generate(prompt, max_token):
+        calls.append(prompt)
+        raise FakeAPIError(400)
+
+    gemini = AsyncGeminiClient(generate, max_retries=3, backoff_base=0.001)
+    with pytest.raises(FakeAPIError):
+        gemini.generate("q", 16)
+    assert len(calls) == 1
+    assert gemini.stats()["failures"] == 1
+
+
+def test_gemini_client_deadline_and_hedging():
+    import asyncio
+    import pytest
+    from lib.gemini_client import AsyncGeminiClient, GeminiTimeout
+
+    delays = [1.0, 0.01]
+
+    async def generate(prompt, max_token):
+        # The first request stalls, the hedged duplicate answers quickly
+        await asyncio.sleep(delays.pop(0) if delays else 1.0)
+        return prompt
+
+    gemini = AsyncGeminiClient(generate, hedge_after=0.05)
+    assert gemini.generate("q", 16) == "q"
+    assert gemini.stats()["hedge_wins"] == 1
+
+    slow = AsyncGeminiClient(generate, timeout=0.05, deadline=0.2, backoff_base=0.01)
+    with pytest.raises(GeminiTimeout):
+        slow.generate("q", 16)
+    assert slow.stats()["timeouts"] == 1
+
+
+def test_gemini_client_raises_exhausted_attempt_timeouts_as_gemini_timeout():
+    import asyncio
+    import pytest
+    from lib.gemini_client import AsyncGeminiClient, GeminiTimeout
+
+    async def generate(prompt, max_token):
+        await asyncio.sleep(1.0)
+
+    # Retries run out long before the deadline
+    gemini = AsyncGeminiClient(
+        generate, timeout=0.02, deadline=30.0, max_retries=1, backoff_base=0.001
+    )
+    with pytest.raises(GeminiTimeout):
+        gemini.generate("q", 16)
+    assert gemini.stats()["attempts"] == 2
+    assert gemini.stats()["timeouts"] == 1
+
+
+def test_gemini_client_streams_through_slots():
+    import asyncio
+    import pytest
+    from lib.gemini_client import AsyncGeminiClient, GeminiTimeout
+
+    calls = []
+
+    async def stream(prompt, max_token):
+        calls.append(prompt)
+        if len(calls) == 1:
+            raise FakeAPIError(503)
+        for chunk in ("a", "b", "c"):
+            yield chunk
+        if prompt == "stall":
+            await asyncio.sleep(1.0)
+
+    async def generate(prompt, max_token):
+        return prompt
+
+    gemini = AsyncGeminiClient(
+        generate, stream_fn=stream, timeout=0.05, backoff_base=0.001
+    )
+    # Failing before the first chunk is retried
+    assert list(gemini.stream("q", 16)) == ["a", "b", "c"]
+    assert gemini.stats()["retries"] == 1
+
+    # A stall after chunks were handed out times out instead of retrying
+    chunks = []
+    with pytest.raises(GeminiTimeout):
+        for chunk in gemini.stream("stall", 16):
+            chunks.append(chunk)
+    assert chunks == ["a", "b", "c"]
+    assert gemini.stats()["retries"] == 1
+    assert gemini.stats()["timeouts"] == 1
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def greedy_reference(model, tokenizer, prompt, max_new_tokens):
+    import torch
+
+    input_ids = tokenizer(prompt).input_ids
+    with torch.no_grad():
+        output = model.generate(
+            input_ids, max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=0
+        )
+    tokens = [t for t in output[0, input_ids.shape[1] :].tolist() if t != 2]
+    return tokenizer.decode(tokens)
+
+
+def test_scheduler_matches_generate(tiny_llama):
+    from lib.gen_scheduler import GenerationScheduler
+
+    model, tokenizer = tiny_llama
+    prompts = ["民法第184條", "刑法", "勞動基準法第二十四條加班費", "a"]
+    expected = [greedy_reference(model, tokenizer, p, 12) for p in prompts]
+
+    scheduler = GenerationScheduler(model, tokenizer, "cpu", max_batch_size=3)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [
+            pool.submit(scheduler.generate, p, 12, do_sample=False) for p in prompts
+        ]
+        results = [f.result(timeout=60)[0] for f in futures]
+
+    assert results == expected
+    assert scheduler.stats()["requests"] == 4
+    assert len(scheduler.generate("民法", 5, do_sample=True, n=2)) == 2
+
+
+def test_scheduler_with_prefix_cache(tiny_llama):
+    from lib.gen_scheduler import GenerationScheduler
+    from lib.prefix_cache import PrefixCache
+
+    model, tokenizer = tiny_llama
+    prefix_cache = PrefixCache(model, tokenizer, "cpu")
+    prefix_cache.add("你是一位台灣法律諮詢顧問。")
+    prompts = [
+        "你是一位台灣法律諮詢顧問。民法第184條",
+        "你是一位台灣法律諮詢顧問。刑法",
+    ]
+    expected = [greedy_reference(model, tokenizer, p, 8) for p in prompts]
+
+    scheduler = GenerationScheduler(model, tokenizer, "cpu", prefix_cache=prefix_cache)
+    results = [scheduler.generate(p, 8, do_sample=False)[0] for p in prompts]
+    assert results == expected
+    assert prefix_cache.stats()["hits"] == 2
+
+
+def test_scheduler_streams_tokens_under_the_model_lock(tiny_llama):
+    import time
+    from threading import Lock
+    from transformers import TextIteratorStreamer
+    from lib.gen_scheduler import GenerationScheduler
+
+    model, tokenizer = tiny_llama
+    lock = Lock()
+    scheduler = GenerationScheduler(model, tokenizer, "cpu", lock=lock)
+    answer = scheduler.generate("民法", 6, do_sample=False)[0]
+
+    streamer = TextIteratorStreamer(tokenizer, timeout=60)
+    with lock:
+        # No forward pass runs while another caller holds the model lock
+        future = scheduler.submit("民法", 6, do_sample=False, streamer=streamer)
+        time.sleep(0.2)
+        assert not future.done()
+    streamed = "".join(streamer).split()
+    assert future.result(timeout=60) == [answer]
+    # The streamer also sees the end-of-sequence token (id 2) if one was sampled
+    assert streamed in (answer.split(), answer.split() + ["2"])
@@ -0,0 +1,52 @@
+def message_event(message):
+    from linebot.v3.webhooks import MessageEvent
+
+    return MessageEvent.from_dict(
+        {
+            "type": "message",
+            "mode": "active",
+            "timestamp": 0,
+            "source": {"type": "group", "groupId": "G1", "userId": None},
+            "webhookEventId": "E1",
+            "deliveryContext": {"isRedelivery": False},
+            "replyToken": "R1",
+            "message": message,
+        }
+    )
+
+
+def test_job_from_event():
+    from lib.handler import job_from_event
+
+    job = job_from_event(
+        message_event({"type": "text", "id": "1", "quoteToken": "q", "text": "你好"})
+    )
+    assert job["text"] == "你好"
+    assert job["reply_token"] == "R1"
+    assert job["target_id"] == "G1"
+    sticker = {
+        "type": "sticker",
+        "id": "2",
+        "quoteToken": "q",
+        "packageId": "1",
+        "stickerId": "1",
+        "stickerResourceType": "STATIC",
+    }
+    assert job_from_event(message_event(sticker)) is None
+
+
+def test_can_reply_within_ttl():
+    import time
+    from lib.handler import REPLY_TOKEN_TTL, can_reply
+
+    assert can_reply(time.time())
+    assert not can_reply(time.time() - REPLY_TOKEN_TTL - 1)
+
+
+def test_token_error():
+    from lib.handler import token_error
+
+    assert token_error("Bearer secret", "") == 403
+    assert token_error("Bearer wrong", "secret") == 401
+    assert token_error("", "secret") == 401
+    assert token_error("Bearer secret", "secret") is None
@@ -0,0 +1,90 @@
+def make_corpus(n=20, dim=8):
+    import numpy as np
+    from lib.faiss_index import build_index
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(n, dim)).astype("float32")
+    texts = [f"民法第{i + 1}條：內容{i}" for i in range(n)]
+    return vectors, texts, build_index(vectors, "flat")
+
+
+def test_update_adds_replaces_deletes_without_touching_live_snapshot():
+    import numpy as np
+    from lib.index_manager import IndexManager, IndexSnapshot
+
+    vectors, texts, index = make_corpus()
+    new_vectors = {"新條文": vectors[3] + 0.001, "修正條文": vectors[5] + 0.002}
+    manager = IndexManager(
+        IndexSnapshot.base(index, texts, "flat:v1"),
+        encode_fn=lambda batch: np.stack([new_vectors[text] for text in batch]),
+    )
+    old = manager.current
+    version = manager.update(
+        add=["新條文"], replace={5: "修正條文"}, delete=[3], wait=True
+    )
+
+    new = manager.current
+    assert new.version == version and manager.status()["history"] == ["flat:v1"]
+    assert old.index.ntotal == 20 and old.ntotal == 20
+    assert new.ntotal == 20 and new.n_deleted == 2
+    # Deleted rows never come back; the replacement got a new id
+    _, ids = new.search(vectors[[3, 5]], 2)
+    assert ids[0][0] == 20 and new.texts[20] == "新條文"
+    assert ids[1][0] == 21 and new.texts[21] == "修正條文"
+    assert 3 not in ids and 5 not in ids
+    _, old_ids = old.search(vectors[[3]], 1)
+    assert old_ids[0][0] == 3 and old.texts[3] == texts[3]
+    assert new.row_of(5) is None and new.row_of(21) == 21
+
+
+def test_update_rejects_bad_requests_and_concurrent_builds():
+    import pytest
+    import numpy as np
+    from threading import Event
+    from lib.index_manager import IndexBuildBusy, IndexManager, IndexSnapshot
+
+    vectors, texts, index = make_corpus()
+    release = Event()
+
+    def slow_encode(batch):
+        release.wait(5)
+        return np.zeros((len(batch), vectors.shape[1]), dtype="float32")
+
+    manager = IndexManager(IndexSnapshot.base(index, texts, "v1"), slow_encode)
+    with pytest.raises(ValueError):
+        manager.update(delete=[99])
+    with pytest.raises(TypeError):
+        manager.update(add="新條文")
+    with pytest.raises(ValueError):
+        manager.update()
+
+    manager.update(add=["新條文"])
+    with pytest.raises(IndexBuildBusy):
+        manager.update(add=["另一條"])
+    assert manager.status()["building"] is not None
+    release.set()
+    manager.thread.join()
+    assert manager.status()["building"] is None and manager.current.ntotal == 21
+
+
+def test_snapshot_round_trip(tmp_path):
+    import numpy as np
+    from lib.index_manager import IndexManager, IndexSnapshot, load_snapshot
+
+    vectors, texts, index = make_corpus()
+    manager = IndexManager(
+        IndexSnapshot.base(index, texts, "flat:v1"),
+        encode_fn=lambda batch: vectors[: len(batch)] + 0.5,
+        snapshot_dir=str(tmp_path),
+        keep=1,
+    )
+    manager.update(add=["新條文"], delete=[0], wait=True)
+    version = manager.update(replace={1: "修正條文"}, wait=True)
+
+    restored = load_snapshot(str(tmp_path), texts, "flat:v1")
+    assert restored.version == version and len(list(tmp_path.iterdir())) == 2
+    assert np.array_equal(restored.alive, manager.current.alive)
+    assert restored.texts[21] == "修正條文" and restored.texts[2] == texts[2]
+    assert [i for i, _ in restored.live_items()] == list(range(2, 22))
+    # Snapshots of another base index are ignored
+    assert load_snapshot(str(tmp_path), texts, "flat:v2") is None
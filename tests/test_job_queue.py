@@ -0,0 +1,38 @@
+from threading import Event
+
+
+def test_job_queue_runs_jobs():
+    from lib.job_queue import JobQueue
+
+    done = []
+    jobs = JobQueue(handler=done.append, num_workers=2, max_size=8)
+    assert all(jobs.submit(i) for i in range(5))
+    jobs.join()
+
+    assert sorted(done) == list(range(5))
+    stats = jobs.stats()
+    assert stats["processed"] == 5 and stats["queue_depth"] == 0
+    assert stats["wait"]["max_ms"] >= stats["wait"]["p50_ms"] >= 0
+
+
+def test_job_queue_rejects_when_full():
+    from lib.job_queue import JobQueue
+
+    release = Event()
+
+    def handler(payload):
+        if payload == "boom":
+            raise RuntimeError("failed job")
+        release.wait(timeout=5)
+
+    jobs = JobQueue(handler=handler, num_workers=1, max_size=1)
+    jobs.submit("block")
+    while jobs.stats()["busy_workers"] == 0:
+        pass
+    assert jobs.submit("boom")
+    assert not jobs.submit("overflow")
+    release.set()
+    jobs.join()
+
+    stats = jobs.stats()
+    assert stats["rejected"] == 1 and stats["failed"] == 1
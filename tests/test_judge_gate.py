@@ -0,0 +1,28 @@
+def test_answer_similarity():
+    from lib.judge_gate import answer_similarity
+
+    assert answer_similarity("依民法第184條。", "依民法第１８４條") == 1.0
+    assert (
+        answer_similarity("竊盜罪處五年以下有期徒刑", "竊盜罪處五年以下有期徒刑。")
+        == 1.0
+    )
+    assert (
+        0.5
+        < answer_similarity("竊盜罪處五年以下有期徒刑", "竊盜罪處三年以下有期徒刑")
+        < 1.0
+    )
+    assert answer_similarity("民法", "刑法規定") == 0.0
+
+
+def test_judge_gate_counts_skips_and_saved_time():
+    from lib.judge_gate import JudgeGate
+
+    gate = JudgeGate(threshold=0.9)
+    assert gate.agree("回答內容相同。", "回答內容相同")
+    assert not gate.agree("應負損害賠償責任", "不構成侵權行為")
+    gate.record_judge(0.5)
+    stats = gate.stats()
+    assert stats["compared"] == 2 and stats["skipped"] == 1 and stats["judged"] == 1
+    assert stats["saved_ms_estimate"] == 500.0
+
+    assert not JudgeGate(enabled=False).agree("同", "同")
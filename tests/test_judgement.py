@@ -0,0 +1,64 @@
+class FakeRetriever:
+    answer_cache = None
+
+    def ensure(self):
+        pass
+
+    def cite(self, query):
+        return []
+
+
+def make_judge(candidates, judgement="回答2"):
+    from lib.judge_gate import JudgeGate
+    from lib.judgement import CandidateJudge
+
+    calls = []
+
+    def judge(answer_x, answer_y):
+        calls.append((answer_x, answer_y))
+        return judgement
+
+    candidate_judge = CandidateJudge(
+        retriever=FakeRetriever(),
+        gate=JudgeGate(threshold=0.9),
+        build_context=lambda query, cited: "context",
+        generate=lambda context, query: candidates,
+        judge=judge,
+    )
+    return candidate_judge, calls
+
+
+def test_agreeing_candidates_skip_the_judge():
+    candidate_judge, calls = make_judge(["民法第184條。", "民法第184條。"])
+    assert candidate_judge.respond("問題") == "民法第184條。\n"
+    assert calls == []
+    assert candidate_judge.gate.stats()["skipped"] == 1
+
+
+def test_judge_picks_the_candidate():
+    candidate_judge, calls = make_judge(["甲說。", "完全不同的回答。"])
+    assert candidate_judge.respond("問題") == "完全不同的回答。\n"
+    assert len(calls) == 1
+    assert candidate_judge.gate.stats()["judged"] == 1
+
+    candidate_judge, _ = make_judge(["甲說。", "完全不同的回答。"], judgement="?")
+    assert candidate_judge.respond("問題").startswith("⚠️")
+    candidate_judge, _ = make_judge(["", "回答"])
+    assert candidate_judge.respond("問題").startswith("⚠️")
+
+
+def test_timeouts_become_a_message():
+    from lib.judgement import CandidateJudge
+    from lib.judge_gate import JudgeGate
+
+    def generate(context, query):
+        raise TimeoutError
+
+    candidate_judge = CandidateJudge(
+        retriever=FakeRetriever(),
+        gate=JudgeGate(),
+        build_context=lambda query, cited: "context",
+        generate=generate,
+        judge=lambda answer_x, answer_y: "回答1",
+    )
+    assert candidate_judge.respond("問題") == "⚠️ 回覆超時，請稍後再試。"
@@ -0,0 +1,90 @@
+def test_prefix_cache_matches_full_prefill(tiny_llama):
+    import torch
+    from lib.prefix_cache import PrefixCache
+
+    model, tokenizer = tiny_llama
+    prefix = "請閱讀「回答1」與「回答2」"
+    cache = PrefixCache(model, tokenizer, "cpu")
+    assert cache.add(prefix) == len(prefix) + 1
+
+    prompt = prefix + "\n回答1: 民法\n回答2: 刑法"
+    input_ids, prefix_kv = cache.encode(prompt)
+    assert torch.equal(input_ids, tokenizer(prompt).input_ids)
+    with torch.no_grad():
+        full = model(input_ids=input_ids).logits[0, -1]
+        cached = model(
+            input_ids=input_ids[:, prefix_kv.get_seq_length() :],
+            past_key_values=prefix_kv,
+        ).logits[0, -1]
+    torch.testing.assert_close(full, cached, rtol=1e-4, atol=1e-4)
+
+    # The shared prefix tensors are untouched by the extra tokens
+    assert cache.encode(prompt)[1].get_seq_length() == len(prefix) + 1
+    assert cache.encode("unrelated")[1] is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_prefix_cache_with_bpe_boundary_merges():
+    import torch
+    from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+    from lib.prefix_cache import PrefixCache
+
+    # Byte-level BPE with the Llama 3 pre-tokenizer split, which merges punctuation
+    # with the newlines after it and whitespace runs with a following newline
+    split = (
+        r"[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*"
+        r"|\s*[\r\n]+|\s+(?!\S)|\s+"
+    )
+    bpe = Tokenizer(models.BPE())
+    bpe.pre_tokenizer = pre_tokenizers.Sequence(
+        [
+            pre_tokenizers.Split(Regex(split), behavior="isolated"),
+            pre_tokenizers.ByteLevel(add_prefix_space=False, use_regex=False),
+        ]
+    )
+    bpe.decoder = decoders.ByteLevel()
+    bpe.train_from_iterator(
+        ["請依下列規定：\n        \n下列為參考資料"] * 50,
+        trainers.BpeTrainer(
+            vocab_size=320,
+            special_tokens=["<pad>", "<s>"],
+            initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+        ),
+    )
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=bpe, pad_token="<pad>")
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+    )
+    model = LlamaForCausalLM(config).eval()
+    cache = PrefixCache(model, tokenizer, "cpu")
+
+    # The prefix ends in "：\n        ", which merges with the prompt's next "\n"
+    preamble = "請依下列規定：\n        "
+    n_prefix = cache.add(preamble)
+    prompt = preamble + "\n下列為參考資料"
+    input_ids, prefix_kv = cache.encode(prompt)
+    assert torch.equal(input_ids, tokenizer(prompt, return_tensors="pt").input_ids)
+    n_shared = prefix_kv.get_seq_length()
+    assert 0 < n_shared < n_prefix
+    with torch.no_grad():
+        full = model(input_ids=input_ids).logits[0, -1]
+        cached = model(
+            input_ids=input_ids[:, n_shared:], past_key_values=prefix_kv
+        ).logits[0, -1]
+    torch.testing.assert_close(full, cached, rtol=1e-4, atol=1e-4)
+
+    # "下列" never stands alone in "下列為參考資料" (one token): nothing is shared
+    cache.add("下列")
+    input_ids, prefix_kv = cache.encode("下列為參考資料")
+    assert prefix_kv is None
+    assert torch.equal(
+        input_ids, tokenizer("下列為參考資料", return_tensors="pt").input_ids
+    )
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
@@ -0,0 +1,32 @@
+import time
+
+
+def test_normalize_query():
+    from lib.query_cache import normalize_query
+
+    assert normalize_query("民法第１８４條？") == normalize_query("  民法第184條 ")
+    assert normalize_query("民法 第 184 條") == "民法第184條"
+    assert normalize_query("ＡＢＣ,  def!") == "abc def"
+
+
+def test_cache_lru_ttl_and_version():
+    from lib.query_cache import QueryCache
+
+    cache = QueryCache(max_size=2, ttl_seconds=60)
+    cache.check_version("v1")
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    cache.check_version("v2")
+    assert cache.get("a") is None
+
+    cache.ttl = 0.01
+    cache.put("d", 4)
+    time.sleep(0.02)
+    assert cache.get("d") is None
+    stats = cache.stats()
+    assert stats["hits"] == 3 and stats["evictions"] == 1
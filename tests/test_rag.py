@@ -0,0 +1,26 @@
+def test_label_probabilities_match_full_forward(tiny_llama):
+    import torch
+    from lib.rag import label_probabilities
+    from lib.prefix_cache import PrefixCache
+
+    model, tokenizer = tiny_llama
+    preamble = "請判斷哪一個回答比較適當。"
+    prompt = preamble + "\n回答1: 民法\n回答2: 刑法\n較佳的回答是：回答"
+    label_ids = [
+        tokenizer(label, add_special_tokens=False).input_ids[0, -1].item()
+        for label in ("1", "2")
+    ]
+    input_ids = tokenizer(prompt).input_ids
+    with torch.no_grad():
+        logits = model(input_ids=input_ids).logits[0, -1, label_ids]
+    expected = torch.softmax(logits, dim=-1).tolist()
+
+    probs = label_probabilities(model, input_ids, label_ids)
+    assert abs(sum(probs) - 1.0) < 1e-5
+    torch.testing.assert_close(torch.tensor(probs), torch.tensor(expected))
+
+    cache = PrefixCache(model, tokenizer, "cpu")
+    cache.add(preamble)
+    cached_ids, prefix_kv = cache.encode(prompt)
+    cached = label_probabilities(model, cached_ids, label_ids, prefix_kv)
+    torch.testing.assert_close(torch.tensor(cached), torch.tensor(expected))
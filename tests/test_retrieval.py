@@ -0,0 +1,148 @@
+import numpy as np
+
+
+class FakeEncoder:
+    encoder_id = "fake"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, max_length=512):
+        self.encoded += list(texts)
+        return np.array([[len(text), 1.0] for text in texts], dtype="float32")
+
+
+def test_retriever_embeds_only_uncached_queries():
+    import faiss
+    from lib.retrieval import Retriever
+
+    retriever = Retriever(ensure=lambda: None, answer_db="answers_test.sqlite")
+    retriever.encoder = FakeEncoder()
+    texts = ["民法第1條", "刑法第2條", "勞動基準法第3條"]
+    index = faiss.IndexFlatL2(2)
+    index.add(np.array([[3, 1], [5, 1], [9, 1]], dtype="float32"))
+
+    hits = retriever.search_faiss_idx(
+        query="一二三四五", idx=index, texts=texts, top_k=2, max_length=512
+    )
+    assert [hit["id"] for hit in hits] == [1, 0]
+    assert hits[0]["text"] == "刑法第2條"
+
+    # "一二三四五！" normalizes to the cached key; only the new query is encoded
+    results = retriever.search_faiss_batch(
+        queries=["一二三四五！", "一二三四五六七八九"],
+        idx=index,
+        texts=texts,
+        top_k=1,
+        max_length=512,
+    )
+    assert [hits[0]["id"] for hits in results] == [1, 2]
+    assert retriever.encoder.encoded == ["一二三四五", "一二三四五六七八九"]
+    assert retriever.cache_stats()["embedding"]["hits"] == 1
+
+
+def test_retriever_stats_before_load():
+    from lib.retrieval import Retriever
+
+    retriever = Retriever(ensure=lambda: None, answer_db="answers_test.sqlite")
+    assert retriever.index_status() == {}
+    assert retriever.context_stats() == {}
+
+
+def test_retriever_cited_queries_skip_the_encoder():
+    from lib.citation_index import CitationIndex
+    from lib.retrieval import Retriever
+
+    class Snapshot:
+        version = "v1"
+        texts = [
+            "民法第184條：因故意或過失，不法侵害他人之權利者。",
+            "刑法第320條：竊盜。",
+        ]
+        extras = {"citation_index": CitationIndex(texts)}
+
+    class Manager:
+        current = Snapshot()
+        version = "v1"
+
+    class Packer:
+        def pack(self, results, query):
+            return "|".join(result["text"] for result in results)
+
+    retriever = Retriever(ensure=lambda: None, answer_db="answers_test.sqlite")
+    retriever.encoder = FakeEncoder()
+    retriever.index_manager = Manager()
+    retriever.context_packer = Packer()
+
+    cited = retriever.cite("請問民法第一百八十四條")
+    assert [hit["id"] for hit in cited] == [0]
+    assert retriever.build_context("請問民法第一百八十四條", top_k=5).startswith("民法")
+    assert retriever.build_context("請問", top_k=5, cited=cited).startswith("民法")
+    assert retriever.encoder.encoded == []
+
+
+class ListTokenizer:
+    name_or_path = "chars"
+
+    def __call__(self, text, add_special_tokens=True):
+        class Encoded:
+            input_ids = (
+                [list(t) for t in text] if isinstance(text, list) else list(text)
+            )
+
+        return Encoded()
+
+
+def load_retriever(encoder):
+    from lib.retrieval import Retriever
+    from lib.startup import StartupProfiler
+
+    retriever = Retriever(ensure=lambda: None, answer_db="answers_test.sqlite")
+    retriever.load(StartupProfiler("test"), encoder, ListTokenizer(), overhead_tokens=0)
+    return retriever
+
+
+def test_article_updates_survive_a_restart(tmp_path, monkeypatch):
+    import os
+    from lib.embedding_store import get_store_dir, write_store
+
+    monkeypatch.setenv("PROJECT_ROOT", os.getcwd())
+    monkeypatch.setenv("DATA", os.path.relpath(tmp_path, os.getcwd()))
+    for key, value in (
+        ("INDEX_TYPE", "flat"),
+        ("SHARDED_INDEX", "0"),
+        ("INDEX_SNAPSHOTS", "1"),
+        ("CITATION_INDEX_ENABLED", "1"),
+        ("ANSWER_CACHE_ENABLED", "0"),
+    ):
+        monkeypatch.setenv(key, value)
+    encoder = FakeEncoder()
+    texts = [f"民法第{i}條：第{i}條的內容。" for i in range(1, 61)]
+    write_store(
+        get_store_dir(encoder.encoder_id),
+        texts,
+        encoder.encode(texts),
+        meta={"encoder_id": encoder.encoder_id},
+    )
+
+    # First start builds the index; the update is saved as a snapshot of it
+    retriever = load_retriever(encoder)
+    retriever.index_manager.update(add=["民法第999條：新增條文。"], wait=True)
+    assert retriever.index_status()["articles"] == 61
+
+    restarted = load_retriever(encoder)
+    assert restarted.index_status()["articles"] == 61
+    assert [hit["text"] for hit in restarted.cite("民法第999條")] == [
+        "民法第999條：新增條文。"
+    ]
+
+    # Re-embedded store: the rebuilt index must not pick up the old snapshot
+    write_store(
+        get_store_dir(encoder.encoder_id),
+        texts,
+        encoder.encode(texts) + 1,
+        meta={"encoder_id": encoder.encoder_id},
+    )
+    reembedded = load_retriever(encoder)
+    assert reembedded.index_status()["articles"] == 60
+    assert reembedded.cite("民法第999條") == []
@@ -0,0 +1,34 @@
+def test_law_labels_inherit_previous_law():
+    from lib.sharded_index import law_labels
+
+    texts = ["民法第1條：內容", "（續）", "刑法第2條：內容", "前言"]
+    assert law_labels(texts) == ["民法", "民法", "刑法", "刑法"]
+
+
+def test_sharded_search_matches_flat_and_routes_by_law():
+    import numpy as np
+    from lib.faiss_index import build_index
+    from lib.sharded_index import OTHER_SHARD, ShardedIndex
+
+    rng = np.random.default_rng(0)
+    laws = ["民法", "刑法", "勞動基準法"]
+    centers = rng.normal(scale=10.0, size=(len(laws), 16))
+    labels = [law for law in laws for _ in range(40)] + ["消費者保護法"] * 5
+    vectors = np.vstack(
+        [centers[laws.index(law)] if law in laws else np.zeros(16) for law in labels]
+    ) + rng.normal(size=(len(labels), 16))
+    vectors = vectors.astype("float32")
+
+    index = ShardedIndex(vectors, labels, min_shard_size=10, n_route=1)
+    assert index.shards == sorted(laws + [OTHER_SHARD])
+    queries = vectors[[3, 45, 90]] + 0.01
+    _, expected = build_index(vectors, "flat").search(queries, 5)
+    distances, found = index.search(queries, 5)
+    assert np.array_equal(found, expected)
+    assert np.all(np.diff(distances, axis=1) >= 0)
+
+    # Naming a law searches only its shard, whatever the vector looks like
+    _, found = index.search(queries[:1], 5, queries=["勞基法的加班費規定"])
+    assert set(found[0]) <= set(range(80, 120))
+    stats = index.stats()
+    assert stats["keyword"] == 1 and stats["centroid"] == 3
@@ -0,0 +1,54 @@
+def test_lazy_loader_loads_once_and_profiles_steps():
+    from threading import Thread
+    from lib.startup import LazyLoader
+
+    calls = []
+
+    def load(profile):
+        with profile.step("model"):
+            calls.append(1)
+
+    loader = LazyLoader("test", load)
+    assert loader.status()["status"] == "cold"
+    threads = [Thread(target=loader.ensure) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    status = loader.status()
+    assert calls == [1]
+    assert status["status"] == "ready"
+    assert [step["step"] for step in status["steps"]] == ["model"]
+
+
+def test_lazy_loader_warm_up_failure_is_retried():
+    from lib.startup import LazyLoader
+
+    attempts = []
+
+    def load(profile):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("no weights")
+
+    loader = LazyLoader("test", load)
+    loader.warm_up().join()
+    assert loader.status()["status"] == "error"
+    loader.ensure()
+    assert loader.status()["status"] == "ready"
+    assert loader.status()["error"] is None
+
+
+def test_lazy_loader_first_use_failure_is_reported():
+    import pytest
+    from lib.startup import LazyLoader
+
+    def load(profile):
+        raise RuntimeError("no weights")
+
+    loader = LazyLoader("test", load)
+    with pytest.raises(RuntimeError):
+        loader.ensure()
+    status = loader.status()
+    assert status["status"] == "error"
+    assert status["error"] == "no weights"
@@ -0,0 +1,12 @@
+def test_timed_stream():
+    from lib.utils import timed_stream
+
+    stats = {}
+    chunks = list(timed_stream(iter(["民法", "第184條"]), stats))
+    assert chunks == ["民法", "第184條"]
+    assert stats["chunks"] == 2
+    assert 0 <= stats["ttft"] <= stats["total"]
+
+    empty = {}
+    assert list(timed_stream(iter([]), empty)) == []
+    assert empty["ttft"] is None and empty["total"] >= 0